@@ -1,3 +1,6 @@
+from decimal import Decimal
+
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 from core.models import (
     Representante,
@@ -8,6 +11,7 @@ from core.models import (
     Pedido,
     ItemPedido,
 )
+from core.services.pedidos import PedidoInvalido, criar_pedido, numero_invalido, prefetch_itens
 
 class ClienteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -41,9 +45,24 @@ class ItemPedidoSerializer(serializers.ModelSerializer):
         model = ItemPedido
         fields = ["id", "produto", "produto_sku", "produto_info", "qtd", "preco_unit", "desconto", "subtotal"]
 
+class ItemPedidoEntradaSerializer(serializers.Serializer):
+    """Item na criação de pedido: produto (id) ou produto_sku; sem preco_unit usa a tabela."""
+    produto = serializers.IntegerField(required=False, min_value=1)  # id; resolvido em lote na criação
+    produto_sku = serializers.CharField(required=False, allow_blank=True)
+    qtd = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, min_value=Decimal("0.01"))
+    preco_unit = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, min_value=Decimal("0"))
+    desconto = serializers.DecimalField(
+        max_digits=5, decimal_places=2, required=False, min_value=Decimal("0"), max_value=Decimal("100"),
+    )
+
+    def validate(self, data):
+        if not data.get("produto") and not data.get("produto_sku"):
+            raise serializers.ValidationError("Informe produto (id) ou produto_sku.")
+        return data
+
 class PedidoSerializer(serializers.ModelSerializer):
-    items = ItemPedidoSerializer(many=True, write_only=True, required=False)
-    itens = ItemPedidoSerializer(source="itempedido_set", many=True, read_only=True)
+    items = ItemPedidoEntradaSerializer(many=True, write_only=True, required=False)
+    itens = ItemPedidoSerializer(many=True, read_only=True)
     tabela = serializers.CharField(write_only=True, required=False, allow_blank=True)
     representante_codigo = serializers.CharField(source="representante.codigo", read_only=True)
 
@@ -54,6 +73,16 @@ class PedidoSerializer(serializers.ModelSerializer):
             "status", "total", "criado_em", "tabela", "items", "itens"
         ]
         read_only_fields = ["total", "criado_em"]
+        extra_kwargs = {"numero": {"required": False, "allow_blank": True}}  # gerado se vazio
+
+    def validate_numero(self, value):
+        # o próprio número automático do pedido pode voltar sem mudança na edição
+        if self.instance is not None and value == self.instance.numero:
+            return value
+        erro = numero_invalido(value)
+        if erro:
+            raise serializers.ValidationError(erro)
+        return value
 
     def _get_or_default_tabela(self, nome: str | None):
         if nome:
@@ -64,15 +93,6 @@ class PedidoSerializer(serializers.ModelSerializer):
         obj, _ = TabelaDePreco.objects.get_or_create(nome="Padrão", defaults={"ativa": True})
         return obj
 
-    def _resolve_produto(self, item):
-        prod = item.get("produto")
-        sku = item.get("produto_sku")
-        if prod:
-            return prod
-        if sku:
-            return Produto.objects.get(sku=sku)
-        raise serializers.ValidationError("Informe produto (id) ou produto_sku.")
-
     def create(self, validated_data):
         items_data = validated_data.pop("items", [])
         tabela_nome = validated_data.pop("tabela", None)
@@ -87,40 +107,19 @@ class PedidoSerializer(serializers.ModelSerializer):
                 pass
 
         tabela = self._get_or_default_tabela(tabela_nome)
-        pedido = Pedido.objects.create(**validated_data)
-
-        total = 0
-        created_items = []
-        for raw in items_data:
-            raw = dict(raw)
-            produto = self._resolve_produto(raw)
-
-            preco = Preco.objects.filter(produto=produto, tabela=tabela).first()
-            if not preco:
-                raise serializers.ValidationError(
-                    f"Produto {produto.sku} não possui preço na tabela '{tabela.nome}'"
-                )
-
-            qtd = raw.get("qtd") or 1
-            preco_unit = raw.get("preco_unit") or preco.preco
-            desconto = raw.get("desconto") or 0
-
-            item = ItemPedido.objects.create(
-                pedido=pedido,
-                produto=produto,
-                qtd=qtd,
-                preco_unit=preco_unit,
-                desconto=desconto,
-            )
-            subtotal = (item.qtd * item.preco_unit) - (item.desconto or 0)
-            total += subtotal
-            created_items.append(item)
-
-        pedido.total = total
-        if not pedido.numero:
-            from datetime import datetime
-            pedido.numero = "PV-" + datetime.now().strftime("%y%m%d%H%M%S")
-        pedido.save(update_fields=["total", "numero"])
-
-        pedido._created_items = created_items
+        try:
+            pedido = criar_pedido(validated_data, items_data, tabela.nome)
+        except PedidoInvalido as e:
+            raise serializers.ValidationError({"items": e.erros})
+        # a resposta lista os itens com o produto: carrega tudo de uma vez
+        prefetch_related_objects([pedido], prefetch_itens())
         return pedido
+
+class PedidoLoteEntradaSerializer(serializers.Serializer):
+    """Um pedido do envio em lote (POST /api/pedidos/lote/)."""
+    chave = serializers.CharField(max_length=64, required=False, allow_blank=True)  # idempotência (ex.: UUID do app)
+    cliente = serializers.IntegerField(min_value=1)
+    representante = serializers.IntegerField(min_value=1, required=False)
+    tabela = serializers.CharField(required=False, allow_blank=True)
+    numero = serializers.CharField(max_length=20, required=False, allow_blank=True)
+    itens = ItemPedidoEntradaSerializer(many=True, required=False)
@@ -2,12 +2,16 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
-from core.views_jobs import JobsRunView, JobsListView, JobDetailView, JobLogsView
+from core.views_jobs import (
+    JobsRunView, JobsListView, JobDetailView, JobLogsView, JobDownloadView, JobStreamView, JobsStreamView,
+)
 
+from .views_busca import BuscaView
+from .views_pedidos import PedidosLoteView
 from .views_reports import (
-    VendasResumoView, ItensMaisVendidosView,
+    VendasResumoView, ItensMaisVendidosView, ItensDetalheView,
     MTDYTDView, HeatmapUFView,
-    SimuladorCalcularView, JobRunDemoView
+    SimuladorCalcularView, PrecosImportarView, JobRunDemoView
 )
 
 urlpatterns = [
@@ -18,25 +22,32 @@ urlpatterns = [
     # Relatórios
     path('relatorios/vendas-resumo/',        VendasResumoView.as_view()),
     path('relatorios/itens-mais-vendidos/',  ItensMaisVendidosView.as_view()),
+    path('relatorios/itens-detalhe/',        ItensDetalheView.as_view()),
     path('relatorios/mtd-ytd/',              MTDYTDView.as_view()),
     path('relatorios/heatmap-uf/',           HeatmapUFView.as_view()),
 
     # Util
     path('simulador/calcular/',              SimuladorCalcularView.as_view()),
+    path('precos/importar/',                 PrecosImportarView.as_view()),
+    path('pedidos/lote/',                    PedidosLoteView.as_view()),
+    path('busca/',                           BuscaView.as_view()),
     path('jobs/run-demo/',                   JobRunDemoView.as_view()),
 
     path("jobs/run/", JobsRunView.as_view(), name="jobs-run"),
     path("jobs/",      JobsListView.as_view(), name="jobs-list"),
+    path("jobs/stream/", JobsStreamView.as_view(), name="jobs-stream"),
     path("jobs/<uuid:job_id>/", JobDetailView.as_view(), name="jobs-detail"),
     path("jobs/<uuid:job_id>/logs/", JobLogsView.as_view(), name="jobs-logs"),
+    path("jobs/<uuid:job_id>/stream/", JobStreamView.as_view(), name="jobs-job-stream"),
+    path("jobs/<uuid:job_id>/download/", JobDownloadView.as_view(), name="jobs-download"),
 ]
 
 # (Opcional) Mantém endpoints de CNPJ se o módulo existir
 try:
-    from .views_cnpj import CNPJLookupView, ClienteCriarPorCNPJView
+    from .views_cnpj import CNPJLookupView, ClienteFromCNPJView
     urlpatterns += [
         path('cnpj/lookup/', CNPJLookupView.as_view()),
-        path('clientes/criar-por-cnpj/', ClienteCriarPorCNPJView.as_view()),
+        path('clientes/criar-por-cnpj/', ClienteFromCNPJView.as_view()),
     ]
 except Exception:
     pass
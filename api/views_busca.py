@@ -0,0 +1,33 @@
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.models import IndiceBusca
+from core.services import busca
+
+BUSCA_LIMITE_MAX = 50
+
+
+class BuscaView(APIView):
+    """
+    GET /api/busca/?q=acucar&tipo=produto|cliente&limite=20&inativos=0
+
+    Autocomplete de produtos/clientes pelo índice de busca (sem acento, por
+    prefixo de palavra), em ordem de relevância: {"results": [{id, rotulo, ativo}]}.
+    Buscas com menos de 2 caracteres voltam vazias.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        tipo = request.query_params.get("tipo") or IndiceBusca.PRODUTO
+        if tipo not in dict(IndiceBusca.TIPOS):
+            return Response({"detail": "tipo deve ser 'produto' ou 'cliente'."}, status=400)
+        q = request.query_params.get("q") or ""
+        try:
+            limite = min(max(int(request.query_params.get("limite") or 20), 1), BUSCA_LIMITE_MAX)
+        except ValueError:
+            return Response({"detail": "limite inválido."}, status=400)
+        if len(busca.normalizar(q).replace(" ", "")) < 2:
+            return Response({"results": []})
+        apenas_ativos = request.query_params.get("inativos") not in ("1", "true")
+        return Response({"results": busca.buscar(tipo, q, limite=limite, apenas_ativos=apenas_ativos)})
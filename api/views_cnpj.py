@@ -1,21 +1,38 @@
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from core.services.cnpj import fetch_cnpj
+from rest_framework.throttling import AnonRateThrottle
+from core.services.cnpj import CnpjErro, consultar
 from core.models import Cliente
 
+
+def _status_erro(e: CnpjErro) -> int:
+    # CNPJ inexistente = 404; API fora/limitando = 502
+    return 404 if e.status == 404 else (502 if e.transitorio else 400)
+
+
+class CnpjAnonThrottle(AnonRateThrottle):
+    # só anônimos, por IP; taxa em REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]["cnpj_anon"]
+    scope = "cnpj_anon"
+
+
 class CNPJLookupView(APIView):
+    # aberta: o cache (CnpjCache) responde a maior parte e o throttle limita
+    # quantas consultas um anônimo faz chegar à BrasilAPI
     permission_classes = [AllowAny]
+    throttle_classes = [CnpjAnonThrottle]
 
     def get(self, request, *args, **kwargs):
         cnpj = request.query_params.get("cnpj")
         if not cnpj:
             return Response({"detail": "Informe o parâmetro ?cnpj="}, status=400)
         try:
-            data = fetch_cnpj(cnpj)
-            return Response({"ok": True, "data": data})
-        except Exception as e:
+            data, origem = consultar(cnpj)
+        except ValueError as e:
             return Response({"ok": False, "error": str(e)}, status=400)
+        except CnpjErro as e:
+            return Response({"ok": False, "error": str(e)}, status=_status_erro(e))
+        return Response({"ok": True, "data": data, "origem": origem})
 
 class ClienteFromCNPJView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
@@ -25,9 +42,11 @@ class ClienteFromCNPJView(APIView):
         if not cnpj:
             return Response({"detail": "Envie 'cnpj' no corpo."}, status=400)
         try:
-            data = fetch_cnpj(cnpj)
-        except Exception as e:
-            return Response({"detail": f"Consulta falhou: {e}"}, status=400)
+            data, _ = consultar(cnpj)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+        except CnpjErro as e:
+            return Response({"detail": f"Consulta falhou: {e}"}, status=_status_erro(e))
 
         nome = data.get("nome_fantasia") or data.get("razao_social") or ""
         cidade = data.get("municipio") or ""
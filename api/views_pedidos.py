@@ -0,0 +1,46 @@
+from django.conf import settings
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.models import Representante
+from core.services.pedidos import criar_pedidos_em_lote
+from .serializers import PedidoLoteEntradaSerializer
+
+
+class PedidosLoteView(APIView):
+    """
+    POST { "enviar": bool, "pedidos": [ {chave, cliente, representante?, tabela?, numero?, itens: [...]}, ... ] }
+
+    Cria todos os pedidos válidos de uma vez e responde um resultado por pedido,
+    na ordem (criado | existente | erro). Reenviar o mesmo lote com as mesmas
+    chaves é seguro: os já gravados voltam como "existente".
+    Representantes (não staff) só lançam pedidos para si mesmos.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        pedidos = request.data.get("pedidos")
+        if not isinstance(pedidos, list) or not pedidos:
+            return Response({"detail": "Envie 'pedidos' (lista)."}, status=400)
+        limite = getattr(settings, "PEDIDOS_LOTE_MAX", 200)
+        if len(pedidos) > limite:
+            return Response({"detail": f"Máximo de {limite} pedidos por envio."}, status=400)
+
+        ser = PedidoLoteEntradaSerializer(data=pedidos, many=True)
+        if not ser.is_valid():
+            erros = [{"indice": i, "erros": e} for i, e in enumerate(ser.errors) if e]
+            return Response({"detail": "Lote inválido.", "pedidos": erros}, status=400)
+
+        entradas = ser.validated_data
+        rep_usuario = Representante.objects.filter(user=request.user).first()
+        if not request.user.is_staff:
+            if rep_usuario is None:
+                return Response({"detail": "Usuário não é representante."}, status=403)
+            for e in entradas:
+                e["representante"] = rep_usuario.pk
+
+        enviar = str(request.data.get("enviar") or "").lower() in ("1", "true", "sim")
+        resultados = criar_pedidos_em_lote(entradas, enviar=enviar, representante_padrao=rep_usuario)
+        resumo = {s: sum(1 for r in resultados if r["status"] == s) for s in ("criado", "existente", "erro")}
+        return Response({"resumo": resumo, "resultados": resultados})
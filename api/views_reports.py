@@ -1,117 +1,119 @@
 
-from datetime import datetime, time
+from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP
-from django.db.models import Sum, Count, F, Value
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.db.models import Sum, Value
 from django.db.models.functions import Coalesce, TruncMonth
 from django.utils import timezone
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from core.models import Pedido, ItemPedido, Representante, Produto, Preco
-from django.http import HttpResponse
-import csv
-import io
+from core.models import Representante, TabelaDePreco
+from core.services.exportacao import ArquivoEmBlocos, RespostaEmBlocos
+from core.services import cache_relatorios, importacao, relatorios
+from core.services.precos import ImportacaoPrecosErro, importar_precos, resolver_precos
+from core.views_jobs import FORMATOS_ARQUIVO, enfileirar_exportacao, enfileirar_importacao_precos
+import tempfile
 
 # ---------- Helpers ----------
-def _parse_date(date_str: str | None):
-    if not date_str:
-        return None
-    try:
-        d = datetime.fromisoformat(date_str).date()
-        return d
-    except ValueError:
-        return None
-
-def _daterange_to_aware_start_end(de_str: str | None, ate_str: str | None):
-    tz = timezone.get_current_timezone()
-    de_date = _parse_date(de_str)
-    ate_date = _parse_date(ate_str)
-    if de_date:
-        start = tz.localize(datetime.combine(de_date, time(0, 0, 0)))
-    else:
-        today = timezone.localdate()
-        start = tz.localize(datetime.combine(today.replace(day=1), time(0, 0, 0)))
-    if ate_date:
-        end = tz.localize(datetime.combine(ate_date, time(23, 59, 59)))
+def _as_date(v):
+    return v.date() if isinstance(v, datetime) else v
+
+def _resposta_arquivo(arq: relatorios.Arquivo):
+    """Arquivo exportado em blocos: o CSV é gerado enquanto é enviado."""
+    if arq.arquivo is not None:
+        resp = ArquivoEmBlocos(arq.arquivo, as_attachment=True, filename=arq.nome, content_type=arq.content_type)
     else:
-        end = timezone.now()
-    return start, end
+        resp = RespostaEmBlocos(arq.blocos, content_type=arq.content_type)
+        resp["Content-Disposition"] = f"attachment; filename={arq.nome}"
+    return resp
 
-def _restrict_by_user(qs, user):
+def _escopo(user) -> str:
+    """Parte da chave de cache que separa o que cada usuário enxerga (relatorios.restringir_por_usuario)."""
     if user.is_staff:
-        return qs
-    try:
-        rep = Representante.objects.get(user=user)
-        return qs.filter(representante=rep)
-    except Representante.DoesNotExist:
-        return qs.none()
+        return "staff"
+    rep_id = Representante.objects.filter(user=user).values_list("pk", flat=True).first()
+    return f"rep:{rep_id}" if rep_id else "nenhum"
 
-# ---------- Vendas Resumo ----------
-class VendasResumoView(APIView):
+def _responder_cacheado(request, relatorio: str, calcular):
+    """
+    JSON do relatório pelo cache (core.services.cache_relatorios): 304 se o
+    If-None-Match bate com o ETag guardado; senão os dados guardados ou o
+    resultado de `calcular()`, que fica guardado para as próximas chamadas.
+    """
+    versao = cache_relatorios.versao()  # lida antes de calcular: gravação no meio já gera versão nova
+    chave = cache_relatorios.chave(relatorio, _escopo(request.user), request.query_params)
+    entrada = cache_relatorios.ler(chave, versao)
+    origem = "HIT"
+    if entrada is None:
+        resp = calcular()
+        if not isinstance(resp, Response) or resp.status_code != 200:
+            return resp
+        entrada = cache_relatorios.gravar(chave, versao, resp.data)
+        origem = "MISS"
+    data, etag = entrada
+    resp = get_conditional_response(request._request, etag=etag) or Response(data)
+    resp["ETag"] = etag
+    resp["Cache-Control"] = "private, no-cache"  # o navegador guarda, mas sempre revalida
+    resp["X-Cache"] = origem
+    return resp
+
+class _RelatorioCacheadoView(APIView):
+    """
+    Base dos relatórios JSON com cache no servidor e ETag. As subclasses
+    implementam `gerar` no lugar de `get`.
+    """
     permission_classes = [IsAuthenticated]
+
     def get(self, request, *args, **kwargs):
-        de = request.query_params.get("de")
-        ate = request.query_params.get("ate")
-        rep_codigo = request.query_params.get("rep")
-        cliente_id = request.query_params.get("cliente")
-        status_f = request.query_params.get("status")
-        fmt = (request.query_params.get("format") or "").lower()
-
-        start, end = _daterange_to_aware_start_end(de, ate)
-        qs = Pedido.objects.select_related("cliente", "representante").filter(
-            criado_em__gte=start, criado_em__lte=end
-        )
-        qs = _restrict_by_user(qs, request.user)
-        if rep_codigo:
-            qs = qs.filter(representante__codigo=rep_codigo)
-        if cliente_id:
-            qs = qs.filter(cliente_id=cliente_id)
-        if status_f:
-            qs = qs.filter(status=status_f)
-
-        total_vendido = qs.aggregate(s=Coalesce(Sum("total"), Value(0)))["s"] or Decimal("0")
-        qtd_pedidos = qs.aggregate(c=Count("id"))["c"] or 0
-        ticket_medio = (total_vendido / qtd_pedidos) if qtd_pedidos else Decimal("0")
+        return _responder_cacheado(request, type(self).__name__, lambda: self.gerar(request, *args, **kwargs))
 
-        por_cliente = list(
-            qs.values("cliente_id", "cliente__nome")
-              .annotate(total=Coalesce(Sum("total"), Value(0)), pedidos=Count("id"))
-              .order_by("-total")
-        )
-
-        if fmt == "csv":
-            resp = HttpResponse(content_type="text/csv; charset=utf-8")
-            resp["Content-Disposition"] = "attachment; filename=vendas_resumo.csv"
-            w = csv.writer(resp); w.writerow(["cliente_id", "cliente_nome", "pedidos", "total"])
-            for row in por_cliente:
-                w.writerow([row["cliente_id"], row["cliente__nome"], row["pedidos"], row["total"]])
-            return resp
-        elif fmt == "xlsx":
-            from openpyxl import Workbook
-            wb = Workbook(); ws = wb.active; ws.title = "Resumo"
-            ws.append(["cliente_id", "cliente_nome", "pedidos", "total"])
-            for row in por_cliente:
-                ws.append([row["cliente_id"], row["cliente__nome"], row["pedidos"], float(row["total"])])
-            buf = io.BytesIO(); wb.save(buf); buf.seek(0)
-            resp = HttpResponse(buf.getvalue(), content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-            resp["Content-Disposition"] = "attachment; filename=vendas_resumo.xlsx"
-            return resp
-        elif fmt == "pdf":
-            from reportlab.pdfgen import canvas
-            buf = io.BytesIO(); c = canvas.Canvas(buf); c.setFont("Helvetica", 12)
-            c.drawString(40, 800, "Resumo de Vendas"); y = 780
-            for row in por_cliente[:60]:
-                line = f"{row['cliente__nome']}  | pedidos={row['pedidos']}  | total=R$ {row['total']}"
-                c.drawString(40, y, line[:115]); y -= 18
-                if y < 40: c.showPage(); y = 800
-            c.save(); buf.seek(0)
-            resp = HttpResponse(buf.getvalue(), content_type="application/pdf")
-            resp["Content-Disposition"] = "attachment; filename=vendas_resumo.pdf"
-            return resp
+class _RelatorioView(_RelatorioCacheadoView):
+    """
+    Base dos relatórios exportáveis: ?format=csv|xlsx|pdf gera o arquivo de
+    `relatorio` (core.services.relatorios), então a negociação do DRF não deve
+    responder 404 para esses formatos. Com ?async=1 o arquivo é gerado por um
+    Job e a resposta traz o id dele. Só a resposta JSON passa pelo cache; os
+    arquivos são gerados a cada chamada.
+    """
+    relatorio = ""
+    formato_padrao = ""  # relatórios só de arquivo: formato sem ?format=
+
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, *args, **kwargs):
+        fmt = (request.query_params.get("format") or self.formato_padrao).lower()
+        if request.query_params.get("async") == "1" and fmt in FORMATOS_ARQUIVO:
+            params = {k: v for k, v in request.query_params.items() if k != "async"}
+            job = enfileirar_exportacao(request.user, request.path, params, fmt)
+            return Response(
+                {"id": str(job.id), "status": job.status, "download": f"/api/jobs/{job.id}/download/"},
+                status=202,
+            )
+        if fmt in FORMATOS_ARQUIVO or self.formato_padrao:
+            return _resposta_arquivo(relatorios.exportar(self.relatorio, request.query_params, request.user, fmt))
+        return super().get(request, *args, **kwargs)
+
+# ---------- Vendas Resumo ----------
+class VendasResumoView(_RelatorioView):
+    relatorio = "vendas-resumo"
+
+    def gerar(self, request, *args, **kwargs):
+        params = request.query_params
+        start, end, por_cliente_qs = relatorios.vendas_resumo(params, request.user)
+
+        # uma única consulta agrupada; os totais saem da soma das linhas
+        por_cliente = list(por_cliente_qs)
+        total_vendido = sum((Decimal(r["total"]) for r in por_cliente), Decimal("0"))
+        qtd_pedidos = sum(r["pedidos"] for r in por_cliente)
+        ticket_medio = (total_vendido / qtd_pedidos) if qtd_pedidos else Decimal("0")
 
         data = {
             "periodo": {"inicio": start.isoformat(), "fim": end.isoformat()},
-            "filtros": {"rep": rep_codigo, "cliente": cliente_id, "status": status_f},
+            "filtros": {"rep": params.get("rep"), "cliente": params.get("cliente"), "status": params.get("status")},
             "totais": {
                 "qtd_pedidos": qtd_pedidos,
                 "total_vendido": str(total_vendido),
@@ -122,117 +124,76 @@ class VendasResumoView(APIView):
         return Response(data)
 
 # ---------- Itens mais vendidos ----------
-class ItensMaisVendidosView(APIView):
-    permission_classes = [IsAuthenticated]
-    def get(self, request, *args, **kwargs):
-        de = request.query_params.get("de")
-        ate = request.query_params.get("ate")
-        top = int(request.query_params.get("top") or 20)
-        fmt = (request.query_params.get("format") or "").lower()
-
-        start, end = _daterange_to_aware_start_end(de, ate)
-        pedidos = Pedido.objects.filter(criado_em__gte=start, criado_em__lte=end)
-        pedidos = _restrict_by_user(pedidos, request.user)
-
-        itens = (
-            ItemPedido.objects.select_related("produto", "pedido")
-            .filter(pedido__in=pedidos)
-            .values("produto_id", "produto__sku", "produto__descricao")
-            .annotate(
-                qtd_total=Coalesce(Sum("qtd"), Value(0)),
-                valor_total=Coalesce(Sum(F("qtd") * F("preco_unit") - Coalesce(F("desconto"), Value(0))), Value(0)),
-            )
-            .order_by("-qtd_total")[:top]
-        )
-        rows = list(itens)
-
-        if fmt == "csv":
-            resp = HttpResponse(content_type="text/csv; charset=utf-8")
-            resp["Content-Disposition"] = "attachment; filename=itens_mais_vendidos.csv"
-            w = csv.writer(resp)
-            w.writerow(["produto_id", "sku", "descricao", "qtd_total", "valor_total"])
-            for r in rows:
-                w.writerow([r["produto_id"], r["produto__sku"], r["produto__descricao"], r["qtd_total"], r["valor_total"]])
-            return resp
-        elif fmt == "xlsx":
-            from openpyxl import Workbook
-            wb = Workbook(); ws = wb.active; ws.title = "Itens"
-            ws.append(["produto_id", "sku", "descricao", "qtd_total", "valor_total"])
-            for r in rows:
-                ws.append([r["produto_id"], r["produto__sku"], r["produto__descricao"], float(r["qtd_total"]), float(r["valor_total"])])
-            buf = io.BytesIO(); wb.save(buf); buf.seek(0)
-            resp = HttpResponse(buf.getvalue(), content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-            resp["Content-Disposition"] = "attachment; filename=itens_mais_vendidos.xlsx"
-            return resp
-        elif fmt == "pdf":
-            from reportlab.pdfgen import canvas
-            buf = io.BytesIO(); c = canvas.Canvas(buf); c.setFont("Helvetica", 12)
-            c.drawString(40, 800, "Itens mais vendidos"); y = 780
-            for r in rows[:60]:
-                line = f"{r['produto__sku']} - {r['produto__descricao']} | qtd={r['qtd_total']} | R$ {r['valor_total']}"
-                c.drawString(40, y, line[:115]); y -= 18
-                if y < 40: c.showPage(); y = 800
-            c.save(); buf.seek(0)
-            resp = HttpResponse(buf.getvalue(), content_type="application/pdf")
-            resp["Content-Disposition"] = "attachment; filename=itens_mais_vendidos.pdf"
-            return resp
+class ItensMaisVendidosView(_RelatorioView):
+    relatorio = "itens-mais-vendidos"
 
+    def gerar(self, request, *args, **kwargs):
+        start, end, itens = relatorios.itens_mais_vendidos(request.query_params, request.user)
         return Response({
             "periodo": {"inicio": start.isoformat(), "fim": end.isoformat()},
-            "top": top,
-            "itens": rows,
+            "top": relatorios.top_itens(request.query_params),
+            "itens": list(itens),
         })
 
+# ---------- Itens (detalhe) ----------
+class ItensDetalheView(_RelatorioView):
+    """
+    Exportação com uma linha por ItemPedido, em streaming.
+    GET /api/relatorios/itens-detalhe/?de=&ate=&rep=&cliente=&status=&format=csv|xlsx
+    """
+    relatorio = "itens-detalhe"
+    formato_padrao = "csv"
+
 # ---------- MTD / YTD ----------
-class MTDYTDView(APIView):
-    permission_classes = [IsAuthenticated]
-    def get(self, request, *args, **kwargs):
+class MTDYTDView(_RelatorioCacheadoView):
+    def gerar(self, request, *args, **kwargs):
         now = timezone.localtime()
         ano = int(request.query_params.get("ano") or now.year)
         mes = int(request.query_params.get("mes") or now.month)
 
-        tz = timezone.get_current_timezone()
-        ytd_ini = tz.localize(datetime(ano, 1, 1, 0, 0, 0))
-        mtd_ini = tz.localize(datetime(ano, mes, 1, 0, 0, 0))
+        ytd_ini = timezone.make_aware(datetime(ano, 1, 1, 0, 0, 0))
+        mtd_ini = timezone.make_aware(datetime(ano, mes, 1, 0, 0, 0))
         ate = now
 
-        qs = Pedido.objects.filter(criado_em__lte=ate)
-        qs = _restrict_by_user(qs, request.user)
-
-        ytd = qs.filter(criado_em__gte=ytd_ini).aggregate(total=Coalesce(Sum("total"), Value(0)))["total"] or Decimal("0")
-        mtd = qs.filter(criado_em__gte=mtd_ini).aggregate(total=Coalesce(Sum("total"), Value(0)))["total"] or Decimal("0")
+        qs, rollup = relatorios.vendas_qs(ytd_ini, ate)
+        qs = relatorios.restringir_por_usuario(qs, request.user)
 
-        serie = list(
-            qs.filter(criado_em__year=ano)
-              .annotate(mes=TruncMonth("criado_em"))
-              .values("mes")
-              .annotate(total=Coalesce(Sum("total"), Value(0)))
-              .order_by("mes")
-        )
-        metas = [{"mes": r["mes"].date().isoformat(), "meta": (r["total"]*Decimal("1.1")).quantize(Decimal("0.01"))} for r in serie]
+        # uma consulta mensal de ytd_ini até agora: YTD, MTD e a série saem dela
+        meses = [
+            (_as_date(r["mes"]), Decimal(r["total"]))
+            for r in qs.annotate(mes=TruncMonth("dia" if rollup else "criado_em"))
+                       .values("mes")
+                       .annotate(total=Coalesce(Sum("total"), Value(Decimal("0"))))
+                       .order_by("mes")
+        ]
+        ytd = sum((t for _, t in meses), Decimal("0"))
+        mtd = sum((t for m, t in meses if m >= mtd_ini.date()), Decimal("0"))
+        serie = [{"mes": m, "total": t} for m, t in meses if m.year == ano]
+        metas = [{"mes": r["mes"].isoformat(), "meta": (r["total"]*Decimal("1.1")).quantize(Decimal("0.01"))} for r in serie]
 
         return Response({
             "ano": ano, "mes": mes,
             "ytd": str(ytd.quantize(Decimal('0.01'))),
             "mtd": str(mtd.quantize(Decimal('0.01'))),
-            "serie_mensal": [{"mes": r["mes"].date().isoformat(), "total": float(r["total"])} for r in serie],
+            "serie_mensal": [{"mes": r["mes"].isoformat(), "total": float(r["total"])} for r in serie],
             "metas": metas,
         })
 
 # ---------- Heatmap por UF ----------
-class HeatmapUFView(APIView):
-    permission_classes = [IsAuthenticated]
-    def get(self, request, *args, **kwargs):
+class HeatmapUFView(_RelatorioCacheadoView):
+    def gerar(self, request, *args, **kwargs):
         de = request.query_params.get("de")
         ate = request.query_params.get("ate")
-        start, end = _daterange_to_aware_start_end(de, ate)
-        qs = Pedido.objects.filter(criado_em__gte=start, criado_em__lte=end)
-        qs = _restrict_by_user(qs, request.user)
-        dados = list(
-            qs.values("cliente__uf")
-              .annotate(total=Coalesce(Sum("total"), Value(0)))
-              .order_by("-total")
-        )
+        start, end = relatorios.periodo(de, ate)
+        qs, rollup = relatorios.vendas_qs(start, end)
+        qs = relatorios.restringir_por_usuario(qs, request.user)
+        campo_uf = "uf" if rollup else "cliente__uf"
+        dados = [
+            {"cliente__uf": r[campo_uf], "total": r["total"]}
+            for r in qs.values(campo_uf)
+                       .annotate(total=Coalesce(Sum("total"), Value(Decimal("0"))))
+                       .order_by("-total")
+        ]
         return Response({"periodo": {"inicio": start.isoformat(), "fim": end.isoformat()}, "por_uf": dados})
 
 # ---------- Simulador ----------
@@ -241,22 +202,34 @@ class SimuladorCalcularView(APIView):
     def post(self, request, *args, **kwargs):
         tabela = (request.data.get("tabela") or "Padrão").strip()
         items = request.data.get("items") or []
+        if not isinstance(items, list) or not all(isinstance(it, dict) for it in items):
+            return Response({"detail": "'items' deve ser uma lista de objetos {sku, qtd}."}, status=400)
+        limite = getattr(settings, "SIMULADOR_MAX_ITENS", 5000)
+        if len(items) > limite:
+            return Response({"detail": f"Máximo de {limite} itens por simulação."}, status=400)
         resultado = {"tabela": tabela, "itens": [], "total_bruto": "0.00", "total_desc": "0.00", "total_liq": "0.00"}
         total_bruto = Decimal("0"); total_desc = Decimal("0"); total_liq = Decimal("0")
 
-        for it in items:
-            sku = (it.get("sku") or "").strip()
-            qtd = Decimal(str(it.get("qtd") or 0))
+        # todos os SKUs de uma vez: tabela pedida e, na falta, qualquer tabela,
+        # no mesmo lookup (cache por processo + 1 consulta para o que faltar)
+        skus = [str(it.get("sku") or "").strip() for it in items]
+        precos = resolver_precos(tabela, skus)
+
+        for it, sku in zip(items, skus):
             try:
-                prod = Produto.objects.get(sku=sku)
-            except Produto.DoesNotExist:
+                qtd = Decimal(str(it.get("qtd") or 0))
+            except ArithmeticError:
+                resultado["itens"].append({"sku": sku, "erro": "Quantidade inválida"})
+                continue
+            prod = precos.get(sku)
+            if prod is None:
                 resultado["itens"].append({"sku": sku, "erro": "SKU não encontrado"})
                 continue
-            preco = Preco.objects.filter(produto=prod, tabela__nome=tabela).first() or Preco.objects.filter(produto=prod).first()
-            if not preco:
+            preco = prod.preco if prod.preco is not None else prod.preco_fallback
+            if preco is None:
                 resultado["itens"].append({"sku": sku, "erro": "Preço não encontrado"})
                 continue
-            punit = Decimal(preco.preco).quantize(Decimal("0.01"))
+            punit = Decimal(preco).quantize(Decimal("0.01"))
             desconto_pct = Decimal("0")
             if qtd >= 100: desconto_pct = Decimal("12")
             elif qtd >= 50: desconto_pct = Decimal("8")
@@ -274,6 +247,43 @@ class SimuladorCalcularView(APIView):
         resultado["total_bruto"] = str(total_bruto); resultado["total_desc"] = str(total_desc); resultado["total_liq"] = str(total_liq)
         return Response(resultado)
 
+# ---------- Importação de preços ----------
+class PrecosImportarView(APIView):
+    """
+    POST multipart: arquivo (XLSX/CSV com REF/SKU e PRECO), tabela, criar_tabela.
+    Por padrão enfileira um Job (202 + id); com ?async=0 importa na hora e
+    devolve o resumo.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get("arquivo")
+        tabela = (request.data.get("tabela") or "").strip()
+        criar_tabela = str(request.data.get("criar_tabela") or "").lower() in ("1", "true", "sim")
+        if not upload or not tabela:
+            return Response({"detail": "Informe 'arquivo' e 'tabela'."}, status=400)
+        sufixo = (upload.name or "").lower().rsplit(".", 1)[-1]
+        if f".{sufixo}" not in importacao.XLSX_SUFIXOS + (".csv", ".txt"):
+            return Response({"detail": "Arquivo deve ser XLSX ou CSV."}, status=400)
+
+        if not criar_tabela and not TabelaDePreco.objects.filter(nome=tabela).exists():
+            return Response({"detail": f"Tabela de preço não encontrada: {tabela}"}, status=400)
+
+        if request.query_params.get("async") == "0":
+            with tempfile.NamedTemporaryFile(suffix=f".{sufixo}") as tmp:
+                for chunk in upload.chunks():
+                    tmp.write(chunk)
+                tmp.flush()
+                try:
+                    resumo = importar_precos(tmp.name, tabela, criar_tabela=criar_tabela)
+                except ImportacaoPrecosErro as e:
+                    return Response({"detail": str(e)}, status=400)
+            return Response(resumo)
+
+        job = enfileirar_importacao_precos(request.user, upload, tabela, criar_tabela)
+        return Response({"id": str(job.id), "status": job.status}, status=202)
+
 # ---------- Job Demo ----------
 class JobRunDemoView(APIView):
     permission_classes = [IsAuthenticated]
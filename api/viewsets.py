@@ -1,5 +1,8 @@
 from rest_framework import viewsets, permissions, filters
-from core.models import Cliente, Produto, TabelaDePreco, Preco, Pedido, ItemPedido
+from core.filters import BuscaFilter
+from core.models import Cliente, Produto, TabelaDePreco, Preco, Pedido, ItemPedido, IndiceBusca
+from core.pagination import ClienteCursor, ItemPedidoCursor, PedidoCursor, ProdutoCursor
+from core.services.pedidos import prefetch_itens
 from .serializers import (
     ClienteSerializer,
     ProdutoSerializer,
@@ -18,16 +21,18 @@ class IsStaffOrReadOnly(permissions.BasePermission):
 class ClienteViewSet(viewsets.ModelViewSet):
     queryset = Cliente.objects.all().order_by("nome")
     serializer_class = ClienteSerializer
+    pagination_class = ClienteCursor
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ["nome", "cnpj", "codigo", "cidade", "uf"]
+    filter_backends = [BuscaFilter]  # ?search= pelo índice (codigo, nome, cnpj, cidade, uf)
+    busca_tipo = IndiceBusca.CLIENTE
 
 class ProdutoViewSet(viewsets.ModelViewSet):
     queryset = Produto.objects.all().order_by("sku")
     serializer_class = ProdutoSerializer
+    pagination_class = ProdutoCursor
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ["sku", "descricao", "familia"]
+    filter_backends = [BuscaFilter]  # ?search= pelo índice (sku, descricao, familia)
+    busca_tipo = IndiceBusca.PRODUTO
 
 class TabelaViewSet(viewsets.ModelViewSet):
     queryset = TabelaDePreco.objects.all().order_by("nome")
@@ -42,8 +47,13 @@ class PrecoViewSet(viewsets.ModelViewSet):
     search_fields = ["produto__sku", "produto__descricao", "tabela__nome"]
 
 class PedidoViewSet(viewsets.ModelViewSet):
-    queryset = Pedido.objects.select_related("cliente", "representante").all().order_by("-criado_em")
+    queryset = (
+        Pedido.objects.select_related("cliente", "representante")
+        .prefetch_related(prefetch_itens())
+        .order_by("-criado_em")
+    )
     serializer_class = PedidoSerializer
+    pagination_class = PedidoCursor
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
     search_fields = ["numero", "cliente__nome", "representante__codigo"]
@@ -53,15 +63,14 @@ class PedidoViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_staff:
             return qs
-        try:
-            rep = user.representante
-            return qs.filter(representante=rep)
-        except Exception:
-            return qs.none()
+        # join no próprio filtro: sem consulta extra para achar o representante
+        # (usuário sem representante não vê pedidos)
+        return qs.filter(representante__user=user)
 
 class ItemPedidoViewSet(viewsets.ModelViewSet):
     queryset = ItemPedido.objects.select_related("pedido", "produto").all()
     serializer_class = ItemPedidoSerializer
+    pagination_class = ItemPedidoCursor
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
     search_fields = ["pedido__numero", "produto__sku", "produto__descricao"]
@@ -7,6 +7,8 @@ from .models import (
     Preco,
     Pedido,
     ItemPedido,
+    VendaDiaria,
+    CnpjCache,
 )
 
 @admin.register(Representante)
@@ -65,6 +67,19 @@ class ItemPedidoAdmin(admin.ModelAdmin):
     list_display = ("pedido", "produto", "qtd", "preco_unit", "desconto", "subtotal")
     search_fields = ("pedido__numero", "produto__sku", "produto__descricao")
 
+
+@admin.register(VendaDiaria)
+class VendaDiariaAdmin(admin.ModelAdmin):
+    list_display = ("dia", "representante", "cliente", "uf", "status", "pedidos", "total")
+    list_filter = ("status", "uf", "representante")
+    date_hierarchy = "dia"
+
+@admin.register(CnpjCache)
+class CnpjCacheAdmin(admin.ModelAdmin):
+    list_display = ("cnpj", "status_http", "erro", "consultado_em", "expira_em")
+    list_filter = ("status_http",)
+    search_fields = ("cnpj",)
+
     # --- Jobs Admin ---
 from .models import Job, JobLog
 
@@ -0,0 +1,18 @@
+"""
+Filtros DRF das listagens.
+
+BuscaFilter substitui o SearchFilter (LIKE '%x%' em várias colunas) pelo
+índice de busca (core.services.busca): mesmo parâmetro ?search=, sem
+diferenciar acentos. A view indica o tipo em `busca_tipo`.
+"""
+from rest_framework.filters import SearchFilter
+
+from core.services import busca
+
+
+class BuscaFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        ids = busca.ids_subconsulta(view.busca_tipo, " ".join(self.get_search_terms(request)))
+        if ids is None:
+            return queryset
+        return queryset.filter(pk__in=ids)
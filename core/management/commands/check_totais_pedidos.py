@@ -0,0 +1,29 @@
+# core/management/commands/check_totais_pedidos.py
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import pedidos
+
+
+class Command(BaseCommand):
+    help = (
+        "Confere Pedido.total contra a soma dos subtotais dos itens.\n"
+        "Sai com erro se houver divergência (use --fix para corrigir os totais)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Grava a soma dos itens nos pedidos divergentes.")
+        parser.add_argument("--limit", type=int, default=20, help="Máximo de divergências listadas.")
+
+    def handle(self, *args, **opts):
+        r = pedidos.reconciliar_totais(corrigir=opts["fix"])
+        if not r["divergentes"]:
+            self.stdout.write(self.style.SUCCESS("✓ Totais dos pedidos consistentes com os itens."))
+            return
+
+        for d in r["amostra"][: opts["limit"]]:
+            self.stdout.write(f"{d['numero']}: total={d['total']} soma dos itens={d['soma_itens']}")
+
+        if opts["fix"]:
+            self.stdout.write(self.style.WARNING(f"⚠ {r['divergentes']} divergência(s); {r['corrigidos']} pedido(s) corrigido(s)."))
+            return
+        raise CommandError(f"{r['divergentes']} pedido(s) com total diferente da soma dos itens.")
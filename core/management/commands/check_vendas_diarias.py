@@ -0,0 +1,34 @@
+# core/management/commands/check_vendas_diarias.py
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import vendas_diarias
+
+
+class Command(BaseCommand):
+    help = (
+        "Confere o rollup VendaDiaria contra os pedidos.\n"
+        "Sai com erro se houver divergência (use --fix para reconstruir)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Reconstrói o rollup se houver divergência.")
+        parser.add_argument("--limit", type=int, default=20, help="Máximo de divergências listadas.")
+
+    def handle(self, *args, **opts):
+        divergencias = vendas_diarias.diff()
+        if not divergencias:
+            self.stdout.write(self.style.SUCCESS("✓ Rollup consistente com os pedidos."))
+            return
+
+        for (dia, rep_id, cli_id, uf, status), esperado, atual in divergencias[: opts["limit"]]:
+            self.stdout.write(
+                f"{dia} rep={rep_id} cliente={cli_id} uf={uf or '-'} status={status}: "
+                f"esperado pedidos={esperado[0]} total={esperado[1]} | "
+                f"rollup pedidos={atual[0]} total={atual[1]}"
+            )
+
+        if opts["fix"]:
+            n = vendas_diarias.rebuild()
+            self.stdout.write(self.style.WARNING(f"⚠ {len(divergencias)} divergência(s); rollup reconstruído ({n} linhas)."))
+            return
+        raise CommandError(f"{len(divergencias)} divergência(s) entre VendaDiaria e Pedido.")
@@ -0,0 +1,47 @@
+# core/management/commands/import_precos.py
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import importacao
+from core.services.precos import ImportacaoPrecosErro, importar_precos
+
+
+class Command(BaseCommand):
+    help = "Importa uma lista de preços (XLSX/CSV com REF/SKU e PRECO) numa tabela de preço."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", required=True, help="Caminho do XLSX/CSV")
+        parser.add_argument("--tabela", required=True, help="Nome da TabelaDePreco")
+        parser.add_argument("--criar-tabela", action="store_true", help="Cria a tabela se não existir")
+        parser.add_argument("--chunk", type=int, default=5000, help="Linhas por lote gravado (bulk upsert)")
+
+    def handle(self, *args, **opts):
+        path = Path(opts["file"])
+        if not path.exists():
+            raise CommandError(f"Arquivo não encontrado: {path}")
+        if path.suffix.lower() in importacao.XLSX_SUFIXOS and not importacao.openpyxl:
+            raise CommandError("openpyxl não instalado. Adicione openpyxl no requirements ou use CSV.")
+
+        def ao_lote(n, resumo):
+            if opts["verbosity"] >= 2:
+                self.stdout.write(f"lote {n}: linhas={resumo['linhas']} gravados={resumo['gravados']}")
+
+        t0 = time.perf_counter()
+        try:
+            r = importar_precos(path, opts["tabela"], chunk=opts["chunk"],
+                                criar_tabela=opts["criar_tabela"], ao_lote=ao_lote)
+        except ImportacaoPrecosErro as e:
+            raise CommandError(str(e))
+        dt = time.perf_counter() - t0
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Import finalizado ({r['tabela']}). linhas={r['linhas']} gravados={r['gravados']} "
+                f"sem_preco={r['sem_preco']} skus_desconhecidos={r['skus_desconhecidos']} "
+                f"tempo={dt:.1f}s ({r['linhas'] / dt if dt else 0:.0f} linhas/s)"
+            )
+        )
+        if r["amostra_desconhecidos"]:
+            self.stdout.write(self.style.WARNING("SKUs desconhecidos (amostra): " + ", ".join(r["amostra_desconhecidos"])))
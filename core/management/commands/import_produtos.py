@@ -2,136 +2,168 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from core.models import Produto
+from core.services import busca, importacao
+from core.services.precos import invalidar_precos
+from core.services.importacao import em_lotes, ler_brutas, linha_produto, parse_bloco
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import csv
-import unicodedata
+import multiprocessing
+import time
 
-try:
-    import openpyxl  # type: ignore
-except Exception:  # pragma: no cover
-    openpyxl = None
-
-def strip_accents(s: str) -> str:
-    nfkd = unicodedata.normalize("NFD", s)
-    return "".join(c for c in nfkd if not unicodedata.combining(c))
-
-def norm_key(s: str) -> str:
-    s = strip_accents(str(s or "")).strip().lower()
-    for ch in (" ", ".", "-", "/", "\\"):
-        s = s.replace(ch, "_")
-    return s
-
-def as_text(v) -> str:
-    # Converte qualquer valor para string SEM perder 123.0 -> "123"
-    if v is None:
-        return ""
-    s = str(v).strip()
-    # openpyxl costuma trazer números como float
-    if s.endswith(".0"):
-        try:
-            if float(s).is_integer():
-                s = s[:-2]
-        except Exception:
-            pass
-    # Evitar notação científica
-    try:
-        if "e" in s.lower():
-            n = float(s)
-            if n.is_integer():
-                s = str(int(n))
-            else:
-                s = ("%.15f" % n).rstrip("0").rstrip(".")
-    except Exception:
-        pass
-    return s
-
-def as_decimal_text(v) -> str:
-    # Retorna string decimal com ponto como separador
-    if v is None or str(v).strip() == "":
-        return "0"
-    s = str(v).strip().replace(".", "").replace(",", ".")
-    try:
-        x = float(s)
-        return f"{x:.2f}"
-    except Exception:
-        return "0"
 
 class Command(BaseCommand):
     help = "Importa produtos a partir de XLSX ou CSV. Usa REF/SKU como chave (campo Produto.sku)."
 
     def add_arguments(self, parser):
         parser.add_argument("--file", required=True, help="Caminho do XLSX/CSV")
+        parser.add_argument("--chunk", type=int, default=2000, help="Linhas por lote gravado (bulk upsert)")
+        parser.add_argument(
+            "--workers", type=int, default=0,
+            help="Processos para ler/normalizar as linhas (0 = no próprio processo). A gravação é sempre única.",
+        )
+        parser.add_argument(
+            "--delta", action="store_true",
+            help="Só grava SKUs novos ou cujo conteúdo mudou desde a última importação (hash por SKU).",
+        )
+        parser.add_argument(
+            "--desativar-ausentes", action="store_true",
+            help="Marca ativo=False nos SKUs que não estão no arquivo e reativa os que voltaram.",
+        )
 
     @transaction.atomic
     def handle(self, *args, **opts):
         path = Path(opts["file"])
         if not path.exists():
             raise CommandError(f"Arquivo não encontrado: {path}")
+        if path.suffix.lower() in importacao.XLSX_SUFIXOS and not importacao.openpyxl:
+            raise CommandError("openpyxl não instalado. Adicione openpyxl no requirements ou use CSV.")
+        chunk = max(1, opts["chunk"])
+        self.verbosity = opts["verbosity"]
+        self.delta = opts["delta"]
+        self.reativar = opts["desativar_ausentes"]
+        vistos = set() if opts["desativar_ausentes"] else None
+        t0 = time.perf_counter()
 
-        # Carregar linhas
-        rows = []
-        if path.suffix.lower() in (".xlsx", ".xlsm", ".xltx", ".xltm"):
-            if not openpyxl:
-                raise CommandError("openpyxl não instalado. Adicione openpyxl no requirements ou use CSV.")
-            wb = openpyxl.load_workbook(path, data_only=True)
-            ws = wb.active
-            raw_headers = [c.value for c in next(ws.rows)]
-            headers = [norm_key(h) for h in raw_headers]
-            for r in ws.iter_rows(min_row=2):
-                data = [c.value for c in r]
-                rows.append({headers[i]: data[i] for i in range(len(headers))})
-        else:
-            # CSV (tenta detectar delimitador)
-            with path.open("r", encoding="utf-8-sig", newline="") as f:
-                sample = f.read(4096)
-                f.seek(0)
-                try:
-                    dialect = csv.Sniffer().sniff(sample, delimiters=";,\t,|")
-                except Exception:
-                    dialect = csv.excel
-                reader = csv.DictReader(f, dialect=dialect)
-                for row in reader:
-                    rows.append({norm_key(k): v for k, v in row.items()})
+        # Pipeline em streaming: arquivo -> blocos brutos -> (sku, campos) -> bulk upsert
+        self.tempos = defaultdict(float)
+        total = created = updated = unchanged = deactivated = 0
+        for n_lote, (itens, n_linhas) in enumerate(self._lotes(path, chunk, opts["workers"]), 1):
+            total += n_linhas
+            # SKU repetido no mesmo lote: vale a última linha (como no update_or_create)
+            lote = dict(itens)
+            if vistos is not None:
+                vistos.update(lote)
+            t = time.perf_counter()
+            c, u, s = self._gravar_lote(lote, n_lote)
+            self.tempos["escrita"] += time.perf_counter() - t
+            created += c; updated += u; unchanged += s
 
-        # helper para ler por múltiplos nomes de coluna
-        def get(row: dict, *keys):
-            for k in keys:
-                kk = norm_key(k)
-                if kk in row and row[kk] not in (None, ""):
-                    return row[kk]
-            return None
+        if vistos is not None:
+            t = time.perf_counter()
+            deactivated = self._desativar_ausentes(vistos, chunk)
+            self.tempos["desativacao"] += time.perf_counter() - t
+        if created or updated or deactivated:
+            invalidar_precos()  # bulk_create/update não disparam signals
 
-        total = created = updated = 0
-        for row in rows:
-            total += 1
-            # tenta ler REF/SKU/codigo...
-            ref = as_text(get(row, "ref", "sku", "codigo", "código", "referencia", "referência"))
-            descricao = as_text(get(row, "produto", "descricao", "descrição", "desc", "nome"))
-            preco_txt = as_decimal_text(get(row, "preco", "preço", "valor"))
+        dt = time.perf_counter() - t0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Import finalizado. total={total} criados={created} atualizados={updated} "
+                f"inalterados={unchanged} desativados={deactivated} "
+                f"tempo={dt:.1f}s ({total / dt if dt else 0:.0f} linhas/s)"
+            )
+        )
+        etapas = " ".join(f"{k}={v:.1f}s" for k, v in self.tempos.items())
+        self.stdout.write(f"Etapas: {etapas}")
 
-            if not ref:
-                # pula linha sem REF
-                continue
+    def _lotes(self, path, chunk, workers):
+        """
+        Gera (itens, nº de linhas lidas) por bloco de `chunk` linhas, na ordem do
+        arquivo. Com workers > 1 os blocos são normalizados num ProcessPoolExecutor
+        (no máximo 2 por worker em voo, para a memória continuar limitada).
+        """
+        headers, brutas = ler_brutas(path)
+        blocos = self._cronometrar("leitura", em_lotes(brutas, chunk))
+        if workers <= 1:
+            for bloco in blocos:
+                itens, n, dt = parse_bloco(linha_produto, headers, bloco)
+                self.tempos["parse"] += dt
+                yield itens, n
+            return
 
-            defaults = {"descricao": descricao or ref}
-            # Se o model tiver preco (DecimalField), tenta atualizar também:
-            if hasattr(Produto, "preco"):
-                try:
-                    from decimal import Decimal
-                    defaults["preco"] = Decimal(preco_txt)
-                except Exception:
-                    pass
+        # spawn: os filhos não herdam a conexão do banco aberta pela transação
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            pendentes = deque()
+            for bloco in blocos:
+                pendentes.append(pool.submit(parse_bloco, linha_produto, headers, bloco))
+                if len(pendentes) >= workers * 2:
+                    yield self._resultado(pendentes.popleft())
+            while pendentes:
+                yield self._resultado(pendentes.popleft())
 
-            obj, was_created = Produto.objects.update_or_create(
-                sku=ref, defaults=defaults
-            )
-            if was_created:
-                created += 1
-            else:
-                updated += 1
+    def _resultado(self, futuro):
+        t = time.perf_counter()
+        itens, n, dt = futuro.result()
+        self.tempos["espera_workers"] += time.perf_counter() - t
+        self.tempos["parse"] += dt  # soma do tempo gasto nos workers
+        return itens, n
 
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Import finalizado. total={total} criados={created} atualizados={updated}"
+    def _cronometrar(self, etapa, iteravel):
+        it = iter(iteravel)
+        while True:
+            t = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.tempos[etapa] += time.perf_counter() - t
+                return
+            self.tempos[etapa] += time.perf_counter() - t
+            yield item
+
+    def _gravar_lote(self, lote: dict[str, dict], n: int) -> tuple[int, int, int]:
+        """
+        INSERT ... ON CONFLICT (sku) DO UPDATE para o lote, atualizando os campos
+        que vieram do arquivo (os mesmos que entram no hash_importacao).
+        Com --delta, SKUs cujo hash não mudou ficam de fora; com
+        --desativar-ausentes, os inativos que voltaram ao arquivo também entram.
+        Retorna (criados, atualizados, inalterados).
+        """
+        existentes = {
+            sku: (h, ativo)
+            for sku, h, ativo in Produto.objects.filter(sku__in=list(lote))
+            .values_list("sku", "hash_importacao", "ativo")
+        }
+        if self.delta:
+            def mudou(sku, campos):
+                h, ativo = existentes.get(sku, (None, False))
+                return h != campos["hash_importacao"] or (self.reativar and not ativo)
+            lote = {sku: campos for sku, campos in lote.items() if mudou(sku, campos)}
+        update_fields = sorted({f for campos in lote.values() for f in campos})
+        objs = [Produto(sku=sku, **campos) for sku, campos in lote.items()]
+        if self.reativar:
+            update_fields.append("ativo")  # ativo=True (default) para os que voltaram ao arquivo
+        if objs:
+            Produto.objects.bulk_create(
+                objs, update_conflicts=True, unique_fields=["sku"], update_fields=update_fields,
             )
-        )
+            busca.indexar_produtos(Produto.objects.filter(sku__in=list(lote)))  # sem signals no bulk
+        updated = sum(1 for sku in lote if sku in existentes)
+        created = len(lote) - updated
+        unchanged = len(existentes) - updated
+        if self.verbosity >= 2 or (self.verbosity >= 1 and n % 10 == 1):
+            self.stdout.write(f"lote {n}: criados={created} atualizados={updated} inalterados={unchanged}")
+        return created, updated, unchanged
+
+    def _desativar_ausentes(self, vistos: set, chunk: int) -> int:
+        """ativo=False para os SKUs ativos no banco que não apareceram no arquivo."""
+        ausentes = [
+            pk for pk, sku in Produto.objects.filter(ativo=True).values_list("pk", "sku").iterator(chunk_size=chunk)
+            if sku not in vistos
+        ]
+        n = 0
+        for ids in em_lotes(ausentes, chunk):
+            n += Produto.objects.filter(pk__in=ids).update(ativo=False)
+            busca.indexar_produtos(Produto.objects.filter(pk__in=ids))
+        return n
@@ -0,0 +1,14 @@
+# core/management/commands/rebuild_busca.py
+from django.core.management.base import BaseCommand
+
+from core.services import busca
+
+
+class Command(BaseCommand):
+    help = "Recria o índice de busca (FTS5 no SQLite / pg_trgm no PostgreSQL) a partir de produtos e clientes."
+
+    def handle(self, *args, **opts):
+        r = busca.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice de busca reconstruído ({r['modo']}). produtos={r['produtos']} clientes={r['clientes']}"
+        ))
@@ -0,0 +1,12 @@
+# core/management/commands/rebuild_vendas_diarias.py
+from django.core.management.base import BaseCommand
+
+from core.services import vendas_diarias
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o rollup VendaDiaria a partir da tabela de pedidos."
+
+    def handle(self, *args, **opts):
+        n = vendas_diarias.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rollup reconstruído. linhas={n}"))
@@ -0,0 +1,90 @@
+# core/management/commands/run_jobs.py
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core.services import job_queue
+from core.views_jobs import _run_steps, build_steps
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker da fila de jobs: pega jobs 'queued' do banco e executa num pool limitado.\n"
+        "Mantém heartbeat dos jobs em execução e devolve à fila os de workers que caíram."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=2, help="Jobs simultâneos neste processo.")
+        parser.add_argument("--poll", type=float, default=1.0, help="Intervalo (s) de consulta à fila vazia.")
+        parser.add_argument("--once", action="store_true", help="Esvazia a fila e sai (útil em cron/testes).")
+
+    def handle(self, *args, **opts):
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.parar = threading.Event()      # para de pegar jobs novos
+        self.encerrado = threading.Event()  # pool vazio; encerra o heartbeat
+        self.rodando = {}  # job_id -> tipo
+        self.lock = threading.Lock()
+        concorrencia = max(1, opts["concurrency"])
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._sinal)
+
+        n = job_queue.recover_stale()
+        if n:
+            self.stdout.write(self.style.WARNING(f"↺ {n} job(s) parados devolvidos à fila"))
+        self.stdout.write(f"Worker {self.worker} (concurrency={concorrencia})")
+
+        hb = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        hb.start()
+
+        with ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="job") as pool:
+            while not self.parar.is_set():
+                with self.lock:
+                    livres = concorrencia - len(self.rodando)
+                job = job_queue.claim(self.worker) if livres > 0 else None
+                if job is None:
+                    if opts["once"] and not self.rodando:
+                        break
+                    self.parar.wait(opts["poll"])
+                    continue
+                with self.lock:
+                    self.rodando[job.pk] = job.type
+                self.stdout.write(f"→ {job.type} {job.pk}")
+                pool.submit(self._executar, job)
+            # saída do with: espera os jobs que já estão rodando
+        self.encerrado.set()
+        self.stdout.write("Worker finalizado.")
+
+    def _sinal(self, signum, frame):
+        self.stdout.write("Sinal recebido; aguardando jobs em execução...")
+        self.parar.set()
+
+    def _executar(self, job):
+        try:
+            _run_steps(job, build_steps(job.type, job))
+        finally:
+            with self.lock:
+                self.rodando.pop(job.pk, None)
+            connection.close()
+
+    def _heartbeat_loop(self):
+        intervalo = getattr(settings, "JOBS_HEARTBEAT_SEGUNDOS", 10)
+        ultimo_recover = time.monotonic()
+        while not self.encerrado.wait(intervalo):
+            close_old_connections()
+            try:
+                with self.lock:
+                    ids = list(self.rodando)
+                job_queue.heartbeat(ids, self.worker)
+                if time.monotonic() - ultimo_recover >= intervalo * 3:
+                    job_queue.recover_stale()
+                    ultimo_recover = time.monotonic()
+            except Exception as e:  # noqa
+                self.stderr.write(f"heartbeat falhou: {e}")
@@ -0,0 +1,56 @@
+# Generated by Django 5.1 on 2026-10-18 12:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def popular_rollup(apps, schema_editor):
+    Pedido = apps.get_model("core", "Pedido")
+    VendaDiaria = apps.get_model("core", "VendaDiaria")
+    linhas = (
+        Pedido.objects.annotate(dia=TruncDate("criado_em", tzinfo=timezone.get_current_timezone()))
+        .values("dia", "representante_id", "cliente_id", "cliente__uf", "status")
+        .annotate(n=Count("id"), s=Sum("total"))
+        .order_by()
+    )
+    VendaDiaria.objects.bulk_create(
+        [
+            VendaDiaria(
+                dia=r["dia"], representante_id=r["representante_id"], cliente_id=r["cliente_id"],
+                uf=r["cliente__uf"] or "", status=r["status"], pedidos=r["n"], total=r["s"] or 0,
+            )
+            for r in linhas.iterator()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_job_joblog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('uf', models.CharField(blank=True, max_length=2)),
+                ('status', models.CharField(choices=[('RASCUNHO', 'Rascunho'), ('ENVIADO', 'Enviado'), ('APROVADO', 'Aprovado'), ('REJEITADO', 'Rejeitado')], max_length=20)),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.cliente')),
+                ('representante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.representante')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dia'], name='core_vendad_dia_e67954_idx')],
+                'unique_together': {('dia', 'representante', 'cliente', 'uf', 'status')},
+            },
+        ),
+        migrations.RunPython(popular_rollup, migrations.RunPython.noop),
+    ]
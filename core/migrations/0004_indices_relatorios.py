@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-18 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_vendadiaria'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['criado_em'], include=('total', 'status', 'representante', 'cliente'), name='pedido_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['representante', 'criado_em'], name='pedido_rep_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['status', 'criado_em'], name='pedido_status_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['cliente', 'criado_em'], name='pedido_cliente_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendadiaria',
+            index=models.Index(fields=['representante', 'dia'], name='vendadiaria_rep_dia_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_job_fila'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='hash_importacao',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+    ]
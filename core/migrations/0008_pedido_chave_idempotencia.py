@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_contador'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='chave_idempotencia',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_pedido_chave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['nome', 'id'], name='cliente_nome_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='joblog',
+            index=models.Index(fields=['job', 'ts', 'id'], name='joblog_job_ts_idx'),
+        ),
+    ]
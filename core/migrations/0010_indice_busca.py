@@ -0,0 +1,138 @@
+# Generated by Django 5.1 on 2026-10-18 13:22
+
+import re
+import unicodedata
+
+from django.db import DatabaseError, migrations, models, transaction
+
+# Autocontida: a estrutura e a normalização abaixo são cópias do que
+# core.services.busca fazia quando esta migração foi escrita. O serviço pode
+# mudar depois; `manage.py rebuild_busca` recria tudo com a versão atual.
+
+TIPOS = ("produto", "cliente")
+TRIGGERS = ("core_indicebusca_ai", "core_indicebusca_ad", "core_indicebusca_au")
+_NAO_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def _fts(tipo):
+    return f"core_indicebusca_fts_{tipo}"
+
+
+def _sql_fts5():
+    def inserir(linha):
+        return "".join(
+            f"INSERT INTO {_fts(t)}(rowid, texto) SELECT {linha}.id, {linha}.texto WHERE {linha}.tipo = '{t}'; "
+            for t in TIPOS
+        )
+
+    def apagar(linha):
+        return "".join(
+            f"INSERT INTO {_fts(t)}({_fts(t)}, rowid, texto) "
+            f"SELECT 'delete', {linha}.id, {linha}.texto WHERE {linha}.tipo = '{t}'; "
+            for t in TIPOS
+        )
+
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {_fts(t)} USING fts5(texto, content='', prefix='2 3')" for t in TIPOS
+    ] + [
+        f"CREATE TRIGGER IF NOT EXISTS core_indicebusca_ai AFTER INSERT ON core_indicebusca BEGIN {inserir('new')}END",
+        f"CREATE TRIGGER IF NOT EXISTS core_indicebusca_ad AFTER DELETE ON core_indicebusca BEGIN {apagar('old')}END",
+        f"CREATE TRIGGER IF NOT EXISTS core_indicebusca_au AFTER UPDATE ON core_indicebusca BEGIN "
+        f"{apagar('old')}{inserir('new')}END",
+    ]
+
+
+SQL_CRIAR = {
+    "sqlite": _sql_fts5,
+    "postgresql": lambda: [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS core_indicebusca_texto_trgm ON core_indicebusca USING gin (texto gin_trgm_ops)",
+    ],
+}
+SQL_REMOVER = {
+    "sqlite": [f"DROP TRIGGER IF EXISTS {t}" for t in TRIGGERS] + [f"DROP TABLE IF EXISTS {_fts(t)}" for t in TIPOS],
+    "postgresql": ["DROP INDEX IF EXISTS core_indicebusca_texto_trgm"],
+}
+
+
+def normalizar(s):
+    nfkd = unicodedata.normalize("NFD", str(s or ""))
+    return _NAO_ALNUM.sub(" ", "".join(c for c in nfkd if not unicodedata.combining(c)).lower()).strip()
+
+
+def _juntar(*partes):
+    return " ".join(dict.fromkeys(p for p in partes if p))
+
+
+def texto_produto(sku, descricao, familia):
+    sku_n = normalizar(sku)
+    return _juntar(sku_n, sku_n.replace(" ", ""), normalizar(descricao), normalizar(familia))
+
+
+def texto_cliente(codigo, nome, cnpj, cidade, uf):
+    return _juntar(normalizar(codigo), normalizar(nome), re.sub(r"\D", "", cnpj or ""), normalizar(cidade), normalizar(uf))
+
+
+def criar_estrutura(apps, schema_editor):
+    conn = schema_editor.connection
+    sqls = SQL_CRIAR.get(conn.vendor, list)()
+    if not sqls:
+        return
+    try:
+        with transaction.atomic(using=conn.alias), conn.cursor() as cur:
+            for sql in sqls:
+                cur.execute(sql)
+    except DatabaseError:
+        pass  # SQLite sem FTS5 / usuário sem permissão para CREATE EXTENSION: modo LIKE
+
+
+def remover_estrutura(apps, schema_editor):
+    conn = schema_editor.connection
+    with conn.cursor() as cur:
+        for sql in SQL_REMOVER.get(conn.vendor, []):
+            cur.execute(sql)
+
+
+def popular_indice(apps, schema_editor):
+    Produto = apps.get_model("core", "Produto")
+    Cliente = apps.get_model("core", "Cliente")
+    IndiceBusca = apps.get_model("core", "IndiceBusca")
+    produtos = Produto.objects.values_list("pk", "sku", "descricao", "familia", "ativo")
+    clientes = Cliente.objects.values_list("pk", "codigo", "nome", "cnpj", "cidade", "uf")
+    objs = [
+        IndiceBusca(tipo="produto", objeto_id=pk, texto=texto_produto(sku, descricao, familia),
+                    rotulo=f"{sku} - {descricao}"[:200], ativo=ativo)
+        for pk, sku, descricao, familia, ativo in produtos.iterator(chunk_size=2000)
+    ] + [
+        IndiceBusca(tipo="cliente", objeto_id=pk, texto=texto_cliente(codigo, nome, cnpj, cidade, uf),
+                    rotulo=f"{codigo} - {nome}"[:200])
+        for pk, codigo, nome, cnpj, cidade, uf in clientes.iterator(chunk_size=2000)
+    ]
+    # os triggers do FTS5 (criados antes) indexam as linhas inseridas aqui
+    IndiceBusca.objects.bulk_create(objs, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_indices_paginacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndiceBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('produto', 'Produto'), ('cliente', 'Cliente')], max_length=10)),
+                ('objeto_id', models.BigIntegerField()),
+                ('texto', models.TextField()),
+                ('rotulo', models.CharField(max_length=200)),
+                ('ativo', models.BooleanField(default=True)),
+            ],
+            options={
+                'unique_together': {('tipo', 'objeto_id')},
+            },
+        ),
+        migrations.RunPython(criar_estrutura, remover_estrutura),
+        migrations.RunPython(popular_indice, migrations.RunPython.noop),
+    ]
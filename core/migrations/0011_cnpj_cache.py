@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-18 13:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_indice_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CnpjCache',
+            fields=[
+                ('cnpj', models.CharField(max_length=14, primary_key=True, serialize=False)),
+                ('dados', models.JSONField(blank=True, null=True)),
+                ('erro', models.CharField(blank=True, max_length=200)),
+                ('status_http', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('consultado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expira_em', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1 on 2026-10-18 13:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_cnpj_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobArquivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('papel', models.CharField(choices=[('entrada', 'Entrada'), ('saida', 'Saída')], max_length=10)),
+                ('nome', models.CharField(max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=120)),
+                ('tamanho', models.PositiveBigIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='arquivos', to='core.job')),
+            ],
+            options={
+                'unique_together': {('job', 'papel')},
+            },
+        ),
+        migrations.CreateModel(
+            name='JobArquivoParte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('n', models.PositiveIntegerField()),
+                ('dados', models.BinaryField()),
+                ('arquivo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='partes', to='core.jobarquivo')),
+            ],
+            options={
+                'unique_together': {('arquivo', 'n')},
+            },
+        ),
+    ]
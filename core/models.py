@@ -1,3 +1,5 @@
+from decimal import Decimal, ROUND_HALF_UP
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -16,6 +18,10 @@ class Cliente(models.Model):
     cidade = models.CharField(max_length=80, blank=True)
     uf = models.CharField(max_length=2, blank=True)
 
+    class Meta:
+        # listagem paginada por cursor (nome, id)
+        indexes = [models.Index(fields=["nome", "id"], name="cliente_nome_id_idx")]
+
     def __str__(self):
         return f"{self.codigo} - {self.nome}"
 
@@ -24,6 +30,8 @@ class Produto(models.Model):
     descricao = models.CharField(max_length=160)
     familia = models.CharField(max_length=60, blank=True)
     ativo = models.BooleanField(default=True)
+    # hash dos campos normalizados na última importação (import_produtos --delta)
+    hash_importacao = models.CharField(max_length=40, blank=True, default="", editable=False)
 
     def __str__(self):
         return f"{self.sku} - {self.descricao}"
@@ -56,6 +64,20 @@ class Pedido(models.Model):
     status = models.CharField(max_length=20, choices=STATUS, default='RASCUNHO')
     total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
     criado_em = models.DateTimeField(auto_now_add=True)
+    # enviada pelo app offline: reenviar o mesmo pedido não cria outro
+    chave_idempotencia = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        # formatos das consultas de relatório (período + rep/status/cliente) e da listagem
+        indexes = [
+            models.Index(
+                fields=["criado_em"], name="pedido_criado_idx",
+                include=["total", "status", "representante", "cliente"],  # INCLUDE só no PostgreSQL
+            ),
+            models.Index(fields=["representante", "criado_em"], name="pedido_rep_criado_idx"),
+            models.Index(fields=["status", "criado_em"], name="pedido_status_criado_idx"),
+            models.Index(fields=["cliente", "criado_em"], name="pedido_cliente_criado_idx"),
+        ]
 
     def __str__(self):
         return f"Pedido {self.numero} - {self.cliente.nome}"
@@ -68,8 +90,14 @@ class ItemPedido(models.Model):
     desconto = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
 
+    @staticmethod
+    def calcular_subtotal(qtd, preco_unit, desconto) -> Decimal:
+        """qtd * preço com desconto percentual, em centavos (usado também no bulk_create)."""
+        qtd, preco_unit, desconto = (Decimal(str(v or 0)) for v in (qtd, preco_unit, desconto))
+        return (qtd * preco_unit * (1 - desconto / 100)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
     def save(self, *args, **kwargs):
-        self.subtotal = (self.qtd * self.preco_unit) * (1 - (self.desconto / 100))
+        self.subtotal = self.calcular_subtotal(self.qtd, self.preco_unit, self.desconto)
         super().save(*args, **kwargs)
 
         # === JOBS & LOGS ==================================================================
@@ -96,8 +124,14 @@ class Job(models.Model):
     started_at = models.DateTimeField(blank=True, null=True)
     finished_at = models.DateTimeField(blank=True, null=True)
 
+    # fila (manage.py run_jobs)
+    worker = models.CharField(max_length=120, blank=True)  # host:pid que pegou o job
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"], name="job_status_created_idx")]
 
     def __str__(self):
         return f"{self.name} [{self.status}]"
@@ -111,7 +145,131 @@ class JobLog(models.Model):
 
     class Meta:
         ordering = ["-ts", "-id"]
+        # logs de um job paginados por cursor (-ts, -id)
+        indexes = [models.Index(fields=["job", "ts", "id"], name="joblog_job_ts_idx")]
 
     def __str__(self):
         return f"{self.ts:%Y-%m-%d %H:%M:%S} {self.level}: {self.message[:60]}"
 
+
+class JobArquivo(models.Model):
+    """
+    Arquivo de um job guardado no banco (core.services.arquivos_jobs): upload à
+    espera do worker (entrada) ou arquivo gerado para download (saída). O web e
+    o worker não precisam compartilhar disco.
+    """
+    class Papel(models.TextChoices):
+        ENTRADA = "entrada", "Entrada"
+        SAIDA   = "saida",   "Saída"
+
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="arquivos")
+    papel = models.CharField(max_length=10, choices=Papel.choices)
+    nome = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=120, blank=True)
+    tamanho = models.PositiveBigIntegerField(default=0)
+    criado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ("job", "papel")
+
+    def __str__(self):
+        return f"{self.nome} ({self.papel}, {self.tamanho} bytes)"
+
+
+class JobArquivoParte(models.Model):
+    """Bloco de até JOBS_ARQUIVO_PARTE_BYTES de um JobArquivo, na ordem `n`."""
+    arquivo = models.ForeignKey(JobArquivo, on_delete=models.CASCADE, related_name="partes")
+    n = models.PositiveIntegerField()
+    dados = models.BinaryField()
+
+    class Meta:
+        unique_together = ("arquivo", "n")
+
+
+
+# === ROLLUP DE VENDAS =============================================================
+
+class VendaDiaria(models.Model):
+    """
+    Agregado diário de pedidos (mantido por core.signals e reconstruído por
+    `manage.py rebuild_vendas_diarias`). Os relatórios leem daqui em vez de
+    varrer Pedido para o período inteiro.
+    """
+    dia = models.DateField()
+    representante = models.ForeignKey(Representante, on_delete=models.CASCADE)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
+    uf = models.CharField(max_length=2, blank=True)
+    status = models.CharField(max_length=20, choices=Pedido.STATUS)
+    pedidos = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ("dia", "representante", "cliente", "uf", "status")
+        indexes = [
+            models.Index(fields=["dia"]),
+            models.Index(fields=["representante", "dia"], name="vendadiaria_rep_dia_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.representante_id}/{self.cliente_id} {self.status}: {self.total}"
+
+
+# === CONTADORES ===================================================================
+
+class Contador(models.Model):
+    """
+    Contador nomeado e compartilhado entre processos (ver core.services.contadores).
+    Ex.: "precos" é a versão dos preços; cada processo compara com a sua cópia
+    para saber quando descartar o cache local.
+    """
+    nome = models.CharField(max_length=60, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nome}={self.valor}"
+
+
+# === BUSCA ========================================================================
+
+class IndiceBusca(models.Model):
+    """
+    Texto de busca normalizado (minúsculo, sem acento) de produtos e clientes,
+    mantido por core.signals, pelas importações e por `manage.py rebuild_busca`.
+    No SQLite é espelhado numa tabela FTS5 (core_indicebusca_fts, via
+    triggers); no PostgreSQL tem índice GIN de trigramas (pg_trgm).
+    Ver core.services.busca.
+    """
+    PRODUTO = "produto"
+    CLIENTE = "cliente"
+    TIPOS = [(PRODUTO, "Produto"), (CLIENTE, "Cliente")]
+
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    objeto_id = models.BigIntegerField()
+    texto = models.TextField()
+    rotulo = models.CharField(max_length=200)  # exibido no autocomplete
+    ativo = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ("tipo", "objeto_id")
+
+    def __str__(self):
+        return f"{self.tipo}:{self.objeto_id} {self.rotulo}"
+
+
+# === CACHE DE CNPJ ================================================================
+
+class CnpjCache(models.Model):
+    """
+    Consulta de CNPJ na BrasilAPI já normalizada (ver core.services.cnpj).
+    Com `erro` preenchido é cache negativo (CNPJ inexistente/falha), com
+    validade menor; `dados` pode continuar guardando a última resposta boa.
+    """
+    cnpj = models.CharField(max_length=14, primary_key=True)
+    dados = models.JSONField(blank=True, null=True)
+    erro = models.CharField(max_length=200, blank=True)
+    status_http = models.PositiveSmallIntegerField(blank=True, null=True)
+    consultado_em = models.DateTimeField(default=timezone.now)
+    expira_em = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.cnpj} ({'erro' if self.erro else 'ok'} até {self.expira_em:%Y-%m-%d %H:%M})"
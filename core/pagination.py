@@ -0,0 +1,45 @@
+"""
+Paginação por cursor (keyset) das listagens da API.
+
+Em vez de COUNT(*) + OFFSET, cada página filtra a partir da última linha da
+anterior (WHERE criado_em < ... ORDER BY ... LIMIT n): a página 100 custa o
+mesmo que a primeira e não há consulta de contagem. A resposta traz
+{next, previous, results}; o cliente segue as URLs de next/previous.
+
+A ordenação precisa ser estável e coberta por índice; o primeiro campo é a
+posição do cursor e os seguintes só desempatam. Não há paginação padrão em
+REST_FRAMEWORK: só as listagens que definem pagination_class mudam de formato.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class CursorPadrao(CursorPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("-id",)
+
+
+class PedidoCursor(CursorPadrao):
+    ordering = ("-criado_em", "-id")
+
+
+class ItemPedidoCursor(CursorPadrao):
+    ordering = ("id",)
+
+
+class ProdutoCursor(CursorPadrao):
+    ordering = ("sku",)
+
+
+class ClienteCursor(CursorPadrao):
+    ordering = ("nome", "id")
+
+
+class JobCursor(CursorPadrao):
+    page_size = 20
+    ordering = ("-created_at", "-id")
+
+
+class JobLogCursor(CursorPadrao):
+    ordering = ("-ts", "-id")
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Cliente, Produto, TabelaDePreco, Preco, Pedido, ItemPedido
+from .services.pedidos import numero_invalido, soma_itens
 
 class ClienteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -28,11 +29,13 @@ class ItemPedidoSerializer(serializers.ModelSerializer):
         read_only_fields = ("subtotal",)
 
     def validate(self, data):
-        if data["qtd"] <= 0:
+        # PATCH: campos ausentes valem o que já está no item
+        atual = lambda k, padrao=0: data.get(k, getattr(self.instance, k, padrao))
+        if atual("qtd") <= 0:
             raise serializers.ValidationError("Quantidade deve ser > 0")
-        if data["preco_unit"] < 0:
+        if atual("preco_unit") < 0:
             raise serializers.ValidationError("Preço unitário inválido")
-        if data["desconto"] < 0 or data["desconto"] > 100:
+        if atual("desconto") < 0 or atual("desconto") > 100:
             raise serializers.ValidationError("Desconto deve estar entre 0 e 100")
         return data
 
@@ -44,15 +47,23 @@ class PedidoSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ("total",)
 
+    def validate_numero(self, value):
+        # PV-00000000 é da numeração automática (core.services.pedidos)
+        if self.instance is not None and value == self.instance.numero:
+            return value
+        erro = numero_invalido(value)
+        if erro:
+            raise serializers.ValidationError(erro)
+        return value
+
     def recalc_total(self, instance: Pedido):
-        total = sum(i.subtotal for i in instance.itens.all())
-        instance.total = total
-        instance.save(update_fields=["total"])
+        # soma no banco (uma consulta); só grava se divergiu
+        total = soma_itens(instance.pk)
+        if total != instance.total:
+            instance.total = total
+            instance.save(update_fields=["total"])
 
-    def create(self, validated_data):
-        pedido = super().create(validated_data)
-        self.recalc_total(pedido)
-        return pedido
+    # create: pedido novo não tem itens (itens é read_only), o total é 0
 
     def update(self, instance, validated_data):
         pedido = super().update(instance, validated_data)
@@ -0,0 +1,294 @@
+"""
+Acompanhamento de jobs ao vivo por Server-Sent Events.
+
+stream_job() e stream_jobs() são geradores assíncronos com o corpo de
+GET /api/jobs/<id>/stream/ e GET /api/jobs/stream/ (core.views_jobs). Eventos:
+
+- "job": estado do job (status, progresso, resultado);
+- "log": uma linha de JobLog, com `id:` = JobLog.id. O navegador reenvia o
+  último no cabeçalho Last-Event-ID ao reconectar e o stream continua dali;
+- "fim": o job terminou e todos os logs foram enviados.
+
+O banco é consultado por uma Central por processo, não por conexão: a cada
+JOBS_SSE_INTERVALO_MS ela faz uma consulta de estados (jobs acompanhados +
+ativos/recém-terminados, se alguém acompanha a lista) e uma de logs novos, e
+distribui o resultado nas filas dos assinantes. Dez administradores olhando o
+mesmo job custam as mesmas duas consultas por intervalo que um.
+
+Servido sob ASGI (uvicorn), cada conexão parada é só uma corrotina esperando
+a fila. Sob WSGI (runserver) o stream manda o que há e termina; o navegador
+reconecta depois de `retry` ms com o Last-Event-ID, o que vira um polling
+pelo cursor.
+"""
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Job, JobLog
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_JOB = ("id", "name", "type", "status", "progress", "result", "created_at", "started_at", "finished_at")
+FINAIS = (Job.Status.SUCCESS, Job.Status.ERROR)
+ATIVOS = (Job.Status.QUEUED, Job.Status.RUNNING)
+LOGS_POR_CONSULTA = 500
+FOLGA_TERMINADOS = timedelta(seconds=5)  # finished_at gravado pelo worker antes do commit
+FILA_MAX = 1000  # eventos pendentes por assinante; passou disso, ele reconecta
+
+
+def _intervalo() -> float:
+    return getattr(settings, "JOBS_SSE_INTERVALO_MS", 1000) / 1000
+
+
+def evento(tipo: str, dados, id_: int | None = None) -> str:
+    linhas = [f"id: {id_}"] if id_ is not None else []
+    linhas += [f"event: {tipo}", "data: " + json.dumps(dados, cls=DjangoJSONEncoder, ensure_ascii=False)]
+    return "\n".join(linhas) + "\n\n"
+
+
+def _estado(j: dict) -> dict:
+    return {**j, "id": str(j["id"])}
+
+
+def _log(l: dict) -> dict:
+    return {"id": l["id"], "job": str(l["job_id"]), "ts": l["ts"], "level": l["level"], "message": l["message"]}
+
+
+# ---------- Consultas ----------
+
+def estado_job(job_id) -> dict | None:
+    j = Job.objects.filter(pk=job_id).values(*CAMPOS_JOB).first()
+    return _estado(j) if j else None
+
+
+def logs_desde(job_id, ultimo_id: int, limite: int = LOGS_POR_CONSULTA) -> list[dict]:
+    qs = (
+        JobLog.objects.filter(job_id=job_id, id__gt=ultimo_id).order_by("id")
+        .values("id", "job_id", "ts", "level", "message")[:limite]
+    )
+    return [_log(l) for l in qs]
+
+
+def jobs_recentes(n: int = 20) -> list[dict]:
+    """Os últimos `n` jobs criados e todos os ativos (estado inicial da lista)."""
+    recentes = Job.objects.order_by("-created_at", "-id").values_list("pk", flat=True)[:n]
+    qs = Job.objects.filter(Q(pk__in=list(recentes)) | Q(status__in=ATIVOS)).order_by("-created_at", "-id")
+    return [_estado(j) for j in qs.values(*CAMPOS_JOB)]
+
+
+# ---------- Central ----------
+
+class Central:
+    """
+    Um laço por processo (e event loop) que consulta o banco pelos assinantes.
+    assinar(job_id) acompanha um job (estado + logs); assinar(None), a lista.
+    """
+
+    def __init__(self):
+        self.filas: dict[str | None, set[asyncio.Queue]] = {}
+        self.cursores: dict[str, int] = {}  # último JobLog.id distribuído por job
+        self.estados: dict[str, dict] = {}
+        self.desde = None
+        self.ticks = 0
+        self._tarefa: asyncio.Task | None = None
+        self._loop = None
+        # uma thread e uma conexão com o banco para as consultas da central
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-sse")
+
+    def assinar(self, job_id: str | None, ultimo_log: int = 0) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:  # outro event loop (checagens): começa do zero
+            self.filas, self.cursores, self.estados, self._tarefa = {}, {}, {}, None
+            self._loop = loop
+        fila = asyncio.Queue(maxsize=FILA_MAX)
+        self.filas.setdefault(job_id, set()).add(fila)
+        if job_id is not None:
+            # a distribuição começa no cursor de quem chegou; o assinante
+            # completa o intervalo com a própria consulta e descarta repetidos
+            self.cursores[job_id] = min(self.cursores.get(job_id, ultimo_log), ultimo_log)
+        if self._tarefa is None or self._tarefa.done():
+            self._tarefa = loop.create_task(self._laco())
+        return fila
+
+    def cancelar(self, job_id: str | None, fila: asyncio.Queue):
+        filas = self.filas.get(job_id)
+        if filas is not None:
+            filas.discard(fila)
+            if not filas:
+                del self.filas[job_id]
+                self.cursores.pop(job_id, None)
+
+    async def _laco(self):
+        loop = asyncio.get_running_loop()
+        while self.filas:
+            inicio = time.monotonic()
+            jobs = [j for j in self.filas if j is not None]
+            todos = None in self.filas
+            try:
+                estados, logs = await loop.run_in_executor(
+                    self._executor, self._consultar, jobs, dict(self.cursores), todos)
+            except Exception:  # noqa
+                logger.exception("jobs-sse: consulta falhou")
+                await loop.run_in_executor(self._executor, connections.close_all)
+            else:
+                self.ticks += 1
+                self._distribuir(estados, logs)
+            await asyncio.sleep(max(_intervalo() - (time.monotonic() - inicio), 0.05))
+
+    def _consultar(self, jobs: list[str], cursores: dict[str, int], todos: bool):
+        agora = timezone.now()
+        filtro = Q(pk__in=jobs)
+        if todos:
+            desde = (self.desde or agora) - FOLGA_TERMINADOS
+            filtro |= Q(status__in=ATIVOS) | Q(finished_at__gte=desde)
+        self.desde = agora
+        estados = [_estado(j) for j in Job.objects.filter(filtro).values(*CAMPOS_JOB)]
+        logs = []
+        if jobs:
+            q = Q()
+            for j in jobs:
+                q |= Q(job_id=j, id__gt=cursores.get(j, 0))
+            logs = [_log(l) for l in JobLog.objects.filter(q).order_by("id")
+                    .values("id", "job_id", "ts", "level", "message")[:LOGS_POR_CONSULTA]]
+        return estados, logs
+
+    def _entregar(self, job_id, msg):
+        for fila in list(self.filas.get(job_id, ())):
+            try:
+                fila.put_nowait(msg)
+            except asyncio.QueueFull:
+                # descarta tudo (sem buracos no meio dos logs): o stream fecha
+                # e o navegador reconecta com o Last-Event-ID do que já recebeu
+                self.cancelar(job_id, fila)
+                while not fila.empty():
+                    fila.get_nowait()
+                fila.put_nowait(("atrasado", None))
+
+    def _distribuir(self, estados: list[dict], logs: list[dict]):
+        novos = {}
+        for e in estados:
+            novos[e["id"]] = e
+            if self.estados.get(e["id"]) != e:
+                self._entregar(e["id"], ("job", e))
+                self._entregar(None, ("job", e))
+        self.estados = novos
+        for l in logs:
+            if l["job"] in self.cursores:
+                self.cursores[l["job"]] = max(self.cursores[l["job"]], l["id"])
+            self._entregar(l["job"], ("log", l))
+
+
+central = Central()
+
+
+# ---------- Streams ----------
+
+def _db(fn, *args):
+    return sync_to_async(fn)(*args)
+
+
+async def _logs(job_id, ultimo_log: int):
+    """(evento, id) dos logs depois de `ultimo_log`, em lotes até alcançar o banco."""
+    while True:
+        lote = await _db(logs_desde, job_id, ultimo_log)
+        for l in lote:
+            ultimo_log = l["id"]
+            yield evento("log", l, l["id"]), ultimo_log
+        if len(lote) < LOGS_POR_CONSULTA:
+            return
+
+
+async def stream_job(job_id: str, ultimo_log: int = 0, ao_vivo: bool = True):
+    """
+    Corpo do stream de um job: estado, logs depois de `ultimo_log` e, com
+    `ao_vivo`, as mudanças até o fim do job (ou JOBS_SSE_MAX_SEGUNDOS).
+    """
+    limite = time.monotonic() + getattr(settings, "JOBS_SSE_MAX_SEGUNDOS", 300)
+    ping = getattr(settings, "JOBS_SSE_PING_SEGUNDOS", 15)
+    yield f"retry: {getattr(settings, 'JOBS_SSE_RETRY_MS', 2000)}\n\n"
+    estado = await _db(estado_job, job_id)
+    if estado is None:
+        return
+    yield evento("job", estado)
+    async for ev, ultimo_log in _logs(job_id, ultimo_log):
+        yield ev
+    if estado["status"] in FINAIS:
+        yield evento("fim", {"status": estado["status"]})
+        return
+    if not ao_vivo:
+        return
+
+    fila = central.assinar(job_id, ultimo_log)
+    try:
+        # o que mudou entre as consultas acima e a assinatura
+        atual = await _db(estado_job, job_id)
+        pendentes = [("job", atual)] if atual and atual != estado else []
+        async for ev, ultimo_log in _logs(job_id, ultimo_log):
+            yield ev
+
+        while time.monotonic() < limite:
+            if pendentes:
+                tipo, dados = pendentes.pop()
+            else:
+                try:
+                    tipo, dados = await asyncio.wait_for(fila.get(), timeout=ping)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+            if tipo == "atrasado":
+                return
+            if tipo == "log":
+                if dados["id"] > ultimo_log:
+                    ultimo_log = dados["id"]
+                    yield evento("log", dados, dados["id"])
+            elif dados != estado:
+                estado = dados
+                yield evento("job", estado)
+                if estado["status"] in FINAIS:
+                    # os últimos logs são gravados logo depois do status (JobContext.__exit__)
+                    await asyncio.sleep(_intervalo())
+                    async for ev, ultimo_log in _logs(job_id, ultimo_log):
+                        yield ev
+                    yield evento("fim", {"status": estado["status"]})
+                    return
+    finally:
+        central.cancelar(job_id, fila)
+
+
+async def stream_jobs(ao_vivo: bool = True):
+    """Corpo do stream da lista: estado dos jobs recentes/ativos e cada mudança depois."""
+    limite = time.monotonic() + getattr(settings, "JOBS_SSE_MAX_SEGUNDOS", 300)
+    ping = getattr(settings, "JOBS_SSE_PING_SEGUNDOS", 15)
+    yield f"retry: {getattr(settings, 'JOBS_SSE_RETRY_MS', 2000)}\n\n"
+    fila = central.assinar(None) if ao_vivo else None
+    try:
+        enviados = {}
+        for e in await _db(jobs_recentes):
+            enviados[e["id"]] = e
+            yield evento("job", e)
+        if fila is None:
+            return
+        while time.monotonic() < limite:
+            try:
+                tipo, dados = await asyncio.wait_for(fila.get(), timeout=ping)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if tipo == "atrasado":
+                return
+            if enviados.get(dados["id"]) != dados:
+                enviados[dados["id"]] = dados
+                yield evento("job", dados)
+    finally:
+        if fila is not None:
+            central.cancelar(None, fila)
@@ -0,0 +1,70 @@
+"""
+Arquivos dos jobs guardados no banco (JobArquivo + JobArquivoParte).
+
+O web e o worker (manage.py run_jobs) rodam em máquinas diferentes no Render,
+sem disco compartilhado: o upload que o worker vai ler e o arquivo que ele gera
+para download passam pelo banco, em partes de até JOBS_ARQUIVO_PARTE_BYTES.
+Gravar e ler vão parte a parte, então só um bloco fica em memória.
+"""
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from core.models import Job, JobArquivo, JobArquivoParte
+
+
+def _tamanho_parte() -> int:
+    return getattr(settings, "JOBS_ARQUIVO_PARTE_BYTES", 1024 * 1024)
+
+
+def gravar(job: Job, papel: str, nome: str, blocos, content_type: str = "") -> JobArquivo:
+    """
+    Grava os `blocos` (iterável de bytes) como o arquivo `papel` do job,
+    substituindo o anterior (o job pode ter voltado à fila e rodado de novo).
+    """
+    limite = _tamanho_parte()
+    with transaction.atomic():
+        JobArquivo.objects.filter(job=job, papel=papel).delete()
+        arq = JobArquivo.objects.create(job=job, papel=papel, nome=nome, content_type=content_type)
+        buffer, n, tamanho = bytearray(), 0, 0
+        for bloco in blocos:
+            buffer += bloco
+            while len(buffer) >= limite:
+                JobArquivoParte.objects.create(arquivo=arq, n=n, dados=bytes(buffer[:limite]))
+                del buffer[:limite]
+                n, tamanho = n + 1, tamanho + limite
+        if buffer:
+            JobArquivoParte.objects.create(arquivo=arq, n=n, dados=bytes(buffer))
+            tamanho += len(buffer)
+        arq.tamanho = tamanho
+        arq.save(update_fields=["tamanho"])
+    return arq
+
+
+def buscar(job, papel: str) -> JobArquivo | None:
+    return JobArquivo.objects.filter(job=job, papel=papel).first()
+
+
+def ler(arq: JobArquivo):
+    """Gera o conteúdo do arquivo parte a parte (uma consulta por parte)."""
+    ids = list(arq.partes.order_by("n").values_list("pk", flat=True))
+    for pk in ids:
+        # psycopg devolve memoryview para bytea
+        yield bytes(JobArquivoParte.objects.values_list("dados", flat=True).get(pk=pk))
+
+
+@contextmanager
+def em_disco(arq: JobArquivo):
+    """Copia o arquivo para um temporário local (mesma extensão) e devolve o caminho."""
+    with tempfile.NamedTemporaryFile(suffix=Path(arq.nome).suffix.lower()) as f:
+        for bloco in ler(arq):
+            f.write(bloco)
+        f.flush()
+        yield f.name
+
+
+def apagar(job, papel: str) -> None:
+    JobArquivo.objects.filter(job=job, papel=papel).delete()
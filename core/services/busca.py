@@ -0,0 +1,297 @@
+"""
+Busca de produtos e clientes (autocomplete e ?search= das listagens).
+
+IndiceBusca guarda, por objeto, o texto já normalizado (minúsculo, sem
+acento, só letras e números), então "acucar" acha "Açúcar" e "abc123" acha o
+SKU "ABC-123". A consulta usa o índice do banco em vez de LIKE '%x%' em
+várias colunas:
+
+- SQLite: uma tabela FTS5 por tipo (core_indicebusca_fts_<tipo>, sem
+  conteúdo próprio, mantida por triggers); cada termo é buscado como
+  prefixo de palavra, ranking bm25 sobre os primeiros CANDIDATOS_FTS;
+- PostgreSQL: LIKE '%termo%' por termo, coberto pelo índice GIN de
+  trigramas (pg_trgm), ranking por similarity();
+- sem FTS5 nem pg_trgm: o mesmo LIKE, sem índice (mais lento).
+
+Em todos, quem começa com a busca inteira (ex.: o SKU digitado) vem primeiro.
+
+O índice é atualizado pelos signals de Produto/Cliente e em lote pelo
+import_produtos; `manage.py rebuild_busca` recria estrutura e conteúdo (ex.:
+depois de uma migração que reconstrua a tabela no SQLite, o que descarta os
+triggers).
+"""
+import re
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, F, FloatField, Func, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from core.models import Cliente, IndiceBusca, Produto
+from core.services.importacao import em_lotes, strip_accents
+
+MAX_TERMOS = 6
+# FTS5: o bm25 só é calculado para os primeiros N resultados (ordem de id).
+# Busca curta que casa com metade do catálogo não precisa de ranking exato;
+# buscas seletivas (SKU, 2+ termos) cabem inteiras na janela.
+CANDIDATOS_FTS = 2000
+
+
+def fts_tabela(tipo: str) -> str:
+    # uma tabela FTS por tipo: o MATCH não precisa filtrar tipo depois
+    return f"core_indicebusca_fts_{tipo}"
+
+
+def _sql_fts5() -> list[str]:
+    tipos = [t for t, _ in IndiceBusca.TIPOS]
+    sqls = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_tabela(t)} USING fts5(texto, content='', prefix='2 3')"
+        for t in tipos
+    ]
+
+    def inserir(linha):
+        return "".join(
+            f"INSERT INTO {fts_tabela(t)}(rowid, texto) SELECT {linha}.id, {linha}.texto WHERE {linha}.tipo = '{t}'; "
+            for t in tipos
+        )
+
+    def apagar(linha):
+        # tabela sem conteúdo: o 'delete' recebe o texto antigo
+        return "".join(
+            f"INSERT INTO {fts_tabela(t)}({fts_tabela(t)}, rowid, texto) "
+            f"SELECT 'delete', {linha}.id, {linha}.texto WHERE {linha}.tipo = '{t}'; "
+            for t in tipos
+        )
+
+    sqls += [
+        f"CREATE TRIGGER IF NOT EXISTS core_indicebusca_ai AFTER INSERT ON core_indicebusca BEGIN {inserir('new')}END",
+        f"CREATE TRIGGER IF NOT EXISTS core_indicebusca_ad AFTER DELETE ON core_indicebusca BEGIN {apagar('old')}END",
+        f"CREATE TRIGGER IF NOT EXISTS core_indicebusca_au AFTER UPDATE ON core_indicebusca BEGIN "
+        f"{apagar('old')}{inserir('new')}END",
+    ]
+    # conteúdo que já estava na tabela antes do FTS existir
+    for t in tipos:
+        sqls += [
+            f"DELETE FROM {fts_tabela(t)}",
+            f"INSERT INTO {fts_tabela(t)}(rowid, texto) SELECT id, texto FROM core_indicebusca WHERE tipo = '{t}'",
+        ]
+    return sqls
+
+
+_SQL_TRGM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS core_indicebusca_texto_trgm ON core_indicebusca USING gin (texto gin_trgm_ops)",
+]
+_SQL_REMOVER = {
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS core_indicebusca_ai",
+        "DROP TRIGGER IF EXISTS core_indicebusca_ad",
+        "DROP TRIGGER IF EXISTS core_indicebusca_au",
+    ] + [f"DROP TABLE IF EXISTS {fts_tabela(t)}" for t, _ in IndiceBusca.TIPOS],
+    "postgresql": ["DROP INDEX IF EXISTS core_indicebusca_texto_trgm"],
+}
+
+_modos: dict[str, str] = {}  # por banco: "fts5" | "trgm" | "like"
+
+
+# ---------- Normalização ----------
+
+_NAO_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar(s) -> str:
+    return _NAO_ALNUM.sub(" ", strip_accents(str(s or "")).lower()).strip()
+
+
+def termos(q) -> list[str]:
+    return normalizar(q).split()[:MAX_TERMOS]
+
+
+def _juntar(*partes) -> str:
+    return " ".join(dict.fromkeys(p for p in partes if p))
+
+
+def texto_produto(sku, descricao, familia) -> str:
+    sku_n = normalizar(sku)
+    return _juntar(sku_n, sku_n.replace(" ", ""), normalizar(descricao), normalizar(familia))
+
+
+def texto_cliente(codigo, nome, cnpj, cidade, uf) -> str:
+    return _juntar(normalizar(codigo), normalizar(nome), re.sub(r"\D", "", cnpj or ""), normalizar(cidade), normalizar(uf))
+
+
+def rotulo_produto(sku, descricao) -> str:
+    return f"{sku} - {descricao}"[:200]
+
+
+def rotulo_cliente(codigo, nome) -> str:
+    return f"{codigo} - {nome}"[:200]
+
+
+# ---------- Estrutura (FTS5 / pg_trgm) ----------
+
+def criar_estrutura(conn=None) -> str:
+    """
+    Cria a tabela FTS5 + triggers (SQLite) ou a extensão e o índice de
+    trigramas (PostgreSQL). Sem suporte/permissão, segue no modo LIKE.
+    Retorna o modo resultante.
+    """
+    conn = conn or connection
+    sqls = {"sqlite": _sql_fts5, "postgresql": lambda: _SQL_TRGM}.get(conn.vendor, list)()
+    if sqls:
+        try:
+            with transaction.atomic(using=conn.alias), conn.cursor() as cur:
+                for sql in sqls:
+                    cur.execute(sql)
+        except DatabaseError:
+            pass  # SQLite sem FTS5 / usuário sem permissão para CREATE EXTENSION
+    _modos.pop(conn.settings_dict["NAME"], None)
+    return modo(conn)
+
+
+def remover_estrutura(conn=None):
+    conn = conn or connection
+    with conn.cursor() as cur:
+        for sql in _SQL_REMOVER.get(conn.vendor, []):
+            cur.execute(sql)
+    _modos.pop(conn.settings_dict["NAME"], None)
+
+
+def modo(conn=None) -> str:
+    conn = conn or connection
+    chave = conn.settings_dict["NAME"]
+    if chave not in _modos:
+        m = "like"
+        with conn.cursor() as cur:
+            if conn.vendor == "sqlite":
+                cur.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [fts_tabela(IndiceBusca.PRODUTO)])
+                m = "fts5" if cur.fetchone() else m
+            elif conn.vendor == "postgresql":
+                cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                m = "trgm" if cur.fetchone() else m
+        _modos[chave] = m
+    return _modos[chave]
+
+
+# ---------- Manutenção do índice ----------
+
+def _linhas_produtos(qs):
+    for pk, sku, descricao, familia, ativo in qs.values_list("pk", "sku", "descricao", "familia", "ativo").iterator(chunk_size=2000):
+        yield IndiceBusca(
+            tipo=IndiceBusca.PRODUTO, objeto_id=pk, texto=texto_produto(sku, descricao, familia),
+            rotulo=rotulo_produto(sku, descricao), ativo=ativo,
+        )
+
+
+def _linhas_clientes(qs):
+    for pk, codigo, nome, cnpj, cidade, uf in qs.values_list("pk", "codigo", "nome", "cnpj", "cidade", "uf").iterator(chunk_size=2000):
+        yield IndiceBusca(
+            tipo=IndiceBusca.CLIENTE, objeto_id=pk, texto=texto_cliente(codigo, nome, cnpj, cidade, uf),
+            rotulo=rotulo_cliente(codigo, nome),
+        )
+
+
+def _gravar(linhas, chunk: int = 2000) -> int:
+    n = 0
+    for lote in em_lotes(linhas, chunk):
+        IndiceBusca.objects.bulk_create(
+            lote, update_conflicts=True, unique_fields=["tipo", "objeto_id"], update_fields=["texto", "rotulo", "ativo"],
+        )
+        n += len(lote)
+    return n
+
+
+def indexar_produtos(qs) -> int:
+    """(Re)indexa os produtos do queryset (ex.: um lote da importação)."""
+    return _gravar(_linhas_produtos(qs))
+
+
+def indexar_clientes(qs) -> int:
+    return _gravar(_linhas_clientes(qs))
+
+
+def indexar(obj):
+    """Um Produto ou Cliente (signals)."""
+    if isinstance(obj, Produto):
+        indexar_produtos(Produto.objects.filter(pk=obj.pk))
+    elif isinstance(obj, Cliente):
+        indexar_clientes(Cliente.objects.filter(pk=obj.pk))
+
+
+def remover(tipo: str, ids) -> int:
+    return IndiceBusca.objects.filter(tipo=tipo, objeto_id__in=list(ids)).delete()[0]
+
+
+def rebuild(chunk: int = 2000) -> dict:
+    """Recria a estrutura e reindexa todos os produtos e clientes."""
+    with transaction.atomic():
+        IndiceBusca.objects.all().delete()
+        m = criar_estrutura()
+        r = {
+            "produtos": _gravar(_linhas_produtos(Produto.objects.order_by("pk")), chunk),
+            "clientes": _gravar(_linhas_clientes(Cliente.objects.order_by("pk")), chunk),
+        }
+        if m == "fts5":
+            with connection.cursor() as cur:
+                for t, _ in IndiceBusca.TIPOS:
+                    cur.execute(f"INSERT INTO {fts_tabela(t)}({fts_tabela(t)}) VALUES ('optimize')")
+    r["modo"] = m
+    return r
+
+
+# ---------- Consulta ----------
+
+def _match_fts(ts) -> str:
+    # termos já normalizados (só [0-9a-z]): não precisam de escape
+    return " ".join(f'"{t}"*' for t in ts)
+
+
+def ids_subconsulta(tipo: str, q):
+    """
+    ids (objeto_id) que batem com `q`, como subconsulta para pk__in (filtro
+    das listagens). None se `q` não tem termos.
+    """
+    ts = termos(q)
+    if not ts:
+        return None
+    if modo() == "fts5":
+        fts = fts_tabela(tipo)
+        return RawSQL(
+            f"SELECT objeto_id FROM core_indicebusca WHERE id IN (SELECT rowid FROM {fts} WHERE {fts} MATCH %s)",
+            [_match_fts(ts)],
+        )
+    return IndiceBusca.objects.filter(tipo=tipo, *[Q(texto__contains=t) for t in ts]).values("objeto_id")
+
+
+def buscar(tipo: str, q, limite: int = 20, apenas_ativos: bool = True) -> list[dict]:
+    """Autocomplete: até `limite` resultados [{id, rotulo, ativo}] em ordem de relevância."""
+    ts = termos(q)
+    if not ts:
+        return []
+    inicio = " ".join(ts)
+    if modo() == "fts5":
+        fts = fts_tabela(tipo)
+        sql = (
+            f"SELECT b.objeto_id, b.rotulo, b.ativo FROM "
+            f"(SELECT rowid, rank FROM {fts} WHERE {fts} MATCH %s LIMIT %s) m "
+            f"JOIN core_indicebusca b ON b.id = m.rowid"
+            + (" WHERE b.ativo" if apenas_ativos else "")
+            + " ORDER BY b.texto LIKE %s DESC, m.rank, b.rotulo LIMIT %s"
+        )
+        with connection.cursor() as cur:
+            cur.execute(sql, [_match_fts(ts), CANDIDATOS_FTS, inicio + "%", limite])
+            return [{"id": i, "rotulo": r, "ativo": bool(a)} for i, r, a in cur.fetchall()]
+
+    qs = IndiceBusca.objects.filter(tipo=tipo, *[Q(texto__contains=t) for t in ts])
+    if apenas_ativos:
+        qs = qs.filter(ativo=True)
+    qs = qs.annotate(
+        prefixo=Case(When(texto__startswith=inicio, then=Value(0)), default=Value(1), output_field=IntegerField())
+    )
+    ordem = ["prefixo", "rotulo"]
+    if modo() == "trgm":
+        qs = qs.annotate(sim=Func(F("texto"), Value(inicio), function="similarity", output_field=FloatField()))
+        ordem.insert(1, "-sim")
+    return [
+        {"id": i, "rotulo": r, "ativo": a}
+        for i, r, a in qs.order_by(*ordem).values_list("objeto_id", "rotulo", "ativo")[:limite]
+    ]
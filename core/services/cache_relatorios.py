@@ -0,0 +1,75 @@
+"""
+Cache das respostas JSON de /api/relatorios/* (alias "relatorios" em CACHES).
+
+A chave é (relatório, escopo do usuário, filtros normalizados, dia de hoje) e
+a versão do cache é o contador "vendas" (core.services.contadores). Toda
+gravação de Pedido/ItemPedido chama invalidar_relatorios(), que soma 1 ao
+contador depois do commit: os workers passam a procurar a versão nova e as
+entradas antigas só esperam o TTL. O dia entra na chave porque os filtros
+vazios valem "mês corrente"/"até agora".
+
+Cada entrada guarda os dados e um ETag (hash do JSON). A view responde 304
+quando o If-None-Match do navegador bate com ele, sem montar o corpo.
+
+Nomes de cliente/produto que mudam sem nenhum pedido novo aparecem quando a
+entrada expira (RELATORIOS_CACHE_TTL).
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.services import contadores
+
+VERSAO_VENDAS = "vendas"  # nome do Contador
+
+# parâmetros que não mudam o JSON do relatório
+IGNORADOS = {"format", "async", "_"}
+
+
+def _cache():
+    return caches[getattr(settings, "RELATORIOS_CACHE_ALIAS", "relatorios")]
+
+
+def invalidar_relatorios():
+    """Nova versão dos relatórios depois do commit."""
+    transaction.on_commit(lambda: contadores.incrementar(VERSAO_VENDAS))
+
+
+def versao() -> int:
+    return contadores.valor(VERSAO_VENDAS)
+
+
+def filtros_normalizados(params) -> str:
+    """QueryDict -> 'a=1&b=2': ordenado, sem valores vazios nem parâmetros de formato."""
+    pares = sorted(
+        (k, v.strip()) for k in params for v in params.getlist(k)
+        if k not in IGNORADOS and v.strip()
+    )
+    return "&".join(f"{k}={v}" for k, v in pares)
+
+
+def chave(relatorio: str, escopo: str, params) -> str:
+    bruto = f"{relatorio}|{escopo}|{filtros_normalizados(params)}|{timezone.localdate().isoformat()}"
+    # a chave vira nome de arquivo no FileBasedCache e o memcached limita o tamanho: hash
+    return f"relatorio:{relatorio}:{hashlib.sha1(bruto.encode()).hexdigest()}"
+
+
+def calcular_etag(data) -> str:
+    corpo = json.dumps(data, cls=JSONEncoder, sort_keys=True, ensure_ascii=False)
+    return '"%s"' % hashlib.sha1(corpo.encode()).hexdigest()
+
+
+def ler(chave_: str, versao_: int) -> tuple | None:
+    """(data, etag) guardados para a chave na versão, ou None."""
+    return _cache().get(chave_, version=versao_)
+
+
+def gravar(chave_: str, versao_: int, data) -> tuple:
+    entrada = (data, calcular_etag(data))
+    _cache().set(chave_, entrada, timeout=settings.RELATORIOS_CACHE_TTL, version=versao_)
+    return entrada
@@ -1,8 +1,49 @@
+"""
+Consulta de CNPJ na BrasilAPI com cache em banco (CnpjCache).
+
+fetch_cnpj() lê pelo cache:
+- dentro do TTL (CNPJ_CACHE_TTL) devolve o registro sem ir à rede;
+- vencido há menos de CNPJ_CACHE_STALE, devolve o registro antigo e
+  atualiza em segundo plano (stale-while-revalidate);
+- sem registro (ou velho demais) consulta a API; se a API falhar e houver
+  resposta antiga, ela é usada.
+
+Falhas também ficam em cache, por menos tempo: CNPJ inexistente/inválido por
+CNPJ_CACHE_TTL_ERRO, falha transitória (timeout, 429, 5xx) por
+CNPJ_CACHE_TTL_FALHA. Enquanto valem, fetch_cnpj levanta CnpjErro sem rede.
+
+As chamadas usam um httpx.Client único por processo (pool de conexões).
+CNPJ_API_URL pode apontar para um servidor local (testes/checagens).
+"""
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
 import httpx
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from core.models import CnpjCache
 
 _DIGITS = re.compile(r"\D+")
 
+FALHAS_TRANSITORIAS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CnpjErro(Exception):
+    """Consulta sem resultado; `status` é o HTTP da API (None = sem resposta)."""
+
+    def __init__(self, msg: str, status: int | None = None):
+        super().__init__(msg)
+        self.status = status
+
+    @property
+    def transitorio(self) -> bool:
+        return self.status is None or self.status in FALHAS_TRANSITORIAS
+
+
 def _clean_cnpj(cnpj: str) -> str:
     c = _DIGITS.sub("", cnpj or "")
     if len(c) != 14:
@@ -26,10 +67,154 @@ def _normalize_brasilapi(data: dict) -> dict:
         "atividade_principal": data.get("cnae_fiscal_descricao") or "",
     }
 
+
+def url_cnpj(cnpj: str) -> str:
+    return settings.CNPJ_API_URL.rstrip("/") + "/" + cnpj
+
+
+def interpretar_resposta(status: int, corpo) -> dict:
+    """Resposta da API -> dados normalizados, ou CnpjErro (usado também pelo enriquecimento em lote)."""
+    if status == 200:
+        try:
+            return _normalize_brasilapi(corpo() if callable(corpo) else corpo)
+        except (ValueError, AttributeError):
+            raise CnpjErro("Consulta falhou: resposta inválida da API")  # tratada como transitória
+    if status == 404:
+        raise CnpjErro("CNPJ não encontrado", status)
+    raise CnpjErro(f"Consulta falhou: HTTP {status}", status)
+
+
+# ---------- HTTP ----------
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+def _http() -> httpx.Client:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(timeout=settings.CNPJ_API_TIMEOUT)
+        return _client
+
+
+def _consultar_api(cnpj: str) -> dict:
+    try:
+        r = _http().get(url_cnpj(cnpj))
+    except httpx.HTTPError as e:
+        raise CnpjErro(f"Consulta falhou: {e.__class__.__name__}")
+    return interpretar_resposta(r.status_code, r.json)
+
+
+# ---------- Cache ----------
+
+def _validade(erro: CnpjErro | None = None) -> timedelta:
+    if erro is None:
+        return timedelta(seconds=settings.CNPJ_CACHE_TTL)
+    return timedelta(seconds=settings.CNPJ_CACHE_TTL_FALHA if erro.transitorio else settings.CNPJ_CACHE_TTL_ERRO)
+
+
+def gravar_ok(cnpj: str, dados: dict, agora=None) -> CnpjCache:
+    agora = agora or timezone.now()
+    obj, _ = CnpjCache.objects.update_or_create(cnpj=cnpj, defaults={
+        "dados": dados, "erro": "", "status_http": 200, "consultado_em": agora,
+        "expira_em": agora + _validade(),
+    })
+    return obj
+
+
+def gravar_erro(cnpj: str, erro: CnpjErro, agora=None) -> CnpjCache:
+    """Cache negativo; mantém `dados` de uma resposta boa anterior."""
+    agora = agora or timezone.now()
+    obj, _ = CnpjCache.objects.update_or_create(cnpj=cnpj, defaults={
+        "erro": str(erro)[:200], "status_http": erro.status, "consultado_em": agora,
+        "expira_em": agora + _validade(erro),
+    })
+    return obj
+
+
+def gravar_lote(resultados: dict[str, dict | CnpjErro]):
+    """Vários resultados {cnpj: dados | CnpjErro} com um upsert para os bons e outro para os erros."""
+    agora = timezone.now()
+    ok, erros = [], []
+    for c, r in resultados.items():
+        if isinstance(r, CnpjErro):
+            erros.append(CnpjCache(cnpj=c, erro=str(r)[:200], status_http=r.status,
+                                   consultado_em=agora, expira_em=agora + _validade(r)))
+        else:
+            ok.append(CnpjCache(cnpj=c, dados=r, erro="", status_http=200,
+                                consultado_em=agora, expira_em=agora + _validade()))
+    campos = ["erro", "status_http", "consultado_em", "expira_em"]
+    if ok:
+        CnpjCache.objects.bulk_create(ok, update_conflicts=True, unique_fields=["cnpj"], update_fields=["dados", *campos])
+    if erros:
+        # sem "dados": o erro não apaga a última resposta boa
+        CnpjCache.objects.bulk_create(erros, update_conflicts=True, unique_fields=["cnpj"], update_fields=campos)
+
+
+def em_cache(cnpjs) -> dict[str, dict | CnpjErro]:
+    """Registros ainda válidos (sem rede), no formato de gravar_lote."""
+    res = {}
+    for reg in CnpjCache.objects.filter(cnpj__in=list(cnpjs), expira_em__gt=timezone.now()):
+        res[reg.cnpj] = CnpjErro(reg.erro, reg.status_http) if reg.erro else reg.dados
+    return res
+
+
+_revalidando: set[str] = set()
+_revalidando_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cnpj-revalidar")
+
+
+def _revalidar(cnpj: str):
+    try:
+        try:
+            gravar_ok(cnpj, _consultar_api(cnpj))
+        except CnpjErro as e:
+            gravar_erro(cnpj, e)
+    finally:
+        with _revalidando_lock:
+            _revalidando.discard(cnpj)
+        connections.close_all()  # conexões desta thread
+
+
+def _revalidar_em_segundo_plano(cnpj: str):
+    with _revalidando_lock:
+        if cnpj in _revalidando:
+            return
+        _revalidando.add(cnpj)
+    _executor.submit(_revalidar, cnpj)
+
+
+def consultar(cnpj: str) -> tuple[dict, str]:
+    """
+    (dados normalizados, origem) com origem "cache", "cache-antigo" ou "api".
+    Levanta ValueError (CNPJ mal formado) ou CnpjErro.
+    """
+    c = _clean_cnpj(cnpj)
+    agora = timezone.now()
+    reg = CnpjCache.objects.filter(pk=c).first()
+    if reg is not None:
+        if agora < reg.expira_em:
+            if not reg.erro:
+                return reg.dados, "cache"
+            erro = CnpjErro(reg.erro, reg.status_http)
+            if reg.dados and erro.transitorio:
+                return reg.dados, "cache-antigo"
+            raise erro
+        if reg.dados and not reg.erro and agora < reg.expira_em + timedelta(seconds=settings.CNPJ_CACHE_STALE):
+            _revalidar_em_segundo_plano(c)
+            return reg.dados, "cache-antigo"
+
+    try:
+        dados = _consultar_api(c)
+    except CnpjErro as e:
+        reg = gravar_erro(c, e, agora)
+        if reg.dados and e.transitorio:
+            return reg.dados, "cache-antigo"  # API fora: melhor o dado antigo que nada
+        raise
+    gravar_ok(c, dados, agora)
+    return dados, "api"
+
+
 def fetch_cnpj(cnpj: str) -> dict:
-    cnpj = _clean_cnpj(cnpj)
-    url = f"https://brasilapi.com.br/api/cnpj/v1/{cnpj}"
-    with httpx.Client(timeout=10) as client:
-        r = client.get(url)
-        r.raise_for_status()
-        return _normalize_brasilapi(r.json())
+    return consultar(cnpj)[0]
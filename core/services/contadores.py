@@ -0,0 +1,40 @@
+"""
+Contadores nomeados na tabela Contador.
+
+incrementar() é atômico entre processos: UPDATE valor = valor + n (a linha fica
+travada até o fim da transação) e, se o contador ainda não existe, INSERT.
+travar() usa a mesma trava sem mudar o valor, para serializar uma seção
+crítica entre processos (ex.: reserva de jobs por tipo em job_queue).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from core.models import Contador
+
+
+def valor(nome: str) -> int:
+    return Contador.objects.filter(nome=nome).values_list("valor", flat=True).first() or 0
+
+
+def incrementar(nome: str, n: int = 1) -> int:
+    """Soma n ao contador e devolve o novo valor."""
+    with transaction.atomic():
+        if not Contador.objects.filter(nome=nome).update(valor=F("valor") + n):
+            try:
+                with transaction.atomic():
+                    Contador.objects.create(nome=nome, valor=n)
+                    return n
+            except IntegrityError:
+                # outro processo criou no meio do caminho
+                Contador.objects.filter(nome=nome).update(valor=F("valor") + n)
+        return Contador.objects.values_list("valor", flat=True).get(nome=nome)
+
+
+def travar(nome: str) -> None:
+    """Trava a linha do contador até o fim da transação atual (cria se não existe)."""
+    if not Contador.objects.filter(nome=nome).update(valor=F("valor")):
+        try:
+            with transaction.atomic():
+                Contador.objects.create(nome=nome)
+        except IntegrityError:
+            Contador.objects.filter(nome=nome).update(valor=F("valor"))
@@ -0,0 +1,263 @@
+"""
+Enriquecimento em lote dos clientes pelo CNPJ (job "enriquecer_cnpj").
+
+Seleciona os clientes com CNPJ e nome/cidade/UF vazios e preenche só os
+campos vazios. CNPJs com registro válido em CnpjCache não vão à rede. Os
+demais são consultados em paralelo:
+
+- um httpx.AsyncClient para o job inteiro (pool de conexões), no máximo
+  CNPJ_LOTE_CONCORRENCIA requisições simultâneas;
+- balde de tokens: no máximo CNPJ_LOTE_TAXA requisições/s (rajada de até
+  CNPJ_LOTE_RAJADA), respeitado por todas as tarefas;
+- falha transitória (timeout, 429, 5xx) tenta de novo com backoff
+  exponencial + jitter (ou o Retry-After da API), até CNPJ_LOTE_TENTATIVAS;
+- circuito: CNPJ_CIRCUITO_FALHAS falhas seguidas abrem o circuito por
+  CNPJ_CIRCUITO_ESPERA segundos; depois uma requisição de teste decide se
+  fecha ou abre de novo. Abriu CNPJ_CIRCUITO_MAX_ABERTURAS vezes seguidas:
+  o job para (CircuitoAberto) e pode ser rodado de novo depois.
+
+O banco só é usado entre os lotes, fora do event loop: resultados vão para
+CnpjCache (cnpj.gravar_lote) e os clientes são gravados com bulk_update.
+O bulk não dispara signals, então o lote faz o que eles fariam: reindexa a
+busca, refaz o rollup (VendaDiaria) dos clientes que ganharam UF e muda a
+versão do cache dos relatórios.
+"""
+import asyncio
+import random
+import re
+import time
+
+import httpx
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from core.models import Cliente
+from core.services import busca, vendas_diarias
+from core.services.cache_relatorios import invalidar_relatorios
+from core.services.cnpj import CnpjErro, em_cache, gravar_lote, interpretar_resposta, url_cnpj
+from core.services.importacao import em_lotes
+
+CAMPOS = ("nome", "cidade", "uf")
+AMOSTRA_ERROS = 50  # erros por CNPJ que vão para o log do job
+
+
+class CircuitoAberto(Exception):
+    pass
+
+
+# ---------- Controle de vazão ----------
+
+class BaldeDeTokens:
+    """`taxa` tokens/s, acumulando até `capacidade`; retirar() espera o próximo token."""
+
+    def __init__(self, taxa: float, capacidade: int):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tokens = float(capacidade)
+        self._t = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def retirar(self):
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                self.tokens = min(self.capacidade, self.tokens + (agora - self._t) * self.taxa)
+                self._t = agora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.taxa)
+
+
+class Circuito:
+    """Fechado -> aberto (após `limiar` falhas seguidas) -> uma sondagem -> fechado ou aberto de novo."""
+
+    def __init__(self, limiar: int, espera: float, max_aberturas: int):
+        self.limiar = limiar
+        self.espera = espera
+        self.max_aberturas = max_aberturas
+        self.falhas = 0
+        self.aberturas = 0
+        self.aberto_ate = 0.0
+        self._sondando = False
+
+    async def aguardar(self):
+        while True:
+            if self.aberturas >= self.max_aberturas:
+                raise CircuitoAberto(f"API indisponível: circuito abriu {self.aberturas} vezes seguidas")
+            agora = time.monotonic()
+            if not self.aberturas:
+                return
+            if agora >= self.aberto_ate and not self._sondando:
+                self._sondando = True  # só esta requisição passa; as outras esperam o resultado
+                return
+            await asyncio.sleep(max(self.aberto_ate - agora, 0.05))
+
+    def sucesso(self):
+        self.falhas = 0
+        self.aberturas = 0
+        self._sondando = False
+
+    def falha(self):
+        self.falhas += 1
+        if self._sondando or (not self.aberturas and self.falhas >= self.limiar):
+            self._sondando = False
+            self.aberturas += 1
+            self.aberto_ate = time.monotonic() + self.espera
+
+
+# ---------- Consulta ----------
+
+def _retry_after(r: httpx.Response | None) -> float | None:
+    try:
+        return min(float(r.headers["Retry-After"]), 60.0) if r is not None else None
+    except (KeyError, ValueError):
+        return None
+
+
+async def _buscar(http, cnpj, balde, circuito, sem, stats) -> dict | CnpjErro:
+    async with sem:
+        erro = None
+        for tentativa in range(settings.CNPJ_LOTE_TENTATIVAS):
+            if tentativa:
+                stats["retentativas"] += 1
+            await circuito.aguardar()
+            await balde.retirar()
+            stats["consultas_api"] += 1
+            r = None
+            try:
+                r = await http.get(url_cnpj(cnpj))
+                dados = interpretar_resposta(r.status_code, r.json)
+            except httpx.HTTPError as e:
+                erro = CnpjErro(f"Consulta falhou: {e.__class__.__name__}")
+            except CnpjErro as e:
+                erro = e
+            else:
+                circuito.sucesso()
+                return dados
+            if not erro.transitorio:
+                circuito.sucesso()  # a API respondeu (ex.: 404)
+                return erro
+            circuito.falha()
+            if tentativa + 1 < settings.CNPJ_LOTE_TENTATIVAS:
+                base = settings.CNPJ_LOTE_BACKOFF * 2 ** tentativa
+                await asyncio.sleep(_retry_after(r) or base * (0.5 + random.random()))
+        return erro
+
+
+async def _buscar_todos(http, cnpjs, balde, circuito, stats) -> dict[str, dict | CnpjErro]:
+    sem = asyncio.Semaphore(settings.CNPJ_LOTE_CONCORRENCIA)
+    tarefas = {c: asyncio.ensure_future(_buscar(http, c, balde, circuito, sem, stats)) for c in cnpjs}
+    try:
+        await asyncio.gather(*tarefas.values())
+    except CircuitoAberto:
+        for t in tarefas.values():
+            t.cancel()
+        await asyncio.gather(*tarefas.values(), return_exceptions=True)
+        raise
+    return {c: t.result() for c, t in tarefas.items()}
+
+
+# ---------- Job ----------
+
+def clientes_pendentes():
+    """Clientes com CNPJ e algum dos campos vazios."""
+    return Cliente.objects.exclude(cnpj="").filter(Q(nome="") | Q(cidade="") | Q(uf="")).order_by("pk")
+
+
+def _preencher(cli: Cliente, dados: dict) -> bool:
+    novos = {
+        "nome": (dados.get("nome_fantasia") or dados.get("razao_social") or "")[:120],
+        "cidade": (dados.get("municipio") or "")[:80],
+        "uf": (dados.get("uf") or "")[:2],
+    }
+    mudou = False
+    for campo in CAMPOS:
+        if not getattr(cli, campo) and novos[campo]:
+            setattr(cli, campo, novos[campo])
+            mudou = True
+    return mudou
+
+
+def enriquecer_clientes(limite: int | None = None, lote: int = 200, log=None, ao_progresso=None) -> dict:
+    """
+    Preenche nome/cidade/UF dos clientes pendentes. `log(msg, level)` e
+    `ao_progresso(pct)` recebem o andamento (JobLog/Job.progress).
+    Retorna o resumo com as contagens.
+    """
+    log = log or (lambda msg, level="INFO": None)
+    qs = clientes_pendentes().values_list("pk", "cnpj")
+    pendentes = list(qs[:limite] if limite else qs)
+    stats = {"clientes": len(pendentes), "atualizados": 0, "sem_dados": 0, "cnpj_invalido": 0,
+             "nao_encontrados": 0, "falhas": 0, "cache": 0, "consultas_api": 0, "retentativas": 0}
+    log(f"{len(pendentes)} cliente(s) com CNPJ e dados faltando")
+
+    balde = BaldeDeTokens(settings.CNPJ_LOTE_TAXA, settings.CNPJ_LOTE_RAJADA)
+    circuito = Circuito(settings.CNPJ_CIRCUITO_FALHAS, settings.CNPJ_CIRCUITO_ESPERA,
+                        settings.CNPJ_CIRCUITO_MAX_ABERTURAS)
+    n_conc = settings.CNPJ_LOTE_CONCORRENCIA
+    loop = asyncio.new_event_loop()
+    http = httpx.AsyncClient(
+        timeout=settings.CNPJ_API_TIMEOUT,
+        limits=httpx.Limits(max_connections=n_conc, max_keepalive_connections=n_conc),
+    )
+    erros_logados, feitos = 0, 0
+    try:
+        for bloco in em_lotes(pendentes, lote):
+            por_cnpj: dict[str, list[int]] = {}
+            for pk, bruto in bloco:
+                c = re.sub(r"\D", "", bruto)
+                if len(c) == 14:
+                    por_cnpj.setdefault(c, []).append(pk)
+                else:
+                    stats["cnpj_invalido"] += 1
+
+            resultados = em_cache(por_cnpj)
+            stats["cache"] += len(resultados)
+            faltando = [c for c in por_cnpj if c not in resultados]
+            if faltando:
+                # o loop só roda aqui; o ORM é usado fora dele
+                novos = loop.run_until_complete(_buscar_todos(http, faltando, balde, circuito, stats))
+                gravar_lote(novos)
+                resultados.update(novos)
+
+            clientes = Cliente.objects.in_bulk([pk for pks in por_cnpj.values() for pk in pks])
+            alterados, uf_mudou = [], []
+            for c, pks in por_cnpj.items():
+                r = resultados[c]
+                if isinstance(r, CnpjErro):
+                    stats["nao_encontrados" if r.status == 404 else "falhas"] += len(pks)
+                    if erros_logados < AMOSTRA_ERROS:
+                        erros_logados += 1
+                        log(f"CNPJ {c}: {r}", "WARN")
+                    continue
+                for pk in pks:
+                    uf_antes = clientes[pk].uf
+                    if _preencher(clientes[pk], r):
+                        alterados.append(clientes[pk])
+                        if clientes[pk].uf != uf_antes:
+                            uf_mudou.append(pk)
+                    else:
+                        stats["sem_dados"] += 1
+            if alterados:
+                with transaction.atomic():
+                    Cliente.objects.bulk_update(alterados, CAMPOS)
+                    busca.indexar_clientes(Cliente.objects.filter(pk__in=[c.pk for c in alterados]))
+                    # a UF faz parte da chave do rollup (o signal de Cliente não roda no bulk)
+                    vendas_diarias.recalcular_clientes(uf_mudou)
+                    invalidar_relatorios()  # nomes/cidades aparecem nos relatórios
+            stats["atualizados"] += len(alterados)
+
+            feitos += len(bloco)
+            log(f"{feitos}/{len(pendentes)} processados: {stats['atualizados']} atualizados, "
+                f"{stats['consultas_api']} consultas à API, {stats['cache']} do cache")
+            if ao_progresso:
+                ao_progresso(int(feitos * 100 / len(pendentes)))
+    except CircuitoAberto as e:
+        log(f"{e}; {feitos}/{len(pendentes)} processados. Rode o job de novo mais tarde.", "ERROR")
+        raise
+    finally:
+        loop.run_until_complete(http.aclose())
+        loop.close()
+    return stats
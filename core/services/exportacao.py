@@ -0,0 +1,76 @@
+"""
+Geração de arquivos de exportação em memória constante.
+"""
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def write_xlsx(destino, titulo: str, linhas) -> int:
+    """
+    Grava `linhas` (iterável de listas, ex.: queryset.iterator()) numa planilha
+    write-only: cada linha é serializada ao ser adicionada, sem manter células
+    em memória. `destino` é um caminho ou arquivo binário. Retorna nº de linhas.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(titulo)
+    n = 0
+    for linha in linhas:
+        ws.append(linha)
+        n += 1
+    wb.save(destino)
+    return n
+
+
+def xlsx_tempfile(titulo: str, linhas):
+    """
+    write_xlsx num arquivo temporário (apagado ao fechar), posicionado no início.
+    Retorna (arquivo, nº de linhas).
+    """
+    tmp = tempfile.TemporaryFile()
+    try:
+        n = write_xlsx(tmp, titulo, linhas)
+    except Exception:
+        tmp.close()
+        raise
+    tmp.seek(0)
+    return tmp, n
+
+
+# ---------- Respostas em streaming sob ASGI ----------
+
+class _EmBlocos:
+    """
+    Sob ASGI o Django consome um iterador síncrono com sync_to_async(list),
+    juntando o arquivo inteiro em memória antes de enviar. Aqui o iterador é
+    lido na thread da requisição em blocos de ~`bloco` bytes, um por vez.
+    Sob WSGI (e no worker de jobs) a iteração síncrona não muda.
+    """
+    bloco = 64 * 1024
+
+    async def __aiter__(self):
+        partes = iter(self.streaming_content)
+        proximo = sync_to_async(self._proximo_bloco)
+        while parte := await proximo(partes):
+            yield parte
+
+    def _proximo_bloco(self, partes) -> bytes:
+        buffer, n = [], 0
+        for parte in partes:
+            buffer.append(parte)
+            n += len(parte)
+            if n >= self.bloco:
+                break
+        return b"".join(buffer)
+
+
+class RespostaEmBlocos(_EmBlocos, StreamingHttpResponse):
+    pass
+
+
+class ArquivoEmBlocos(_EmBlocos, FileResponse):
+    pass
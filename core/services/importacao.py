@@ -0,0 +1,205 @@
+"""
+Leitura de planilhas de importação (XLSX/CSV) em streaming.
+
+ler_brutas() devolve o cabeçalho normalizado e um gerador das linhas como
+tuplas, sem converter: o XLSX é aberto em modo read_only e o CSV lido com
+csv.reader, uma linha por vez, então a memória não cresce com o tamanho do
+arquivo. em_lotes() agrupa qualquer iterável em listas de até N itens e
+parse_bloco() converte um bloco delas (linha_produto, linha_preco); pode
+rodar em outro processo (este módulo não depende do Django).
+"""
+import csv
+import hashlib
+import json
+import time
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+
+try:
+    import openpyxl  # type: ignore
+except Exception:  # pragma: no cover
+    openpyxl = None
+
+XLSX_SUFIXOS = (".xlsx", ".xlsm", ".xltx", ".xltm")
+
+
+def strip_accents(s: str) -> str:
+    nfkd = unicodedata.normalize("NFD", s)
+    return "".join(c for c in nfkd if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=4096)
+def norm_key(s: str) -> str:
+    s = strip_accents(str(s or "")).strip().lower()
+    for ch in (" ", ".", "-", "/", "\\"):
+        s = s.replace(ch, "_")
+    return s
+
+
+def as_text(v) -> str:
+    # Converte qualquer valor para string SEM perder 123.0 -> "123"
+    if v is None:
+        return ""
+    s = str(v).strip()
+    # openpyxl costuma trazer números como float
+    if s.endswith(".0"):
+        try:
+            if float(s).is_integer():
+                s = s[:-2]
+        except Exception:
+            pass
+    # Evitar notação científica
+    try:
+        if "e" in s.lower():
+            n = float(s)
+            if n.is_integer():
+                s = str(int(n))
+            else:
+                s = ("%.15f" % n).rstrip("0").rstrip(".")
+    except Exception:
+        pass
+    return s
+
+
+def as_decimal(v) -> Decimal | None:
+    """
+    Preço da planilha como Decimal(2 casas), ou None se vazio/inválido/negativo.
+    Números do openpyxl vêm prontos; texto aceita "1.234,56", "1234,56" e "1234.56".
+    """
+    if v is None or isinstance(v, bool):
+        return None
+    if isinstance(v, (int, float, Decimal)):
+        s = str(v)
+    else:
+        s = str(v).strip().replace("R$", "").replace(" ", "")
+        if "," in s:
+            s = s.replace(".", "").replace(",", ".")
+    try:
+        d = Decimal(s)
+    except InvalidOperation:
+        return None
+    if not d.is_finite() or d < 0:
+        return None
+    return d.quantize(Decimal("0.01"))
+
+
+def campo(row: dict, *keys):
+    """Primeiro valor não vazio entre vários nomes de coluna (já normalizados por norm_key)."""
+    for k in keys:
+        v = row.get(norm_key(k))
+        if v not in (None, ""):
+            return v
+    return None
+
+
+def _brutas_xlsx(path: Path):
+    if not openpyxl:
+        raise RuntimeError("openpyxl não instalado. Adicione openpyxl no requirements ou use CSV.")
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    rows = wb.active.iter_rows(values_only=True)
+    cabecalho = next(rows, None) or ()
+
+    def linhas():
+        try:
+            yield from rows
+        finally:
+            wb.close()
+
+    return [norm_key(h) for h in cabecalho], linhas()
+
+
+def _brutas_csv(path: Path):
+    # CSV (tenta detectar delimitador)
+    f = path.open("r", encoding="utf-8-sig", newline="")
+    sample = f.read(4096)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=";,\t,|")
+    except Exception:
+        dialect = csv.excel
+    reader = csv.reader(f, dialect=dialect)
+    cabecalho = next(reader, None) or []
+
+    def linhas():
+        with f:
+            yield from (r for r in reader if r)  # ignora linhas em branco, como o DictReader
+
+    return [norm_key(h) for h in cabecalho], linhas()
+
+
+def ler_brutas(path):
+    """(cabeçalho normalizado, gerador de linhas como tuplas/listas de valores)."""
+    path = Path(path)
+    if path.suffix.lower() in XLSX_SUFIXOS:
+        return _brutas_xlsx(path)
+    return _brutas_csv(path)
+
+
+def como_dict(headers, data) -> dict:
+    # linhas podem vir mais curtas que o cabeçalho (read_only / CSV irregular)
+    return {h: (data[i] if i < len(data) else None) for i, h in enumerate(headers)}
+
+
+SKU_COLUNAS = ("ref", "sku", "codigo", "código", "referencia", "referência")
+
+
+def hash_campos(campos: dict) -> str:
+    """sha1 estável dos campos normalizados (ordem das chaves não importa)."""
+    bruto = json.dumps(campos, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(bruto.encode("utf-8")).hexdigest()
+
+
+FAMILIA_COLUNAS = ("familia", "família")
+
+
+def linha_produto(row: dict):
+    """
+    (sku, campos) de uma linha da planilha de produtos, ou None se não tiver REF.
+    campos traz tudo o que a importação grava: descricao e, se o arquivo tiver a
+    coluna, familia; hash_importacao é calculado sobre todos eles.
+    """
+    # tenta ler REF/SKU/codigo...
+    ref = as_text(campo(row, *SKU_COLUNAS))
+    if not ref:
+        return None
+    descricao = as_text(campo(row, "produto", "descricao", "descrição", "desc", "nome"))
+    campos = {"descricao": descricao or ref}
+    # sem a coluna no arquivo a família do cadastro fica como está
+    if any(norm_key(c) in row for c in FAMILIA_COLUNAS):
+        campos["familia"] = as_text(campo(row, *FAMILIA_COLUNAS))
+    campos["hash_importacao"] = hash_campos(campos)
+    return ref, campos
+
+
+def linha_preco(row: dict):
+    """
+    (sku, preço) de uma linha da lista de preços; preço None quando a célula
+    está vazia ou inválida. None se a linha não tiver REF.
+    """
+    ref = as_text(campo(row, *SKU_COLUNAS))
+    if not ref:
+        return None
+    return ref, as_decimal(campo(row, "preco", "preço", "valor", "preco_venda", "preço_venda"))
+
+
+def parse_bloco(fn, headers, linhas):
+    """
+    Aplica fn (ex.: linha_produto) a um bloco de linhas brutas.
+    Retorna (itens não nulos, nº de linhas do bloco, segundos gastos).
+    """
+    t0 = time.perf_counter()
+    itens = []
+    for data in linhas:
+        item = fn(como_dict(headers, data))
+        if item is not None:
+            itens.append(item)
+    return itens, len(linhas), time.perf_counter() - t0
+
+
+def em_lotes(iteravel, tamanho: int):
+    it = iter(iteravel)
+    while lote := list(islice(it, tamanho)):
+        yield lote
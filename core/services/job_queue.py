@@ -0,0 +1,124 @@
+"""
+Fila de jobs sobre a tabela Job.
+
+- claim(): pega o próximo job "queued" respeitando os limites por tipo.
+  PostgreSQL usa SELECT ... FOR UPDATE SKIP LOCKED; nos demais bancos (SQLite)
+  o job é reservado com um UPDATE condicional (status='queued') na própria
+  linha, e só quem altera 1 linha fica com ele. Para tipos com limite, a
+  contagem dos "running" e a reserva acontecem na mesma transação, com a
+  linha do Contador "jobs:<tipo>" travada: dois workers não passam do limite.
+- heartbeat(): workers marcam os jobs que estão executando.
+- recover_stale(): jobs "running" sem heartbeat voltam para a fila (ou viram
+  erro após JOBS_MAX_TENTATIVAS).
+- atualizar(): grava status/progresso só se o job ainda é "running" do
+  worker que o reservou; 0 linhas alteradas quer dizer que recover_stale o
+  devolveu à fila (e talvez outro worker o pegou): JobPerdido.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from core.models import Job, JobLog
+from core.services import contadores
+
+
+class JobPerdido(Exception):
+    """O job não é mais deste worker (recover_stale devolveu à fila)."""
+
+
+def _limites() -> dict:
+    return getattr(settings, "JOBS_CONCURRENCY_POR_TIPO", {})
+
+
+def _tipos_no_limite() -> list[str]:
+    limites = _limites()
+    if not limites:
+        return []
+    rodando = dict(
+        Job.objects.filter(status=Job.Status.RUNNING, type__in=list(limites))
+        .values_list("type").annotate(n=Count("id")).order_by()
+    )
+    return [t for t, lim in limites.items() if rodando.get(t, 0) >= lim]
+
+
+def _reservar(job_id, worker: str) -> int:
+    agora = timezone.now()
+    return Job.objects.filter(pk=job_id, status=Job.Status.QUEUED).update(
+        status=Job.Status.RUNNING, worker=worker, started_at=agora, heartbeat_at=agora,
+        finished_at=None, attempts=F("attempts") + 1,
+    )
+
+
+def _proximo(excluir) -> Job | None:
+    fila = Job.objects.filter(status=Job.Status.QUEUED).exclude(type__in=excluir).order_by("created_at")
+    if connection.features.has_select_for_update_skip_locked:
+        fila = fila.select_for_update(skip_locked=True)
+    return fila.only("id", "type").first()
+
+
+def claim(worker: str, ignorar_tipos=(), tentativas: int = 5) -> Job | None:
+    """Reserva e devolve o próximo job da fila (ou None)."""
+    limites = _limites()
+    # só uma dica para pular tipos cheios; quem decide é a contagem sob a trava
+    excluir = set(_tipos_no_limite()) | set(ignorar_tipos)
+    for _ in range(tentativas):
+        with transaction.atomic():
+            job = _proximo(excluir)
+            if job is None:
+                return None
+            limite = limites.get(job.type)
+            if limite is not None:
+                # uma transação por vez conta e reserva jobs deste tipo (a trava
+                # sai no commit, junto com a reserva); cada transação trava no
+                # máximo um tipo, então não há espera circular entre workers
+                contadores.travar(f"jobs:{job.type}")
+                if Job.objects.filter(status=Job.Status.RUNNING, type=job.type).count() >= limite:
+                    excluir.add(job.type)
+                    continue
+            if _reservar(job.pk, worker):
+                return Job.objects.get(pk=job.pk)
+        # sem SKIP LOCKED outro worker pode ter reservado antes: tenta o próximo
+    return None
+
+
+def atualizar(job: Job, **campos) -> None:
+    """UPDATE do job; se veio da fila, só enquanto é "running" deste worker."""
+    qs = Job.objects.filter(pk=job.pk)
+    if job.worker:
+        qs = qs.filter(worker=job.worker, status=Job.Status.RUNNING)
+    if not qs.update(**campos):
+        raise JobPerdido(f"Job {job.pk} não é mais do worker {job.worker}; execução interrompida")
+
+
+def heartbeat(job_ids, worker: str | None = None) -> None:
+    if job_ids:
+        qs = Job.objects.filter(pk__in=list(job_ids), status=Job.Status.RUNNING)
+        if worker:
+            qs = qs.filter(worker=worker)  # um job devolvido à fila não continua vivo pelo worker antigo
+        qs.update(heartbeat_at=timezone.now())
+
+
+def recover_stale() -> int:
+    """Devolve à fila os jobs "running" sem heartbeat recente. Retorna quantos."""
+    limite = timezone.now() - timedelta(seconds=getattr(settings, "JOBS_STALE_SEGUNDOS", 60))
+    max_tentativas = getattr(settings, "JOBS_MAX_TENTATIVAS", 3)
+    parados = Job.objects.filter(status=Job.Status.RUNNING).filter(
+        Q(heartbeat_at__lt=limite) | Q(heartbeat_at__isnull=True, started_at__lt=limite)
+    )
+    n = 0
+    for job in parados.only("id", "attempts", "worker"):
+        if job.attempts >= max_tentativas:
+            novo = dict(status=Job.Status.ERROR, finished_at=timezone.now(),
+                        result={"error": f"sem heartbeat após {job.attempts} tentativa(s)"})
+            msg, nivel = f"Worker {job.worker or '?'} parou de responder; tentativas esgotadas", "ERROR"
+        else:
+            novo = dict(status=Job.Status.QUEUED, worker="", heartbeat_at=None)
+            msg, nivel = f"Worker {job.worker or '?'} parou de responder; job devolvido à fila", "WARN"
+        # condicional: outro worker pode ter recuperado o mesmo job
+        if Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING).update(**novo):
+            JobLog.objects.create(job_id=job.pk, level=nivel, message=msg)
+            n += 1
+    return n
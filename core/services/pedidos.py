@@ -0,0 +1,339 @@
+"""
+Criação de pedidos em lote.
+
+criar_pedido() valida e precifica todos os itens antes de gravar (preços via
+core.services.precos, numa chamada), grava o Pedido já com total e número e
+insere os itens com um único bulk_create, tudo numa transação. Como o
+bulk_create não chama ItemPedido.save, o subtotal é calculado aqui com a
+mesma regra (ItemPedido.calcular_subtotal).
+
+Os números vêm do Contador "pedido_numero": sem colisão entre processos,
+mesmo com vários pedidos no mesmo segundo. O formato PV-00000000 é reservado
+a essa numeração (numero_invalido() recusa o número informado pelo cliente
+nesse formato) e números já gravados por outro caminho são pulados.
+
+criar_pedidos_em_lote() faz o mesmo para N pedidos (sincronização offline),
+com chave de idempotência por pedido.
+
+ajustar_total() mantém Pedido.total com deltas (UPDATE total = total + d)
+quando um item muda, sem recarregar os itens; reconciliar_totais() compara
+com a soma dos itens e corrige divergências.
+"""
+import re
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Prefetch, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Cliente, ItemPedido, Pedido, Produto, Representante
+from core.services import contadores, vendas_diarias
+from core.services.cache_relatorios import invalidar_relatorios
+from core.services.precos import resolver_precos
+
+CONTADOR_NUMERO = "pedido_numero"
+NUMERO_AUTOMATICO = re.compile(r"PV-\d{8}")
+
+
+class PedidoInvalido(Exception):
+    def __init__(self, erros: list[str]):
+        super().__init__("; ".join(erros))
+        self.erros = erros
+
+
+def proximos_numeros(n: int = 1) -> list[str]:
+    """
+    Reserva n números de pedido (PV-00000001, ...), em ordem. Os que já
+    existem em Pedido (gravados antes da regra de numero_invalido() ou pelo
+    admin) são pulados e o contador avança por eles.
+    """
+    numeros: list[str] = []
+    while len(numeros) < n:
+        falta = n - len(numeros)
+        fim = contadores.incrementar(CONTADOR_NUMERO, falta)
+        candidatos = [f"PV-{i:08d}" for i in range(fim - falta + 1, fim + 1)]
+        usados = set(Pedido.objects.filter(numero__in=candidatos).values_list("numero", flat=True))
+        numeros.extend(c for c in candidatos if c not in usados)
+    return numeros
+
+
+def numero_invalido(numero: str | None) -> str | None:
+    """Erro para um número informado pelo cliente, ou None se pode ser usado."""
+    if numero and NUMERO_AUTOMATICO.fullmatch(numero):
+        return f"número {numero} está no formato reservado à numeração automática (PV-00000000)"
+    return None
+
+
+def prefetch_itens() -> Prefetch:
+    """Itens do pedido com o produto (duas consultas para qualquer nº de pedidos)."""
+    return Prefetch("itens", queryset=ItemPedido.objects.select_related("produto").order_by("id"))
+
+
+def _sku_por_id(itens) -> dict[int, str]:
+    ids = {it["produto"] for it in itens if it.get("produto")}
+    return dict(Produto.objects.filter(pk__in=ids).values_list("pk", "sku")) if ids else {}
+
+
+def _skus(itens, sku_por_id) -> list[str | None]:
+    return [sku_por_id.get(it["produto"]) if it.get("produto") else it.get("produto_sku") for it in itens]
+
+
+def montar_itens(tabela: str, itens: list[dict], precos=None, sku_por_id=None) -> list[ItemPedido]:
+    """
+    ItemPedido (sem pedido, não gravados) para `itens` = [{produto (id) |
+    produto_sku, qtd, preco_unit?, desconto?}]. Sem preco_unit, usa o preço da
+    tabela. Junta todos os erros num PedidoInvalido. `precos`/`sku_por_id` já
+    resolvidos podem ser passados (lote de pedidos).
+    """
+    if sku_por_id is None:
+        sku_por_id = _sku_por_id(itens)
+    skus = _skus(itens, sku_por_id)
+    if precos is None:
+        precos = resolver_precos(tabela, [s for s in skus if s])
+
+    objs, erros = [], []
+    for i, (it, sku) in enumerate(zip(itens, skus), start=1):
+        p = precos.get(sku) if sku else None
+        if p is None:
+            erros.append(f"Item {i}: produto {sku or it.get('produto') or '?'} não encontrado")
+            continue
+        preco_unit = it.get("preco_unit")
+        if preco_unit is None:
+            if p.preco is None:
+                erros.append(f"Item {i}: produto {sku} não possui preço na tabela '{tabela}'")
+                continue
+            preco_unit = p.preco
+        qtd = it.get("qtd") or 1
+        desconto = it.get("desconto") or 0
+        objs.append(ItemPedido(
+            produto_id=p.produto_id, qtd=qtd, preco_unit=preco_unit, desconto=desconto,
+            subtotal=ItemPedido.calcular_subtotal(qtd, preco_unit, desconto),
+        ))
+    if erros:
+        raise PedidoInvalido(erros)
+    return objs
+
+
+def criar_pedido(campos: dict, itens: list[dict], tabela: str) -> Pedido:
+    """
+    Cria o pedido (`campos` = cliente, representante, status, numero?) com seus
+    itens. Número de consultas fixo, independente da quantidade de itens.
+    """
+    erro = numero_invalido(campos.get("numero"))
+    if erro:
+        raise PedidoInvalido([erro])
+    with transaction.atomic():
+        objs = montar_itens(tabela, itens)
+        campos = dict(campos)
+        if not campos.get("numero"):
+            campos["numero"] = proximos_numeros(1)[0]
+        pedido = Pedido.objects.create(total=sum((o.subtotal for o in objs), Decimal("0")), **campos)
+        for o in objs:
+            o.pedido = pedido
+        ItemPedido.objects.bulk_create(objs)
+    pedido._created_items = objs
+    return pedido
+
+
+# ---------- Vários pedidos numa chamada ----------
+
+def criar_pedidos_em_lote(entradas: list[dict], enviar: bool = False, representante_padrao=None) -> list[dict]:
+    """
+    Cria vários pedidos de uma vez (sincronização offline). Cada entrada:
+    {chave?, cliente, representante?, tabela?, numero?, itens: [...]}.
+
+    - `chave` (idempotência): se já existe pedido com a chave, ele é devolvido
+      como "existente" em vez de criar outro (reenvio após queda de conexão);
+    - clientes, representantes, produtos e preços são resolvidos em lote;
+    - os pedidos válidos são gravados juntos (bulk_create de pedidos e de
+      itens, rollup por chave) e, com `enviar`, já entram como ENVIADO.
+
+    Se a gravação conjunta colide (IntegrityError: outro envio gravou a mesma
+    chave ou número no meio do caminho), o lote é refeito: na 2ª volta esses
+    já aparecem como existentes e os demais são gravados um a um, cada um no
+    seu savepoint; o que ainda colidir volta como erro em vez de derrubar o
+    lote inteiro.
+
+    Retorna um resultado por entrada, na ordem: status criado/existente/erro.
+    """
+    try:
+        return _criar_lote(entradas, enviar, representante_padrao)
+    except IntegrityError:
+        return _criar_lote(entradas, enviar, representante_padrao, um_a_um=True)
+
+
+def _criar_lote(entradas, enviar, representante_padrao, um_a_um=False):
+    resultados: list[dict] = [{"indice": i, "chave": e.get("chave") or None} for i, e in enumerate(entradas)]
+
+    chaves = [e["chave"] for e in entradas if e.get("chave")]
+    existentes = {
+        p.chave_idempotencia: p
+        for p in Pedido.objects.filter(chave_idempotencia__in=chaves).only("id", "numero", "total", "status", "chave_idempotencia")
+    } if chaves else {}
+    clientes = Cliente.objects.in_bulk({e.get("cliente") for e in entradas if e.get("cliente")})
+    reps = Representante.objects.in_bulk({e.get("representante") for e in entradas if e.get("representante")})
+    numeros_usados = set(
+        Pedido.objects.filter(numero__in=[e["numero"] for e in entradas if e.get("numero")])
+        .values_list("numero", flat=True)
+    )
+
+    # produtos por id de todos os pedidos e preços por tabela (uma consulta cada)
+    todos_itens = [it for e in entradas for it in (e.get("itens") or [])]
+    sku_por_id = _sku_por_id(todos_itens)
+    skus_por_tabela: dict[str, set] = {}
+    for e in entradas:
+        skus_por_tabela.setdefault(e.get("tabela") or "Padrão", set()).update(
+            s for s in _skus(e.get("itens") or [], sku_por_id) if s
+        )
+    precos = {tab: resolver_precos(tab, skus) for tab, skus in skus_por_tabela.items()}
+
+    vistos, novos = set(), []  # novos: (indice, Pedido, itens)
+    for i, e in enumerate(entradas):
+        r = resultados[i]
+        chave = e.get("chave")
+        if chave and chave in existentes:
+            p = existentes[chave]
+            r.update(status="existente", id=p.pk, numero=p.numero, total=str(p.total), situacao=p.status)
+            continue
+        erros = []
+        if chave and chave in vistos:
+            erros.append("chave repetida no lote")
+        erro_numero = numero_invalido(e.get("numero"))
+        if erro_numero:
+            erros.append(erro_numero)
+        elif e.get("numero") and e["numero"] in numeros_usados:
+            erros.append(f"número {e['numero']} já existe")
+        cliente = clientes.get(e.get("cliente"))
+        if cliente is None:
+            erros.append(f"cliente {e.get('cliente')} não encontrado")
+        rep = reps.get(e.get("representante")) if e.get("representante") else representante_padrao
+        if rep is None:
+            erros.append("representante não informado/encontrado")
+        tabela = e.get("tabela") or "Padrão"
+        itens = e.get("itens") or []
+        if enviar and not itens:
+            erros.append("Pedido sem itens.")
+        try:
+            objs = montar_itens(tabela, itens, precos=precos[tabela], sku_por_id=sku_por_id)
+        except PedidoInvalido as ex:
+            erros.extend(ex.erros)
+            objs = []
+        if erros:
+            r.update(status="erro", erros=erros)
+            continue
+        if chave:
+            vistos.add(chave)
+        if e.get("numero"):
+            numeros_usados.add(e["numero"])
+        pedido = Pedido(
+            numero=e.get("numero") or "", cliente=cliente, representante=rep,
+            status="ENVIADO" if enviar else "RASCUNHO", chave_idempotencia=chave or None,
+            total=sum((o.subtotal for o in objs), Decimal("0")),
+        )
+        novos.append((i, pedido, objs))
+
+    if um_a_um:
+        gravados = []
+        for novo in novos:
+            try:
+                _gravar_novos([novo])
+            except IntegrityError:
+                resultados[novo[0]].update(status="erro", erros=["chave ou número gravado por outro envio"])
+            else:
+                gravados.append(novo)
+        novos = gravados
+    elif novos:
+        _gravar_novos(novos)
+    for i, p, objs in novos:
+        resultados[i].update(status="criado", id=p.pk, numero=p.numero, total=str(p.total),
+                             situacao=p.status, itens=len(objs))
+    return resultados
+
+
+def _gravar_novos(novos):
+    """Grava [(indice, Pedido, itens)] numa transação: números, bulk_create e rollup."""
+    with transaction.atomic():
+        numeros = iter(proximos_numeros(sum(1 for _, p, _ in novos if not p.numero)))
+        for _, p, _ in novos:
+            p.numero = p.numero or next(numeros)
+        Pedido.objects.bulk_create([p for _, p, _ in novos])
+        itens_objs = []
+        for _, p, objs in novos:
+            for o in objs:
+                o.pedido = p
+            itens_objs.extend(objs)
+        ItemPedido.objects.bulk_create(itens_objs)
+        # bulk_create não dispara os signals do rollup: soma por chave aqui
+        por_chave: dict[tuple, list] = {}
+        for _, p, _ in novos:
+            acc = por_chave.setdefault(vendas_diarias.chave_pedido(p), [0, Decimal("0")])
+            acc[0] += 1
+            acc[1] += p.total
+        for chave_rollup, (n, total) in por_chave.items():
+            vendas_diarias.aplicar(chave_rollup, n, total)
+        invalidar_relatorios()
+
+
+# ---------- Total incremental ----------
+
+def ajustar_total(pedido_id, delta):
+    """
+    Soma `delta` ao total do pedido e à linha dele no rollup VendaDiaria
+    (o UPDATE direto não passa pelos signals do Pedido).
+    """
+    if not delta:
+        return
+    with transaction.atomic():
+        Pedido.objects.filter(pk=pedido_id).update(total=F("total") + delta)
+        pedido = (
+            Pedido.objects.filter(pk=pedido_id).select_related("cliente")
+            .only("criado_em", "representante_id", "cliente_id", "cliente__uf", "status").first()
+        )
+        if pedido is not None:
+            vendas_diarias.aplicar(vendas_diarias.chave_pedido(pedido), 0, delta)
+        invalidar_relatorios()
+
+
+def soma_itens(pedido_id) -> Decimal:
+    return ItemPedido.objects.filter(pedido_id=pedido_id).aggregate(
+        s=Coalesce(Sum("subtotal"), Value(Decimal("0")))
+    )["s"]
+
+
+def totais_divergentes():
+    """Pedidos cujo total difere da soma dos subtotais (annotate `soma_itens`)."""
+    zero = Value(Decimal("0"), output_field=DecimalField(max_digits=14, decimal_places=2))
+    return (
+        Pedido.objects.annotate(soma_itens=Coalesce(Sum("itens__subtotal"), zero))
+        .filter(~Q(total=F("soma_itens")))
+        .order_by("pk")
+    )
+
+
+def reconciliar_totais(corrigir: bool = True, limite: int | None = None) -> dict:
+    """
+    Encontra pedidos com total divergente e, com `corrigir`, grava a soma dos
+    itens e recalcula as linhas do rollup desses pedidos (não dá para saber
+    se a divergência chegou ao rollup, então elas são refeitas a partir de
+    Pedido). Retorna contagens e amostra.
+    """
+    qs = totais_divergentes().select_related("cliente")
+    if limite:
+        qs = qs[:limite]
+    resumo = {"divergentes": 0, "corrigidos": 0, "amostra": []}
+    chaves = set()
+    for p in qs.iterator(chunk_size=500):
+        resumo["divergentes"] += 1
+        if len(resumo["amostra"]) < 20:
+            resumo["amostra"].append({"numero": p.numero, "total": str(p.total), "soma_itens": str(p.soma_itens)})
+        if corrigir:
+            with transaction.atomic():
+                # trava o pedido e soma de novo: um item pode ter mudado desde a consulta
+                list(Pedido.objects.select_for_update().filter(pk=p.pk).values_list("pk", flat=True))
+                Pedido.objects.filter(pk=p.pk).update(total=soma_itens(p.pk))
+                invalidar_relatorios()
+            chaves.add(vendas_diarias.chave_pedido(p))
+            resumo["corrigidos"] += 1
+    if chaves:
+        vendas_diarias.recalcular_chaves(chaves)
+    return resumo
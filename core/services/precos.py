@@ -0,0 +1,165 @@
+"""
+Preços por tabela (Preco(produto, tabela)).
+
+resolver_precos(): preço de vários SKUs numa tabela, com cache no processo
+chaveado por (tabela, sku). O cache vale enquanto o contador "precos"
+(core.services.contadores) não mudar; qualquer save/delete de Preco, Produto
+ou TabelaDePreco e as importações em lote chamam invalidar_precos(), então
+todos os workers do gunicorn enxergam o preço novo na próxima chamada, sem
+servidor de cache. Os SKUs fora do cache são buscados numa consulta só.
+
+importar_precos(): carrega uma lista SKU/preço (XLSX/CSV) numa TabelaDePreco.
+O arquivo é lido em streaming e gravado em lotes: cada lote resolve os SKUs com
+uma consulta (sku__in) e faz um INSERT ... ON CONFLICT (produto, tabela)
+DO UPDATE SET preco.
+"""
+import threading
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+
+from core.models import Preco, Produto, TabelaDePreco
+from core.services import contadores
+from core.services.importacao import em_lotes, ler_brutas, linha_preco, parse_bloco
+
+VERSAO_PRECOS = "precos"  # nome do Contador
+
+AMOSTRA_SKUS = 20  # quantos SKUs desconhecidos voltam no resultado
+
+
+class ImportacaoPrecosErro(Exception):
+    pass
+
+
+# ---------- Resolução de preços (cache por processo) ----------
+
+class PrecoSku(NamedTuple):
+    produto_id: int
+    sku: str
+    descricao: str
+    preco: Decimal | None           # na tabela pedida
+    preco_fallback: Decimal | None  # de qualquer tabela (a primeira cadastrada)
+
+
+_cache: dict[tuple[str, str], PrecoSku | None] = {}
+_cache_versao: int | None = None
+_cache_lock = threading.Lock()
+
+
+def invalidar_precos():
+    """Nova versão dos preços depois do commit (os caches dos processos são descartados)."""
+    transaction.on_commit(lambda: contadores.incrementar(VERSAO_PRECOS))
+
+
+def limpar_cache_local():
+    """Esvazia o cache deste processo (benchmarks/diagnóstico)."""
+    global _cache_versao
+    with _cache_lock:
+        _cache.clear()
+        _cache_versao = None
+
+
+def resolver_precos(tabela: str, skus) -> dict[str, PrecoSku | None]:
+    """
+    {sku: PrecoSku ou None (SKU não cadastrado)} para os `skus` na tabela de
+    nome `tabela`. Custa 1 consulta (versão) + 1 para os SKUs fora do cache.
+    """
+    global _cache_versao
+    versao = contadores.valor(VERSAO_PRECOS)
+    achados, faltando = {}, []
+    with _cache_lock:
+        if versao != _cache_versao:
+            _cache.clear()
+            _cache_versao = versao
+        for sku in dict.fromkeys(skus):
+            chave = (tabela, sku)
+            if chave in _cache:
+                achados[sku] = _cache[chave]
+            else:
+                faltando.append(sku)
+
+    if faltando:
+        novos = _buscar_precos(tabela, faltando)
+        with _cache_lock:
+            # se a versão mudou enquanto buscava, não guarda (pode estar velho)
+            if _cache_versao == versao:
+                if len(_cache) + len(novos) > getattr(settings, "PRECOS_CACHE_MAX", 50_000):
+                    _cache.clear()
+                _cache.update({(tabela, sku): r for sku, r in novos.items()})
+        achados.update(novos)
+    return achados
+
+
+def _buscar_precos(tabela: str, skus: list[str]) -> dict[str, PrecoSku | None]:
+    # LEFT JOIN produto -> preco -> tabela: uma linha por (produto, preço)
+    res: dict[str, PrecoSku | None] = dict.fromkeys(skus)
+    linhas = (
+        Produto.objects.filter(sku__in=skus)
+        .order_by("pk", "preco__id")
+        .values_list("id", "sku", "descricao", "preco__tabela__nome", "preco__preco")
+    )
+    for pid, sku, descricao, tab_nome, preco in linhas:
+        atual = res[sku] or PrecoSku(pid, sku, descricao, None, None)
+        if preco is not None:
+            if tab_nome == tabela and atual.preco is None:
+                atual = atual._replace(preco=preco)
+            if atual.preco_fallback is None:
+                atual = atual._replace(preco_fallback=preco)
+        res[sku] = atual
+    return res
+
+
+# ---------- Importação de listas de preço ----------
+
+def importar_precos(path, tabela: str, chunk: int = 5000, criar_tabela: bool = False, ao_lote=None) -> dict:
+    """
+    Importa o arquivo `path` na tabela de nome `tabela`, tudo numa transação.
+    `ao_lote(n_lote, resumo)` é chamado após cada lote (log/progresso de Job).
+    Retorna o resumo: linhas, gravados, sem_preco, skus_desconhecidos (+ amostra).
+    """
+    if criar_tabela:
+        tab, _ = TabelaDePreco.objects.get_or_create(nome=tabela)
+    else:
+        tab = TabelaDePreco.objects.filter(nome=tabela).first()
+        if tab is None:
+            raise ImportacaoPrecosErro(f"Tabela de preço não encontrada: {tabela}")
+
+    resumo = {"tabela": tab.nome, "linhas": 0, "gravados": 0, "sem_preco": 0,
+              "skus_desconhecidos": 0, "amostra_desconhecidos": []}
+    headers, brutas = ler_brutas(path)
+    with transaction.atomic():
+        for n_lote, bloco in enumerate(em_lotes(brutas, max(1, chunk)), 1):
+            itens, n, _ = parse_bloco(linha_preco, headers, bloco)
+            resumo["linhas"] += n
+            _gravar_lote(tab, itens, resumo)
+            if ao_lote:
+                ao_lote(n_lote, resumo)
+        invalidar_precos()
+    return resumo
+
+
+def _gravar_lote(tab: TabelaDePreco, itens, resumo: dict):
+    precos = {}
+    for sku, preco in itens:
+        if preco is None:
+            resumo["sem_preco"] += 1
+        else:
+            precos[sku] = preco  # SKU repetido: vale a última linha
+    ids = dict(Produto.objects.filter(sku__in=list(precos)).values_list("sku", "id"))
+
+    objs = []
+    for sku, preco in precos.items():
+        pid = ids.get(sku)
+        if pid is None:
+            resumo["skus_desconhecidos"] += 1
+            if len(resumo["amostra_desconhecidos"]) < AMOSTRA_SKUS:
+                resumo["amostra_desconhecidos"].append(sku)
+            continue
+        objs.append(Preco(produto_id=pid, tabela=tab, preco=preco))
+    if objs:
+        Preco.objects.bulk_create(
+            objs, update_conflicts=True, unique_fields=["produto", "tabela"], update_fields=["preco"],
+        )
+    resumo["gravados"] += len(objs)
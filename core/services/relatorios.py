@@ -0,0 +1,310 @@
+"""
+Relatórios de vendas exportáveis (/api/relatorios/*): filtros, consultas e
+geração dos arquivos CSV/XLSX/PDF.
+
+As views de api/views_reports.py montam as respostas HTTP a partir daqui e o
+job relatorio_export (core/views_jobs.py) grava o mesmo arquivo no banco, sem
+passar por uma requisição. `params` é qualquer mapeamento com .get() (o
+QueryDict da requisição ou o dict guardado no payload do job).
+"""
+import csv
+import io
+import itertools
+from datetime import datetime, time
+from decimal import Decimal
+from typing import Callable, Iterable, NamedTuple
+
+from django.conf import settings
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import ItemPedido, Pedido, Representante, VendaDiaria
+from core.services.exportacao import XLSX_CONTENT_TYPE, xlsx_tempfile
+
+# linhas buscadas por vez nas exportações em streaming
+EXPORT_CHUNK_SIZE = 2000
+
+# bytes lidos por vez de um arquivo gerado (XLSX/PDF)
+BLOCO_ARQUIVO = 64 * 1024
+
+# linhas que cabem no PDF
+PDF_MAX_LINHAS = 60
+
+
+# ---------- Filtros ----------
+
+def _parse_date(date_str: str | None):
+    if not date_str:
+        return None
+    try:
+        d = datetime.fromisoformat(date_str).date()
+        return d
+    except ValueError:
+        return None
+
+def periodo(de_str: str | None, ate_str: str | None):
+    """(início, fim) aware; sem datas vale do dia 1 do mês corrente até agora."""
+    de_date = _parse_date(de_str)
+    ate_date = _parse_date(ate_str)
+    if de_date:
+        start = timezone.make_aware(datetime.combine(de_date, time(0, 0, 0)))
+    else:
+        today = timezone.localdate()
+        start = timezone.make_aware(datetime.combine(today.replace(day=1), time(0, 0, 0)))
+    if ate_date:
+        end = timezone.make_aware(datetime.combine(ate_date, time(23, 59, 59)))
+    else:
+        end = timezone.now()
+    return start, end
+
+def restringir_por_usuario(qs, user):
+    """Staff vê tudo; o representante só os próprios pedidos; os demais, nada."""
+    if user.is_staff:
+        return qs
+    try:
+        rep = Representante.objects.get(user=user)
+        return qs.filter(representante=rep)
+    except Representante.DoesNotExist:
+        return qs.none()
+
+def _dias_do_periodo(start, end):
+    """
+    (dia_ini, dia_fim) se [start, end] cobre dias inteiros e o rollup
+    VendaDiaria pode responder pelo período; None caso contrário.
+    """
+    if not getattr(settings, "RELATORIOS_USAR_ROLLUP", True):
+        return None
+    ini = timezone.localtime(start)
+    fim = timezone.localtime(end)
+    if ini.time() != time(0, 0, 0):
+        return None
+    # fim em 23:59:59 ou no dia de hoje (não há pedidos no futuro) fecham o último dia
+    if fim.time() < time(23, 59, 59) and fim.date() < timezone.localdate():
+        return None
+    return ini.date(), fim.date()
+
+def vendas_qs(start, end):
+    """
+    Base dos relatórios de vendas: VendaDiaria quando o período permite,
+    Pedido cru quando não. Retorna (qs, rollup).
+    """
+    dias = _dias_do_periodo(start, end)
+    if dias:
+        return VendaDiaria.objects.filter(dia__gte=dias[0], dia__lte=dias[1]), True
+    return Pedido.objects.filter(criado_em__gte=start, criado_em__lte=end), False
+
+def _pedidos_filtrados(params, user):
+    start, end = periodo(params.get("de"), params.get("ate"))
+    pedidos = restringir_por_usuario(Pedido.objects.filter(criado_em__gte=start, criado_em__lte=end), user)
+    return start, end, pedidos
+
+
+# ---------- Consultas ----------
+
+def vendas_resumo(params, user):
+    """(início, fim, total e nº de pedidos por cliente) com os filtros rep/cliente/status."""
+    start, end = periodo(params.get("de"), params.get("ate"))
+    qs, rollup = vendas_qs(start, end)
+    qs = restringir_por_usuario(qs, user)
+    if params.get("rep"):
+        qs = qs.filter(representante__codigo=params.get("rep"))
+    if params.get("cliente"):
+        qs = qs.filter(cliente_id=params.get("cliente"))
+    if params.get("status"):
+        qs = qs.filter(status=params.get("status"))
+    n_pedidos = Coalesce(Sum("pedidos"), Value(0)) if rollup else Count("id")
+    por_cliente = (
+        qs.values("cliente_id", "cliente__nome")
+          .annotate(total=Coalesce(Sum("total"), Value(Decimal("0"))), pedidos=n_pedidos)
+          .order_by("-total")
+    )
+    return start, end, por_cliente
+
+def top_itens(params):
+    return int(params.get("top") or 20)
+
+def itens_mais_vendidos(params, user):
+    """(início, fim, `top` produtos por quantidade vendida no período)."""
+    start, end, pedidos = _pedidos_filtrados(params, user)
+    itens = (
+        ItemPedido.objects.filter(pedido__in=pedidos)
+        .values("produto_id", "produto__sku", "produto__descricao")
+        .annotate(
+            qtd_total=Coalesce(Sum("qtd"), Value(Decimal("0"))),
+            valor_total=Coalesce(Sum(F("qtd") * F("preco_unit") - Coalesce(F("desconto"), Value(Decimal("0")))), Value(Decimal("0"))),
+        )
+        .order_by("-qtd_total")[:top_itens(params)]
+    )
+    return start, end, itens
+
+CAMPOS_ITENS_DETALHE = [
+    "pedido__numero", "pedido__criado_em", "pedido__status", "pedido__representante__codigo",
+    "pedido__cliente_id", "pedido__cliente__nome", "produto__sku", "produto__descricao",
+    "qtd", "preco_unit", "desconto", "subtotal",
+]
+
+def itens_detalhe(params, user):
+    """Uma linha por ItemPedido (CAMPOS_ITENS_DETALHE), na ordem dos pedidos."""
+    _, _, pedidos = _pedidos_filtrados(params, user)
+    if params.get("rep"):
+        pedidos = pedidos.filter(representante__codigo=params.get("rep"))
+    if params.get("cliente"):
+        pedidos = pedidos.filter(cliente_id=params.get("cliente"))
+    if params.get("status"):
+        pedidos = pedidos.filter(status=params.get("status"))
+    return (
+        ItemPedido.objects.filter(pedido__in=pedidos)
+        .order_by("pedido__criado_em", "pedido_id", "id")
+        .values_list(*CAMPOS_ITENS_DETALHE)
+    )
+
+
+# ---------- Tabelas exportáveis ----------
+
+class Tabela(NamedTuple):
+    arquivo: str                # nome do arquivo, sem extensão
+    aba: str                    # aba do XLSX
+    cabecalho: list
+    linhas: Iterable[list]      # valores crus (Decimal, datetime aware), lidos uma vez
+    titulo_pdf: str = ""
+    linha_pdf: Callable[[list], str] | None = None  # None: sem PDF, sai CSV
+
+def _tabela_vendas_resumo(params, user) -> Tabela:
+    _, _, por_cliente = vendas_resumo(params, user)
+    return Tabela(
+        "vendas_resumo", "Resumo", ["cliente_id", "cliente_nome", "pedidos", "total"],
+        (
+            [r["cliente_id"], r["cliente__nome"], r["pedidos"], r["total"]]
+            for r in por_cliente.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        ),
+        "Resumo de Vendas", lambda r: f"{r[1]}  | pedidos={r[2]}  | total=R$ {r[3]}",
+    )
+
+def _tabela_itens_mais_vendidos(params, user) -> Tabela:
+    _, _, itens = itens_mais_vendidos(params, user)
+    return Tabela(
+        "itens_mais_vendidos", "Itens", ["produto_id", "sku", "descricao", "qtd_total", "valor_total"],
+        (
+            [r["produto_id"], r["produto__sku"], r["produto__descricao"], r["qtd_total"], r["valor_total"]]
+            for r in itens.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        ),
+        "Itens mais vendidos", lambda r: f"{r[1]} - {r[2]} | qtd={r[3]} | R$ {r[4]}",
+    )
+
+def _tabela_itens_detalhe(params, user) -> Tabela:
+    return Tabela(
+        "itens_detalhe", "Itens",
+        ["pedido", "criado_em", "status", "representante", "cliente_id", "cliente_nome",
+         "sku", "descricao", "qtd", "preco_unit", "desconto", "subtotal"],
+        (list(r) for r in itens_detalhe(params, user).iterator(chunk_size=EXPORT_CHUNK_SIZE)),
+    )
+
+# relatório (último trecho da URL) -> tabela exportável
+TABELAS = {
+    "vendas-resumo": _tabela_vendas_resumo,
+    "itens-mais-vendidos": _tabela_itens_mais_vendidos,
+    "itens-detalhe": _tabela_itens_detalhe,
+}
+
+def tabela(relatorio: str, params, user) -> Tabela:
+    try:
+        return TABELAS[relatorio](params, user)
+    except KeyError:
+        raise ValueError(f"Relatório sem exportação: {relatorio}") from None
+
+
+# ---------- Arquivos ----------
+
+class Arquivo:
+    """
+    Arquivo exportado: CSV gerado sob demanda (`blocos`) ou XLSX/PDF já
+    gravado num arquivo temporário (`arquivo`). Iterar devolve os bytes em
+    blocos; `linhas` (sem o cabeçalho) no CSV só fica certo depois disso.
+    """
+
+    def __init__(self, nome: str, content_type: str, blocos=None, arquivo=None, linhas: int = 0):
+        self.nome = nome
+        self.content_type = content_type
+        self.blocos = blocos
+        self.arquivo = arquivo
+        self.linhas = linhas
+
+    def __iter__(self):
+        if self.arquivo is None:
+            return iter(self.blocos)
+        return iter(lambda: self.arquivo.read(BLOCO_ARQUIVO), b"")
+
+    def close(self):
+        if self.arquivo is not None:
+            self.arquivo.close()
+
+
+class _Echo:
+    """Pseudo-arquivo para csv.writer: devolve a linha em vez de guardá-la."""
+    def write(self, value):
+        return value
+
+def _celula_csv(v, tz):
+    return v.astimezone(tz).isoformat() if isinstance(v, datetime) else v
+
+def _celula_xlsx(v, tz):
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, datetime):
+        return v.astimezone(tz).replace(tzinfo=None)
+    return v
+
+def gerar_csv(tab: Tabela) -> Arquivo:
+    """
+    CSV gerado linha a linha a partir de `tab.linhas` (um iterador de
+    queryset), sem o resultado nem o arquivo inteiros em memória.
+    """
+    w = csv.writer(_Echo())
+    tz = timezone.get_current_timezone()
+
+    def blocos():
+        yield w.writerow(tab.cabecalho).encode()
+        for r in tab.linhas:
+            arq.linhas += 1
+            yield w.writerow([_celula_csv(v, tz) for v in r]).encode()
+    arq = Arquivo(f"{tab.arquivo}.csv", "text/csv; charset=utf-8", blocos=blocos())
+    return arq
+
+def gerar_xlsx(tab: Tabela) -> Arquivo:
+    """
+    XLSX write-only gravado num arquivo temporário; nem as células nem o
+    arquivo inteiro ficam em memória.
+    """
+    tz = timezone.get_current_timezone()
+
+    def linhas():
+        yield tab.cabecalho
+        for r in tab.linhas:
+            yield [_celula_xlsx(v, tz) for v in r]
+    tmp, n = xlsx_tempfile(tab.aba, linhas())
+    return Arquivo(f"{tab.arquivo}.xlsx", XLSX_CONTENT_TYPE, arquivo=tmp, linhas=n - 1)
+
+def gerar_pdf(tab: Tabela) -> Arquivo:
+    """As primeiras PDF_MAX_LINHAS linhas, uma por linha de texto."""
+    from reportlab.pdfgen import canvas
+    buf = io.BytesIO(); c = canvas.Canvas(buf); c.setFont("Helvetica", 12)
+    c.drawString(40, 800, tab.titulo_pdf); y = 780
+    n = 0
+    for r in itertools.islice(tab.linhas, PDF_MAX_LINHAS):
+        c.drawString(40, y, tab.linha_pdf(r)[:115]); y -= 18
+        if y < 40: c.showPage(); y = 800
+        n += 1
+    c.save(); buf.seek(0)
+    return Arquivo(f"{tab.arquivo}.pdf", "application/pdf", arquivo=buf, linhas=n)
+
+def gerar_arquivo(tab: Tabela, fmt: str) -> Arquivo:
+    """Arquivo no formato pedido; PDF de relatório sem versão em PDF e formatos desconhecidos saem em CSV."""
+    if fmt == "xlsx":
+        return gerar_xlsx(tab)
+    if fmt == "pdf" and tab.linha_pdf is not None:
+        return gerar_pdf(tab)
+    return gerar_csv(tab)
+
+def exportar(relatorio: str, params, user, fmt: str) -> Arquivo:
+    return gerar_arquivo(tabela(relatorio, params, user), fmt)
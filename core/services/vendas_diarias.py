@@ -0,0 +1,148 @@
+"""
+Manutenção do rollup VendaDiaria.
+
+Cada Pedido contribui com (pedidos=1, total=Pedido.total) para a linha
+(dia, representante, cliente, uf, status). Mudanças em um pedido são aplicadas
+como "retira a contribuição antiga, soma a nova".
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from core.models import Pedido, VendaDiaria
+from core.services.cache_relatorios import invalidar_relatorios
+
+
+def chave_pedido(pedido: Pedido, uf: str | None = None):
+    """(dia, representante_id, cliente_id, uf, status) de um pedido."""
+    if uf is None:
+        uf = pedido.cliente.uf or ""
+    return (
+        timezone.localdate(pedido.criado_em),
+        pedido.representante_id,
+        pedido.cliente_id,
+        uf,
+        pedido.status,
+    )
+
+
+def aplicar(chave, pedidos: int, total):
+    """Soma (pedidos, total) à linha da chave, criando-a se preciso."""
+    if not pedidos and not total:
+        return
+    dia, rep_id, cli_id, uf, status = chave
+    lookup = dict(dia=dia, representante_id=rep_id, cliente_id=cli_id, uf=uf, status=status)
+    with transaction.atomic():
+        n = VendaDiaria.objects.filter(**lookup).update(
+            pedidos=F("pedidos") + pedidos, total=F("total") + total
+        )
+        if not n:
+            try:
+                with transaction.atomic():
+                    VendaDiaria.objects.create(pedidos=pedidos, total=total, **lookup)
+            except IntegrityError:
+                # outro processo criou a linha entre o UPDATE e o INSERT
+                VendaDiaria.objects.filter(**lookup).update(
+                    pedidos=F("pedidos") + pedidos, total=F("total") + total
+                )
+        VendaDiaria.objects.filter(pedidos=0, **lookup).delete()
+
+
+def _agregado_pedidos(qs=None):
+    tz = timezone.get_current_timezone()
+    qs = Pedido.objects.all() if qs is None else qs
+    return (
+        qs.annotate(dia=TruncDate("criado_em", tzinfo=tz))
+          .values("dia", "representante_id", "cliente_id", "cliente__uf", "status")
+          .annotate(n=Count("id"), s=Coalesce(Sum("total"), Value(Decimal("0"))))
+          .order_by()
+    )
+
+
+def recalcular_chaves(chaves) -> None:
+    """Recalcula do zero as linhas do rollup das chaves dadas (correções pontuais)."""
+    tz = timezone.get_current_timezone()
+    with transaction.atomic():
+        for dia, rep_id, cli_id, uf, status in set(chaves):
+            inicio = timezone.make_aware(datetime.combine(dia, time.min), tz)
+            qs = Pedido.objects.filter(
+                criado_em__gte=inicio, criado_em__lt=inicio + timedelta(days=1),
+                representante_id=rep_id, cliente_id=cli_id, cliente__uf=uf, status=status,
+            )
+            ag = qs.aggregate(n=Count("id"), s=Coalesce(Sum("total"), Value(Decimal("0"))))
+            lookup = dict(dia=dia, representante_id=rep_id, cliente_id=cli_id, uf=uf, status=status)
+            if ag["n"]:
+                VendaDiaria.objects.update_or_create(defaults={"pedidos": ag["n"], "total": ag["s"]}, **lookup)
+            else:
+                VendaDiaria.objects.filter(**lookup).delete()
+        invalidar_relatorios()
+
+
+def recalcular_clientes(cliente_ids, batch_size: int = 2000) -> int:
+    """
+    Refaz as linhas do rollup dos clientes dados a partir de Pedido. A UF do
+    cliente faz parte da chave: quando ela muda, as linhas com a UF antiga
+    somem e as da nova são criadas.
+    """
+    ids = list(cliente_ids)
+    if not ids:
+        return 0
+    with transaction.atomic():
+        VendaDiaria.objects.filter(cliente_id__in=ids).delete()
+        objs = [
+            VendaDiaria(
+                dia=r["dia"], representante_id=r["representante_id"], cliente_id=r["cliente_id"],
+                uf=r["cliente__uf"] or "", status=r["status"], pedidos=r["n"], total=r["s"],
+            )
+            for r in _agregado_pedidos(Pedido.objects.filter(cliente_id__in=ids)).iterator()
+        ]
+        VendaDiaria.objects.bulk_create(objs, batch_size=batch_size)
+        invalidar_relatorios()
+    return len(objs)
+
+
+def rebuild(batch_size: int = 2000) -> int:
+    """Apaga e recalcula o rollup inteiro a partir de Pedido."""
+    with transaction.atomic():
+        VendaDiaria.objects.all().delete()
+        objs = [
+            VendaDiaria(
+                dia=r["dia"], representante_id=r["representante_id"], cliente_id=r["cliente_id"],
+                uf=r["cliente__uf"] or "", status=r["status"], pedidos=r["n"], total=r["s"],
+            )
+            for r in _agregado_pedidos().iterator()
+        ]
+        VendaDiaria.objects.bulk_create(objs, batch_size=batch_size)
+        invalidar_relatorios()
+    return len(objs)
+
+
+def diff():
+    """
+    Compara o rollup com o agregado de Pedido.
+    Retorna lista de (chave, esperado, atual) com (pedidos, total) divergentes.
+    """
+    esperado = {
+        (r["dia"], r["representante_id"], r["cliente_id"], r["cliente__uf"] or "", r["status"]):
+            (r["n"], Decimal(r["s"]))
+        for r in _agregado_pedidos().iterator()
+    }
+    atual = {
+        (v["dia"], v["representante_id"], v["cliente_id"], v["uf"], v["status"]):
+            (v["pedidos"], Decimal(v["total"]))
+        for v in VendaDiaria.objects.values(
+            "dia", "representante_id", "cliente_id", "uf", "status", "pedidos", "total"
+        ).iterator()
+    }
+    zero = (0, Decimal("0"))
+    out = []
+    for chave in esperado.keys() | atual.keys():
+        e = esperado.get(chave, zero)
+        a = atual.get(chave, zero)
+        if e[0] != a[0] or e[1].quantize(Decimal("0.01")) != a[1].quantize(Decimal("0.01")):
+            out.append((chave, e, a))
+    return sorted(out, key=lambda x: x[0])
@@ -0,0 +1,118 @@
+# core/signals.py
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import Cliente, IndiceBusca, ItemPedido, Pedido, Preco, Produto, TabelaDePreco
+from .services import busca, vendas_diarias
+from .services.cache_relatorios import invalidar_relatorios
+from .services.precos import invalidar_precos
+
+
+# ---------- Rollup VendaDiaria ----------
+# pre_save/pre_delete guardam a contribuição que o pedido tem hoje no banco;
+# post_save/post_delete retiram essa contribuição e aplicam a nova.
+
+def _contribuicao_no_banco(pk):
+    antigo = (
+        Pedido.objects.filter(pk=pk)
+        .select_related("cliente")
+        .only("criado_em", "representante_id", "cliente_id", "cliente__uf", "status", "total")
+        .first()
+    )
+    if antigo is None:
+        return None
+    return vendas_diarias.chave_pedido(antigo), antigo.total
+
+
+@receiver(pre_save, sender=Pedido)
+def _pedido_pre_save(sender, instance: Pedido, raw=False, **kwargs):
+    instance._venda_diaria_antes = None
+    if not raw and instance.pk:
+        instance._venda_diaria_antes = _contribuicao_no_banco(instance.pk)
+
+
+@receiver(post_save, sender=Pedido)
+def _pedido_post_save(sender, instance: Pedido, raw=False, **kwargs):
+    if raw:
+        return
+    antes = getattr(instance, "_venda_diaria_antes", None)
+    # mesma UF da contribuição antiga se o cliente não mudou (evita buscar o cliente)
+    if antes and antes[0][2] == instance.cliente_id:
+        depois = vendas_diarias.chave_pedido(instance, uf=antes[0][3])
+    else:
+        depois = vendas_diarias.chave_pedido(instance)
+    if antes == (depois, instance.total):
+        return
+    if antes:
+        vendas_diarias.aplicar(antes[0], -1, -antes[1])
+    vendas_diarias.aplicar(depois, 1, instance.total)
+
+
+@receiver(pre_delete, sender=Pedido)
+def _pedido_pre_delete(sender, instance: Pedido, **kwargs):
+    instance._venda_diaria_antes = _contribuicao_no_banco(instance.pk)
+
+
+@receiver(post_delete, sender=Pedido)
+def _pedido_post_delete(sender, instance: Pedido, **kwargs):
+    antes = getattr(instance, "_venda_diaria_antes", None)
+    if antes:
+        vendas_diarias.aplicar(antes[0], -1, -antes[1])
+
+
+# a UF do cliente faz parte da chave do rollup: mudou, as linhas dele são refeitas
+
+@receiver(pre_save, sender=Cliente)
+def _cliente_pre_save(sender, instance: Cliente, raw=False, **kwargs):
+    instance._uf_antes = None
+    if not raw and instance.pk:
+        instance._uf_antes = Cliente.objects.filter(pk=instance.pk).values_list("uf", flat=True).first()
+
+
+@receiver(post_save, sender=Cliente)
+def _cliente_post_save(sender, instance: Cliente, created=False, raw=False, **kwargs):
+    antes = getattr(instance, "_uf_antes", None)
+    if not raw and not created and antes is not None and antes != instance.uf:
+        vendas_diarias.recalcular_clientes([instance.pk])
+
+
+# ---------- Versão dos relatórios ----------
+# pedido/item gravado ou apagado: as respostas em cache de /api/relatorios/* ficam velhas
+
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+@receiver(post_save, sender=ItemPedido)
+@receiver(post_delete, sender=ItemPedido)
+def _relatorios_alterados(sender, raw=False, **kwargs):
+    if not raw:
+        invalidar_relatorios()
+
+
+# ---------- Versão dos preços ----------
+# qualquer mudança em preço/produto/tabela descarta os caches de preço dos processos
+
+@receiver(post_save, sender=Preco)
+@receiver(post_delete, sender=Preco)
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+@receiver(post_save, sender=TabelaDePreco)
+@receiver(post_delete, sender=TabelaDePreco)
+def _precos_alterados(sender, raw=False, **kwargs):
+    if not raw:
+        invalidar_precos()
+
+
+# ---------- Índice de busca ----------
+
+@receiver(post_save, sender=Produto)
+@receiver(post_save, sender=Cliente)
+def _indexar_busca(sender, instance, raw=False, **kwargs):
+    if not raw:
+        busca.indexar(instance)
+
+
+@receiver(post_delete, sender=Produto)
+@receiver(post_delete, sender=Cliente)
+def _remover_busca(sender, instance, **kwargs):
+    tipo = IndiceBusca.PRODUTO if sender is Produto else IndiceBusca.CLIENTE
+    busca.remover(tipo, [instance.pk])
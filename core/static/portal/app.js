@@ -164,11 +164,10 @@ async function apiPost(url, body) {
   return r.json();
 }
 
-async function loadJobs() {
-  const data = await apiGet("/api/jobs/");
+function renderJobs(lista) {
   const tbody = document.querySelector("#tbl-jobs tbody");
   tbody.innerHTML = "";
-  (data.results || []).forEach(j => {
+  lista.forEach(j => {
     const tr = document.createElement("tr");
     tr.innerHTML = `
       <td>${j.started_at ? new Date(j.started_at).toLocaleString("pt-BR") : "-"}</td>
@@ -185,26 +184,69 @@ async function loadJobs() {
     btn.onclick = () => {
       currentJob = btn.dataset.id;
       document.getElementById("logsBox").textContent = "(carregando logs...)";
-      loadLogs().catch(console.error);
+      if (window.EventSource) streamLogs(currentJob);
+      else loadLogs().catch(console.error);
     };
   });
 }
 
+async function loadJobs() {
+  const data = await apiGet("/api/jobs/");
+  renderJobs(data.results || []);
+}
+
+function formatLog(l) {
+  return `[${new Date(l.ts).toLocaleString("pt-BR")}] ${l.level}: ${l.message}`;
+}
+
 async function loadLogs() {
   if (!currentJob) return;
   const data = await apiGet(`/api/jobs/${currentJob}/logs/`);
   const box = document.getElementById("logsBox");
   box.textContent = (data.results || [])
     .slice().reverse()
-    .map(l => `[${new Date(l.ts).toLocaleString("pt-BR")}] ${l.level}: ${l.message}`)
+    .map(formatLog)
     .join("\n");
   box.scrollTop = box.scrollHeight;
 }
 
+// SSE: o servidor empurra estado/progresso/logs; sem polling ---------------------
+let jobsStream = null;
+let logsStream = null;
+const jobsEstado = new Map();
+
+// EventSource não manda Authorization: os streams usam o cookie da sessão (login do portal)
+
+function streamJobs() {
+  if (jobsStream) jobsStream.close();
+  jobsStream = new EventSource("/api/jobs/stream/");
+  jobsStream.addEventListener("job", ev => {
+    const j = JSON.parse(ev.data);
+    jobsEstado.set(j.id, j);
+    const lista = [...jobsEstado.values()]
+      .sort((a, b) => b.created_at.localeCompare(a.created_at))
+      .slice(0, 20);
+    renderJobs(lista);
+  });
+}
+
+function streamLogs(jobId) {
+  if (logsStream) logsStream.close();
+  const box = document.getElementById("logsBox");
+  box.textContent = "";
+  // reconexões usam o Last-Event-ID: só chegam linhas novas
+  logsStream = new EventSource(`/api/jobs/${jobId}/stream/`);
+  logsStream.addEventListener("log", ev => {
+    box.textContent += (box.textContent ? "\n" : "") + formatLog(JSON.parse(ev.data));
+    box.scrollTop = box.scrollHeight;
+  });
+  logsStream.addEventListener("fim", () => logsStream.close());
+}
+
 async function runJob(type) {
   document.getElementById("jobsBadge").textContent = "executando...";
   await apiPost("/api/jobs/run/", { type });
-  await loadJobs();
+  if (!jobsStream) await loadJobs();
   document.getElementById("jobsBadge").textContent = "pronto";
 }
 
@@ -213,6 +255,10 @@ function wireJobs() {
   document.getElementById("btnRunSankhya").onclick = () => runJob("sankhya_demo").catch(alert);
   document.getElementById("btnRunFull").onclick     = () => runJob("full_load_demo").catch(alert);
 
+  if (window.EventSource) {
+    streamJobs();
+    return;
+  }
   loadJobs().catch(console.error);
   if (jobsTimer) clearInterval(jobsTimer);
   jobsTimer = setInterval(() => {
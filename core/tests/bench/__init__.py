@@ -0,0 +1,15 @@
+"""
+Benchmarks: fora do `manage.py test` normal e dos comandos do deploy.
+
+    BENCH=1 python manage.py test core.tests.bench
+
+Cada módulo imprime uma tabela; os tamanhos vêm de variáveis BENCH_*.
+"""
+import os
+import unittest
+
+ligado = unittest.skipUnless(os.environ.get("BENCH"), "benchmark: rode com BENCH=1")
+
+
+def tamanhos(var: str, padrao: str) -> list[int]:
+    return [int(x) for x in os.environ.get(var, padrao).split(",")]
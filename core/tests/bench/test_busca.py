@@ -0,0 +1,58 @@
+import random
+import statistics
+import time
+
+from django.test import TestCase
+
+from core.models import IndiceBusca, Produto
+from core.services import busca
+
+from . import ligado, tamanhos
+
+PALAVRAS = [
+    "açúcar", "cristal", "refinado", "arroz", "feijão", "carioca", "óleo", "soja", "café", "torrado",
+    "moído", "leite", "integral", "desnatado", "farinha", "trigo", "milho", "macarrão", "espaguete",
+    "biscoito", "recheado", "chocolate", "sabão", "pó", "detergente", "limão", "amaciante", "papel",
+    "higiênico", "folha", "dupla", "água", "mineral", "sem", "gás", "suco", "laranja", "uva", "pêssego",
+]
+
+
+@ligado
+class BuscaBench(TestCase):
+    """Latência do autocomplete (busca.buscar) com consultas sintéticas (BENCH_PRODUTOS, BENCH_CONSULTAS)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.total = tamanhos("BENCH_PRODUTOS", "100000")[0]
+        rnd = random.Random(1)
+        t0 = time.perf_counter()
+        for ini in range(0, cls.total, 10_000):
+            produtos = Produto.objects.bulk_create([
+                Produto(sku=f"B{i:06d}", descricao=" ".join(rnd.sample(PALAVRAS, 4)).upper(), familia=rnd.choice(PALAVRAS))
+                for i in range(ini, min(cls.total, ini + 10_000))
+            ])
+            busca.indexar_produtos(Produto.objects.filter(pk__in=[p.pk for p in produtos]))
+        print(f"\nseed: {cls.total} produtos indexados em {time.perf_counter() - t0:.1f}s")
+
+    def test_busca(self):
+        n = tamanhos("BENCH_CONSULTAS", "200")[0]
+        rnd = random.Random(42)
+        consultas = {
+            "sku": [f"B{rnd.randrange(self.total):06d}" for _ in range(n)],
+            "1 termo (3 letras)": [rnd.choice(PALAVRAS)[:3] for _ in range(n)],
+            "2 termos": [f"{rnd.choice(PALAVRAS)} {rnd.choice(PALAVRAS)[:4]}" for _ in range(n)],
+            "sem acento": [busca.normalizar(rnd.choice(PALAVRAS)) for _ in range(n)],
+        }
+        print(f"modo={busca.modo()} produtos indexados={self.total}")
+        print(f"{'consulta':<22}{'p50 (ms)':>10}{'p95 (ms)':>10}{'máx (ms)':>10}")
+        for nome, qs in consultas.items():
+            tempos = []
+            for q in qs:
+                t0 = time.perf_counter()
+                res = busca.buscar(IndiceBusca.PRODUTO, q)
+                tempos.append((time.perf_counter() - t0) * 1000)
+                if nome == "sku":
+                    self.assertEqual(res[0]["rotulo"].split(" - ")[0], q)
+            tempos.sort()
+            p95 = tempos[int(len(tempos) * 0.95) - 1]
+            print(f"{nome:<22}{statistics.median(tempos):>10.2f}{p95:>10.2f}{tempos[-1]:>10.2f}")
@@ -0,0 +1,81 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views_reports import SimuladorCalcularView
+from core.models import Preco, Produto, TabelaDePreco
+from core.services.precos import limpar_cache_local
+
+from . import ligado, tamanhos
+
+TABELA = "Padrão"
+
+
+def _por_item(tabela, skus):
+    """Resolução anterior do simulador: Produto.get + até 2 consultas de Preco por item."""
+    for sku in skus:
+        try:
+            prod = Produto.objects.get(sku=sku)
+        except Produto.DoesNotExist:
+            continue
+        Preco.objects.filter(produto=prod, tabela__nome=tabela).first() or Preco.objects.filter(produto=prod).first()
+
+
+class _ContaConsultas:
+    # execute_wrapper em vez de CaptureQueriesContext (que guarda no máximo 9000)
+    def __init__(self):
+        self.n = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.n += 1
+        return execute(sql, params, many, context)
+
+
+@ligado
+class SimuladorBench(TestCase):
+    """Consultas e latência do /api/simulador/calcular/: por item x lote, cache frio e quente (BENCH_ITENS)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tamanhos = tamanhos("BENCH_ITENS", "10,100,1000,5000")
+        tab = TabelaDePreco.objects.create(nome=TABELA)
+        produtos = Produto.objects.bulk_create(
+            [Produto(sku=f"BENCH-{i:06d}", descricao=f"Produto {i}") for i in range(max(cls.tamanhos))]
+        )
+        Preco.objects.bulk_create([Preco(produto=p, tabela=tab, preco=Decimal(i % 500) + 1) for i, p in enumerate(produtos)])
+        cls.skus = [p.sku for p in produtos]
+        cls.user = User.objects.create(username="bench-simulador")
+
+    def _chamar(self, n):
+        # metade dos itens com qtd alta para passar pelas faixas de desconto
+        items = [{"sku": sku, "qtd": 5 + (i % 2) * 100} for i, sku in enumerate(self.skus[:n])]
+        request = APIRequestFactory().post("/api/simulador/calcular/", {"tabela": TABELA, "items": items}, format="json")
+        force_authenticate(request, user=self.user)
+        resp = SimuladorCalcularView.as_view()(request)
+        resp.render()
+        self.assertEqual(resp.status_code, 200, resp.data)
+
+    def test_simulador(self):
+        print(f"\n{'itens':>7}{'modo':>12}{'consultas':>11}{'tempo (ms)':>12}")
+        for n in self.tamanhos:
+            medidas = [
+                ("por item", lambda: _por_item(TABELA, self.skus[:n])),
+                ("lote/frio", lambda: (limpar_cache_local(), self._chamar(n))),
+                ("lote/quente", lambda: self._chamar(n)),
+            ]
+            consultas = {}
+            for nome, fn in medidas:
+                q = _ContaConsultas()
+                with connection.execute_wrapper(q):
+                    t0 = time.perf_counter()
+                    fn()
+                    dt = (time.perf_counter() - t0) * 1000
+                consultas[nome] = q.n
+                print(f"{n:>7}{nome:>12}{q.n:>11}{dt:>12.1f}")
+            self.assertLessEqual(consultas["lote/quente"], consultas["lote/frio"])
+            if n >= 100:
+                self.assertLess(consultas["lote/frio"], consultas["por item"])
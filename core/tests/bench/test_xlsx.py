@@ -0,0 +1,76 @@
+import io
+import multiprocessing
+import resource
+import time
+
+from django.test import SimpleTestCase
+
+from core.services.exportacao import xlsx_tempfile
+
+from . import ligado, tamanhos
+
+
+def _linhas(n):
+    for i in range(n):
+        yield [i, f"SKU-{i:07d}", f"Produto de teste número {i}", float(i % 97), float(i % 1000) * 1.5]
+
+
+def _atual(n):
+    """Implementação anterior: Workbook normal + BytesIO + getvalue()."""
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    for linha in _linhas(n):
+        ws.append(linha)
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    return len(buf.getvalue())
+
+
+def _write_only(n):
+    f, _ = xlsx_tempfile("Bench", _linhas(n))
+    with f:
+        f.seek(0, io.SEEK_END)
+        return f.tell()
+
+
+def _rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _medir(fn, n, fila):
+    # processo filho novo: ru_maxrss mede só esta execução (menos a base herdada)
+    base = _rss_kb()
+    t0 = time.perf_counter()
+    tamanho = fn(n)
+    dt = time.perf_counter() - t0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fila.put((dt, max(pico - base, 0), tamanho))
+
+
+@ligado
+class XlsxBench(SimpleTestCase):
+    """Tempo e pico de RSS da exportação XLSX anterior x write-only (BENCH_LINHAS=10000,100000,...)."""
+
+    def test_xlsx(self):
+        ctx = multiprocessing.get_context("fork")
+        print(f"\n{'impl':<12}{'linhas':>10}{'tempo (s)':>12}{'pico RSS (MB)':>16}{'arquivo (MB)':>15}")
+        for n in tamanhos("BENCH_LINHAS", "10000,100000"):
+            picos = {}
+            for nome, fn in (("atual", _atual), ("write_only", _write_only)):
+                fila = ctx.Queue()
+                p = ctx.Process(target=_medir, args=(fn, n, fila))
+                p.start()
+                dt, pico_kb, tamanho = fila.get()
+                p.join()
+                picos[nome] = pico_kb
+                print(f"{nome:<12}{n:>10}{dt:>12.2f}{pico_kb / 1024:>16.1f}{tamanho / 1024 / 1024:>15.1f}")
+            self.assertLessEqual(picos["write_only"], picos["atual"])
@@ -0,0 +1,81 @@
+"""
+BrasilAPI falsa para os testes de core.services.cnpj e enriquecimento_cnpj:
+http.server numa thread em 127.0.0.1, porta livre. Responde GET .../<cnpj>:
+
+- `respostas[cnpj]`: dict (200 com esse corpo), int (status; 200 = dados gerados)
+  ou lista deles, consumida uma por chamada (a última se repete);
+- demais CNPJs: 200 com dados gerados a partir do número.
+
+`atraso` simula latência; `chamadas` conta as requisições por CNPJ e
+`max_simultaneas` guarda o maior número de requisições em andamento.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def dados_fake(cnpj: str) -> dict:
+    return {
+        "cnpj": cnpj, "razao_social": f"EMPRESA {cnpj} LTDA", "nome_fantasia": f"Fantasia {cnpj[-4:]}",
+        "municipio": "SAO PAULO", "uf": "SP", "cep": "01001000", "cnae_fiscal_descricao": "Comércio",
+    }
+
+
+class FakeBrasilAPI:
+    def __init__(self, respostas: dict | None = None, atraso: float = 0.0):
+        self.respostas = dict(respostas or {})
+        self.atraso = atraso
+        self.chamadas: Counter = Counter()
+        self.max_simultaneas = 0
+        self._em_andamento = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                cnpj = self.path.rstrip("/").rsplit("/", 1)[-1]
+                status, corpo = fake._resposta(cnpj)
+                if fake.atraso:
+                    time.sleep(fake.atraso)
+                with fake._lock:
+                    fake._em_andamento -= 1
+                bruto = json.dumps(corpo).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(bruto)))
+                self.end_headers()
+                self.wfile.write(bruto)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/api/cnpj/v1/"
+
+    def _resposta(self, cnpj):
+        with self._lock:
+            self.chamadas[cnpj] += 1
+            self._em_andamento += 1
+            self.max_simultaneas = max(self.max_simultaneas, self._em_andamento)
+            r = self.respostas.get(cnpj)
+            if isinstance(r, list):
+                r = r.pop(0) if len(r) > 1 else r[0]
+        if r is None or r == 200:
+            return 200, dados_fake(cnpj)
+        if isinstance(r, int):
+            return r, {"message": f"HTTP {r}"}
+        return 200, r
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
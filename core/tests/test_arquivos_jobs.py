@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.models import Cliente, Job, JobArquivo, JobArquivoParte, Pedido, Preco, Produto, Representante, TabelaDePreco
+from core.services import arquivos_jobs
+from core.views_jobs import _run_steps, build_steps, enfileirar_exportacao, enfileirar_importacao_precos
+
+
+@override_settings(JOBS_ARQUIVO_PARTE_BYTES=10)
+class ArquivosJobsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username="staff", is_staff=True)
+
+    def _rodar(self, job):
+        job = Job.objects.get(pk=job.pk)
+        _run_steps(job, build_steps(job.type, job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCESS, job.result)
+        return job
+
+    def test_gravar_em_partes_e_ler(self):
+        job = Job.objects.create(name="arquivo", type="relatorio_export")
+        conteudo = b"abc" * 7 + b"xyz"
+        arq = arquivos_jobs.gravar(job, JobArquivo.Papel.SAIDA, "a.csv", [b"abc"] * 7 + [b"xyz"])
+        self.assertEqual((arq.tamanho, arq.partes.count()), (len(conteudo), 3))
+        self.assertEqual(b"".join(arquivos_jobs.ler(arq)), conteudo)
+
+        # rodar de novo substitui o arquivo anterior
+        arq = arquivos_jobs.gravar(job, JobArquivo.Papel.SAIDA, "b.csv", [b"novo"])
+        self.assertEqual(JobArquivo.objects.filter(job=job).count(), 1)
+        self.assertEqual(JobArquivoParte.objects.count(), 1)
+        self.assertEqual(b"".join(arquivos_jobs.ler(arq)), b"novo")
+
+    def test_exportacao_baixada_do_banco(self):
+        rep = Representante.objects.create(user=User.objects.create(username="rep"), codigo="R1")
+        cliente = Cliente.objects.create(codigo="C1", nome="Cliente", uf="SP")
+        Pedido.objects.create(numero="P1", representante=rep, cliente=cliente, status="ENVIADO", total=Decimal("10"))
+        job = enfileirar_exportacao(self.staff, "/api/relatorios/vendas-resumo/", {"format": "csv"}, "csv")
+        self._rodar(job)
+
+        api = APIClient()
+        api.force_authenticate(self.staff)
+        resp = api.get(f"/api/jobs/{job.pk}/download/")
+        self.assertEqual(resp.status_code, 200)
+        corpo = b"".join(resp.streaming_content)
+        self.assertEqual(int(resp["Content-Length"]), len(corpo))
+        self.assertIn("attachment", resp["Content-Disposition"])
+        self.assertIn(b"Cliente,1,10", corpo)
+
+    def test_exportacao_em_job_igual_a_da_view(self):
+        rep = Representante.objects.create(user=User.objects.create(username="rep"), codigo="R1")
+        cliente = Cliente.objects.create(codigo="C1", nome="Cliente", uf="SP")
+        produto = Produto.objects.create(sku="SKU1", descricao="Produto")
+        pedido = Pedido.objects.create(numero="P1", representante=rep, cliente=cliente, status="ENVIADO")
+        pedido.itens.create(produto=produto, qtd=Decimal("2"), preco_unit=Decimal("5"))
+        api = APIClient()
+        api.force_authenticate(rep.user)
+        for path in ("/api/relatorios/vendas-resumo/", "/api/relatorios/itens-mais-vendidos/",
+                     "/api/relatorios/itens-detalhe/"):
+            with self.subTest(path):
+                direto = b"".join(api.get(path, {"format": "csv"}).streaming_content)
+                job = self._rodar(enfileirar_exportacao(rep.user, path, {"format": "csv"}, "csv"))
+                self.assertEqual(b"".join(arquivos_jobs.ler(job.arquivos.get())), direto)
+                self.assertEqual(job.result["linhas"], 1)
+        job = self._rodar(enfileirar_exportacao(rep.user, "/api/relatorios/itens-detalhe/", {}, "xlsx"))
+        self.assertEqual((job.result["nome"], job.result["linhas"]), ("itens_detalhe.xlsx", 1))
+
+    def test_download_antes_de_terminar_responde_409(self):
+        job = enfileirar_exportacao(self.staff, "/api/relatorios/vendas-resumo/", {"format": "csv"}, "csv")
+        api = APIClient()
+        api.force_authenticate(self.staff)
+        self.assertEqual(api.get(f"/api/jobs/{job.pk}/download/").status_code, 409)
+
+    def test_importacao_de_precos_le_o_upload_do_banco(self):
+        Produto.objects.create(sku="SKU1", descricao="Produto")
+        TabelaDePreco.objects.create(nome="Padrão")
+        upload = SimpleUploadedFile("precos.csv", b"REF;PRECO\nSKU1;10.50\n", content_type="text/csv")
+        job = enfileirar_importacao_precos(self.staff, upload, "Padrão")
+        self.assertTrue(JobArquivo.objects.filter(job=job, papel=JobArquivo.Papel.ENTRADA).exists())
+
+        job = self._rodar(job)
+        self.assertEqual(Preco.objects.get(produto__sku="SKU1").preco, Decimal("10.50"))
+        self.assertEqual(job.result["gravados"], 1)
+        self.assertFalse(JobArquivo.objects.filter(job=job).exists())
@@ -0,0 +1,23 @@
+import importlib
+
+from django.test import TestCase
+
+from core.models import IndiceBusca, Produto
+from core.services import busca
+
+migracao = importlib.import_module("core.migrations.0010_indice_busca")
+
+
+class BuscaTests(TestCase):
+    def test_busca_sem_acento_e_sku_sem_pontuacao(self):
+        Produto.objects.create(sku="ABC-123", descricao="Açúcar Cristal 1kg")
+        Produto.objects.create(sku="XYZ-9", descricao="Óleo de soja")
+        self.assertEqual([r["rotulo"] for r in busca.buscar(IndiceBusca.PRODUTO, "acucar")], ["ABC-123 - Açúcar Cristal 1kg"])
+        self.assertEqual([r["rotulo"] for r in busca.buscar(IndiceBusca.PRODUTO, "abc123")], ["ABC-123 - Açúcar Cristal 1kg"])
+
+    def test_migracao_normaliza_como_o_servico(self):
+        # a 0010 tem cópias próprias da normalização; o índice inicial não pode divergir
+        self.assertEqual(migracao.texto_produto("ABC-123", "Açúcar Cristal", "Mercearia"),
+                         busca.texto_produto("ABC-123", "Açúcar Cristal", "Mercearia"))
+        self.assertEqual(migracao.texto_cliente("C1", "João Ltda", "12.345.678/0001-90", "São Paulo", "SP"),
+                         busca.texto_cliente("C1", "João Ltda", "12.345.678/0001-90", "São Paulo", "SP"))
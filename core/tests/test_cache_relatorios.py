@@ -0,0 +1,120 @@
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views_reports import HeatmapUFView, ItensMaisVendidosView, MTDYTDView, VendasResumoView
+from core.models import Cliente, Produto, Representante
+from core.services import cache_relatorios
+from core.services.pedidos import criar_pedido
+
+
+def _caches(backend):
+    return {"default": backend, "relatorios": backend}
+
+
+class _CacheRelatoriosTestes:
+    """Cache de /api/relatorios/* (core.services.cache_relatorios); cada subclasse escolhe o backend."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username="staff", is_staff=True)
+        cls.rep = Representante.objects.create(user=User.objects.create(username="rep"), codigo="R1")
+        cls.outro_rep = Representante.objects.create(user=User.objects.create(username="rep2"), codigo="R2")
+        cls.cliente = Cliente.objects.create(codigo="C1", nome="Cliente cache", uf="SP")
+        cls.produto = Produto.objects.create(sku="SKU-1", descricao="Produto cache")
+        cls._pedido(cls.rep, 10)
+        cls._pedido(cls.outro_rep, 7)
+
+    @classmethod
+    def _pedido(cls, rep, preco):
+        return criar_pedido(
+            {"cliente": cls.cliente, "representante": rep, "status": "ENVIADO"},
+            [{"produto": cls.produto.pk, "qtd": 1, "preco_unit": Decimal(preco)}], "Padrão",
+        )
+
+    def setUp(self):
+        caches["relatorios"].clear()
+        self.filtros = {"rep": self.rep.codigo, "status": "ENVIADO"}
+
+    def _get(self, view, user, params=None, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        request = APIRequestFactory().get("/api/relatorios/", params or {}, **headers)
+        force_authenticate(request, user=user)
+        resp = view.as_view()(request)
+        if hasattr(resp, "render"):
+            resp.render()
+        return resp
+
+    def test_segunda_chamada_vem_do_cache(self):
+        r1 = self._get(VendasResumoView, self.staff, self.filtros)
+        self.assertEqual((r1.status_code, r1["X-Cache"]), (200, "MISS"))
+        self.assertTrue(r1.has_header("ETag"))
+        with CaptureQueriesContext(connection) as ctx:
+            r2 = self._get(VendasResumoView, self.staff, self.filtros)
+        self.assertEqual((r2["X-Cache"], r2.content, r2["ETag"]), ("HIT", r1.content, r1["ETag"]))
+        self.assertEqual(len(ctx.captured_queries), 1)  # só a versão
+
+    def test_chave_com_filtros_normalizados(self):
+        self._get(VendasResumoView, self.staff, self.filtros)
+        r = self._get(VendasResumoView, self.staff, {"status": "ENVIADO", "cliente": "", "rep": self.rep.codigo})
+        self.assertEqual(r["X-Cache"], "HIT")
+        self.assertEqual(self._get(VendasResumoView, self.staff, {"rep": self.outro_rep.codigo})["X-Cache"], "MISS")
+
+    def test_if_none_match_responde_304(self):
+        r1 = self._get(VendasResumoView, self.staff, self.filtros)
+        r = self._get(VendasResumoView, self.staff, self.filtros, etag=r1["ETag"])
+        self.assertEqual((r.status_code, r.content, r["ETag"]), (304, b"", r1["ETag"]))
+
+    def test_escopo_staff_e_representante_separados(self):
+        # o representante só enxerga os próprios pedidos: não pode receber a entrada do staff
+        r_staff = self._get(VendasResumoView, self.staff)
+        r_rep = self._get(VendasResumoView, self.rep.user)
+        self.assertEqual(r_rep["X-Cache"], "MISS")
+        self.assertNotEqual(r_rep.data, r_staff.data)
+
+    def test_demais_relatorios_em_cache(self):
+        for view in (ItensMaisVendidosView, MTDYTDView, HeatmapUFView):
+            with self.subTest(view.__name__):
+                a, b = self._get(view, self.rep.user), self._get(view, self.rep.user)
+                self.assertEqual((b["X-Cache"], b.content), ("HIT", a.content))
+
+    def test_exportacao_csv_fora_do_cache(self):
+        self.assertFalse(self._get(VendasResumoView, self.staff, {**self.filtros, "format": "csv"}).has_header("X-Cache"))
+
+    def test_gravar_pedido_ou_item_muda_a_versao(self):
+        r1 = self._get(VendasResumoView, self.staff, self.filtros)
+        versao = cache_relatorios.versao()
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido = self._pedido(self.rep, 5)
+        self.assertGreater(cache_relatorios.versao(), versao)
+        r3 = self._get(VendasResumoView, self.staff, self.filtros, etag=r1["ETag"])
+        self.assertEqual((r3.status_code, r3["X-Cache"]), (200, "MISS"))
+        self.assertNotEqual(r3["ETag"], r1["ETag"])
+        self.assertEqual(r3.data["totais"]["qtd_pedidos"], r1.data["totais"]["qtd_pedidos"] + 1)
+
+        self._get(ItensMaisVendidosView, self.rep.user)
+        item = pedido.itens.get()
+        item.qtd = Decimal("3")
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        self.assertEqual(self._get(ItensMaisVendidosView, self.rep.user)["X-Cache"], "MISS")
+
+
+@override_settings(CACHES=_caches({"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "teste-relatorios"}))
+class CacheRelatoriosMemoriaTests(_CacheRelatoriosTestes, TestCase):
+    pass
+
+
+class CacheRelatoriosArquivoTests(_CacheRelatoriosTestes, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pasta = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(CACHES=_caches(
+            {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": pasta})))
+        super().setUpClass()
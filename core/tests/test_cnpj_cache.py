@@ -0,0 +1,88 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views_cnpj import CNPJLookupView, CnpjAnonThrottle
+from core.models import CnpjCache
+from core.services import cnpj as cnpj_service
+from core.services.cnpj import CnpjErro, consultar
+
+from .fake_brasilapi import FakeBrasilAPI
+
+OK, INEXISTENTE, FORA, ANTIGO, ANTIGO_FORA = (f"990000000001{i:02d}" for i in range(5))
+
+
+class CnpjCacheTests(TransactionTestCase):
+    """core.services.cnpj contra a BrasilAPI falsa (a revalidação roda em outra thread)."""
+
+    def setUp(self):
+        self.api = FakeBrasilAPI({INEXISTENTE: 404, FORA: 503, ANTIGO_FORA: 503})
+        self.enterContext(self.api)
+        self.enterContext(override_settings(CNPJ_API_URL=self.api.url))
+        cnpj_service._client = None  # cliente novo apontando para o servidor local
+        self.addCleanup(setattr, cnpj_service, "_client", None)
+
+    def test_hit_nao_vai_a_rede(self):
+        _, origem = consultar(OK)
+        self.assertEqual((origem, self.api.chamadas[OK]), ("api", 1))
+        for _ in range(5):
+            _, origem = consultar(OK)
+        self.assertEqual((origem, self.api.chamadas[OK]), ("cache", 1))
+
+    def test_cache_negativo(self):
+        for cnpj, status in ((INEXISTENTE, 404), (FORA, 503)):
+            for _ in range(3):
+                with self.assertRaises(CnpjErro) as ctx:
+                    consultar(cnpj)
+            self.assertEqual((ctx.exception.status, self.api.chamadas[cnpj]), (status, 1))
+        ttl = {c: (r.expira_em - r.consultado_em).total_seconds()
+               for c, r in CnpjCache.objects.in_bulk([INEXISTENTE, FORA]).items()}
+        self.assertLess(ttl[FORA], ttl[INEXISTENTE])  # falha transitória expira antes
+
+    def test_vencido_servido_e_revalidado_em_segundo_plano(self):
+        consultar(ANTIGO)
+        passado = timezone.now() - timedelta(seconds=10)
+        CnpjCache.objects.filter(pk=ANTIGO).update(expira_em=passado, consultado_em=passado)
+        self.assertEqual(consultar(ANTIGO)[1], "cache-antigo")
+        limite = time.monotonic() + 5
+        while CnpjCache.objects.get(pk=ANTIGO).expira_em <= timezone.now() and time.monotonic() < limite:
+            time.sleep(0.05)
+        self.assertEqual(self.api.chamadas[ANTIGO], 2)
+        self.assertEqual(consultar(ANTIGO)[1], "cache")
+
+    def test_api_fora_usa_o_dado_antigo(self):
+        cnpj_service.gravar_ok(ANTIGO_FORA, {"cnpj": ANTIGO_FORA, "razao_social": "ANTIGA"})
+        muito_antigo = timezone.now() - timedelta(days=365)
+        CnpjCache.objects.filter(pk=ANTIGO_FORA).update(expira_em=muito_antigo, consultado_em=muito_antigo)
+        dados, origem = consultar(ANTIGO_FORA)
+        self.assertEqual((origem, dados["razao_social"]), ("cache-antigo", "ANTIGA"))
+
+    def test_lookup_view_le_pelo_cache(self):
+        consultar(OK)
+        factory, view = APIRequestFactory(), CNPJLookupView.as_view()
+        for user in (User.objects.create(username="cnpj"), AnonymousUser()):
+            request = factory.get("/api/cnpj/lookup/", {"cnpj": OK})
+            force_authenticate(request, user=user)
+            resp = view(request)
+            self.assertEqual((resp.status_code, resp.data["origem"], self.api.chamadas[OK]), (200, "cache", 1))
+
+    def test_lookup_anonimo_limitado_por_ip(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        factory, view = APIRequestFactory(), CNPJLookupView.as_view()
+
+        def get(user):
+            request = factory.get("/api/cnpj/lookup/", {"cnpj": OK})
+            force_authenticate(request, user=user)
+            return view(request).status_code
+
+        with mock.patch.object(CnpjAnonThrottle, "THROTTLE_RATES", {"cnpj_anon": "2/min"}):
+            self.assertEqual([get(AnonymousUser()) for _ in range(3)], [200, 200, 429])
+            self.assertEqual(get(User.objects.create(username="logado")), 200)  # autenticado não entra no limite
+        self.assertEqual(self.api.chamadas[OK], 1)
@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import viewsets as api_viewsets
+from core import views as core_views
+from core.models import Cliente, ItemPedido, Pedido, Produto, Representante
+
+TAMANHOS = (1, 50, 500)
+ITENS_POR_PEDIDO = 3
+
+
+class ConsultasListagemPedidosTests(TestCase):
+    """GET /api/pedidos/ (com itens e produtos) faz as mesmas consultas para 1, 50 e 500 pedidos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username="staff", is_staff=True)
+        cls.rep = Representante.objects.create(user=User.objects.create(username="rep"), codigo="R1")
+        cliente = Cliente.objects.create(codigo="C1", nome="Cliente")
+        produtos = Produto.objects.bulk_create(
+            [Produto(sku=f"SKU-{i:03d}", descricao=f"Produto {i}") for i in range(ITENS_POR_PEDIDO)]
+        )
+        pedidos = Pedido.objects.bulk_create(
+            [Pedido(numero=f"P{i:08d}", cliente=cliente, representante=cls.rep) for i in range(max(TAMANHOS))]
+        )
+        ItemPedido.objects.bulk_create([
+            ItemPedido(pedido=p, produto=prod, qtd=1, preco_unit=Decimal("10"), subtotal=Decimal("10"))
+            for p in pedidos for prod in produtos
+        ])
+
+    def test_consultas_constantes(self):
+        cenarios = [
+            ("api/staff", api_viewsets.PedidoViewSet, self.staff),
+            ("api/representante", api_viewsets.PedidoViewSet, self.rep.user),
+            ("core", core_views.PedidoViewSet, self.staff),
+        ]
+        for nome, viewset, user in cenarios:
+            view = viewset.as_view({"get": "list"})
+            contagens = {}
+            for n in TAMANHOS:
+                request = APIRequestFactory().get("/api/pedidos/", {"page_size": n})
+                force_authenticate(request, user=user)
+                with CaptureQueriesContext(connection) as q:
+                    resp = view(request)
+                    resp.render()
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(len(resp.data["results"]), n)
+                contagens[n] = len(q)
+            with self.subTest(nome):
+                self.assertEqual(len(set(contagens.values())), 1, contagens)
@@ -0,0 +1,92 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from core.models import Cliente, Job, Pedido, Representante, VendaDiaria
+from core.services import cache_relatorios, vendas_diarias
+from core.views_jobs import _run_steps, build_steps
+
+from .fake_brasilapi import FakeBrasilAPI
+
+CONFIG = dict(
+    CNPJ_LOTE_CONCORRENCIA=4, CNPJ_LOTE_TAXA=40.0, CNPJ_LOTE_RAJADA=4, CNPJ_LOTE_TENTATIVAS=4,
+    CNPJ_LOTE_BACKOFF=0.05, CNPJ_CIRCUITO_FALHAS=5, CNPJ_CIRCUITO_ESPERA=0.2, CNPJ_CIRCUITO_MAX_ABERTURAS=3,
+)
+N_CLIENTES = 30
+
+
+def _cnpjs(prefixo):
+    return [f"{prefixo}{i:06d}" for i in range(N_CLIENTES)]
+
+
+@override_settings(**CONFIG)
+class EnriquecimentoCnpjTests(TestCase):
+    """Job enriquecer_cnpj contra a BrasilAPI falsa."""
+
+    def _api(self, respostas, atraso=0.0):
+        api = FakeBrasilAPI(respostas, atraso=atraso)
+        self.enterContext(api)
+        self.enterContext(override_settings(CNPJ_API_URL=api.url))
+        return api
+
+    def _rodar(self):
+        job = Job.objects.create(name="enriquecer_cnpj", type="enriquecer_cnpj", payload={})
+        t0 = time.perf_counter()
+        _run_steps(job, build_steps(job.type, job))
+        job.refresh_from_db()
+        return job, time.perf_counter() - t0
+
+    def test_preenche_com_retentativas_taxa_e_cache(self):
+        # 1 a cada 10 inexistente; dois com falha transitória antes de responder
+        cnpjs = _cnpjs("98000000")
+        respostas = {c: 404 for c in cnpjs[::10]}
+        respostas[cnpjs[1]] = [503, 200]
+        respostas[cnpjs[2]] = [429, 429, 200]
+        api = self._api(respostas, atraso=0.02)
+        Cliente.objects.bulk_create([Cliente(codigo=f"C{c[-6:]}", nome="", cnpj=c) for c in cnpjs])
+        Cliente.objects.filter(cnpj=cnpjs[3]).update(nome="Nome mantido")
+        Cliente.objects.create(codigo="C-INVAL", nome="", cnpj="123")
+
+        job, dt = self._rodar()
+        r = job.result or {}
+        self.assertEqual(job.status, Job.Status.SUCCESS, r)
+        self.assertEqual((r["atualizados"], r["nao_encontrados"], r["cnpj_invalido"]),
+                         (N_CLIENTES - len(cnpjs[::10]), len(cnpjs[::10]), 1))
+        self.assertEqual((api.chamadas[cnpjs[1]], api.chamadas[cnpjs[2]], r["retentativas"]), (2, 3, 3))
+        mantido = Cliente.objects.get(cnpj=cnpjs[3])
+        self.assertEqual((mantido.nome, mantido.uf), ("Nome mantido", "SP"))  # só campos vazios
+        minimo = (r["consultas_api"] - CONFIG["CNPJ_LOTE_RAJADA"]) / CONFIG["CNPJ_LOTE_TAXA"]
+        self.assertGreaterEqual(dt, minimo * 0.9)
+        self.assertLessEqual(api.max_simultaneas, CONFIG["CNPJ_LOTE_CONCORRENCIA"])
+        self.assertTrue(job.logs.filter(level="WARN").exists())
+
+        antes = sum(api.chamadas.values())
+        job, _ = self._rodar()
+        self.assertEqual((job.status, job.result["consultas_api"]), (Job.Status.SUCCESS, 0))
+        self.assertEqual(sum(api.chamadas.values()), antes)
+
+    def test_uf_preenchida_refaz_rollup_e_versao_dos_relatorios(self):
+        self._api({})
+        rep = Representante.objects.create(user=User.objects.create(username="rep"), codigo="R1")
+        cliente = Cliente.objects.create(codigo="C1", nome="", cnpj="98000000000001")
+        Pedido.objects.create(numero="P1", representante=rep, cliente=cliente, status="ENVIADO", total=Decimal("10"))
+        self.assertEqual(list(VendaDiaria.objects.values_list("uf", flat=True)), [""])
+
+        versao = cache_relatorios.versao()
+        with self.captureOnCommitCallbacks(execute=True):
+            job, _ = self._rodar()
+        self.assertEqual(job.result["atualizados"], 1)
+        self.assertEqual(list(VendaDiaria.objects.values_list("uf", "pedidos")), [("SP", 1)])
+        self.assertEqual(vendas_diarias.diff(), [])
+        self.assertGreater(cache_relatorios.versao(), versao)
+
+    def test_api_fora_abre_o_circuito(self):
+        cnpjs = _cnpjs("97000000")
+        api = self._api({c: 503 for c in cnpjs})
+        Cliente.objects.bulk_create([Cliente(codigo=f"C{c[-6:]}F", nome="", cnpj=c) for c in cnpjs])
+        job, _ = self._rodar()
+        self.assertEqual(job.status, Job.Status.ERROR)
+        self.assertIn("circuito", job.result["error"])
+        self.assertLess(sum(api.chamadas.values()), len(cnpjs))
@@ -0,0 +1,68 @@
+import asyncio
+import warnings
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.test import TransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import Cliente, Pedido, Representante
+from core.services.exportacao import ArquivoEmBlocos, RespostaEmBlocos
+from portal_vendas.asgi import application
+
+
+class ExportacaoAsgiTests(TransactionTestCase):
+    """Exportações servidas pelo app ASGI do deploy saem em vários blocos, sem juntar o arquivo."""
+
+    def setUp(self):
+        self.token = str(AccessToken.for_user(User.objects.create(username="staff", is_staff=True)))
+        rep = Representante.objects.create(user=User.objects.create(username="rep"), codigo="R1")
+        for i in range(20):
+            cliente = Cliente.objects.create(codigo=f"C{i}", nome=f"Cliente {i}", uf="SP")
+            Pedido.objects.create(numero=f"P{i}", representante=rep, cliente=cliente,
+                                  status="ENVIADO", total=Decimal(i + 1))
+
+    async def _get(self, path, query):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+            "root_path": "", "server": ("testserver", 80), "client": ("127.0.0.1", 1234),
+            "headers": [(b"host", b"testserver"), (b"authorization", f"Bearer {self.token}".encode())],
+        }
+        recebidas = []
+
+        async def receive():
+            if recebidas:
+                await asyncio.Future()  # sem desconexão: espera até o fim da resposta
+            recebidas.append(1)
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        mensagens = []
+
+        async def send(msg):
+            mensagens.append(msg)
+
+        with warnings.catch_warnings(record=True) as avisos:
+            warnings.simplefilter("always")
+            await application(scope, receive, send)
+        # o aviso sai quando o Django cai no sync_to_async(list) do conteúdo inteiro
+        self.assertFalse([a for a in avisos if "consume synchronous iterators" in str(a.message)])
+        self.assertEqual(mensagens[0]["status"], 200)
+        return [m["body"] for m in mensagens[1:] if m.get("body")]
+
+    async def test_csv_em_blocos(self):
+        with mock.patch.object(RespostaEmBlocos, "bloco", 64):
+            blocos = await self._get("/api/relatorios/vendas-resumo/", "format=csv")
+        corpo = b"".join(blocos)
+        self.assertGreater(len(blocos), 3)
+        self.assertTrue(all(len(b) < 64 + 40 for b in blocos))  # um bloco passa do limite por no máximo uma linha
+        self.assertEqual(corpo.count(b"\r\n"), 21)
+
+    async def test_xlsx_em_blocos(self):
+        # o handler ASGI lê o FileResponse em blocos do seu chunk_size (64 KB)
+        with mock.patch.object(ArquivoEmBlocos, "bloco", 1024), mock.patch.object(ASGIHandler, "chunk_size", 1024):
+            blocos = await self._get("/api/relatorios/vendas-resumo/", "format=xlsx")
+        self.assertGreater(len(blocos), 2)
+        self.assertTrue(b"".join(blocos).startswith(b"PK"))  # zip do xlsx
@@ -0,0 +1,43 @@
+import io
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Produto
+
+
+class ImportProdutosDeltaTests(TestCase):
+    """import_produtos --delta: só grava os SKUs cujo conteúdo importado mudou."""
+
+    def _importar(self, conteudo: str, *args) -> str:
+        pasta = self.enterContext(tempfile.TemporaryDirectory())
+        arquivo = Path(pasta) / "produtos.csv"
+        arquivo.write_text(conteudo, encoding="utf-8")
+        out = io.StringIO()
+        call_command("import_produtos", "--file", str(arquivo), "--delta", *args, stdout=out)
+        return out.getvalue()
+
+    def test_familia_alterada_e_regravada(self):
+        saida = self._importar("REF;PRODUTO;FAMILIA\nA1;Bola;Brinquedos\nA2;Boneca;Brinquedos\n")
+        self.assertIn("criados=2 atualizados=0 inalterados=0", saida)
+
+        saida = self._importar("REF;PRODUTO;FAMILIA\nA1;Bola;Esportes\nA2;Boneca;Brinquedos\n")
+        self.assertIn("criados=0 atualizados=1 inalterados=1", saida)
+        self.assertEqual(dict(Produto.objects.values_list("sku", "familia")), {"A1": "Esportes", "A2": "Brinquedos"})
+
+        saida = self._importar("REF;PRODUTO;FAMILIA\nA1;Bola;Esportes\nA2;Boneca;Brinquedos\n")
+        self.assertIn("criados=0 atualizados=0 inalterados=2", saida)
+
+    def test_arquivo_sem_coluna_familia_mantem_a_do_cadastro(self):
+        self._importar("REF;PRODUTO;FAMILIA\nA1;Bola;Brinquedos\n")
+        self._importar("REF;PRODUTO\nA1;Bola nova\n")
+        self.assertEqual(Produto.objects.values_list("descricao", "familia").get(), ("Bola nova", "Brinquedos"))
+
+    def test_inativo_que_volta_ao_arquivo_e_reativado(self):
+        self._importar("REF;PRODUTO\nA1;Bola\n")
+        Produto.objects.update(ativo=False)
+        saida = self._importar("REF;PRODUTO\nA1;Bola\n", "--desativar-ausentes")
+        self.assertIn("atualizados=1", saida)
+        self.assertTrue(Produto.objects.get().ativo)
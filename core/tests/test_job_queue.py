@@ -0,0 +1,51 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from core.models import Job, JobLog
+from core.services import job_queue
+from core.views_jobs import _run_steps
+
+
+@override_settings(JOBS_CONCURRENCY_POR_TIPO={"relatorio_export": 1})
+class FilaJobsTests(TestCase):
+    def _job(self, tipo):
+        return Job.objects.create(name=tipo, type=tipo, payload={})
+
+    def test_limite_por_tipo(self):
+        a, b = self._job("relatorio_export"), self._job("relatorio_export")
+        outro = self._job("sankhya_demo")
+        self.assertEqual(job_queue.claim("w1").pk, a.pk)
+        self.assertEqual(job_queue.claim("w2").pk, outro.pk)
+        self.assertIsNone(job_queue.claim("w3"))
+        self.assertEqual(Job.objects.get(pk=b.pk).status, Job.Status.QUEUED)
+
+    def test_limite_conferido_na_reserva(self):
+        # a lista de tipos cheios é só uma dica lida antes da transação: mesmo
+        # desatualizada, a contagem sob a trava do tipo não deixa passar do limite
+        self._job("relatorio_export"), self._job("relatorio_export")
+        job_queue.claim("w1")
+        with mock.patch.object(job_queue, "_tipos_no_limite", return_value=[]):
+            self.assertIsNone(job_queue.claim("w2"))
+        self.assertEqual(Job.objects.filter(status=Job.Status.RUNNING).count(), 1)
+
+    def test_worker_antigo_nao_grava_job_devolvido_a_fila(self):
+        self._job("sankhya_demo")
+        antigo = job_queue.claim("w1")
+        # recover_stale devolveu à fila e outro worker pegou o job
+        Job.objects.filter(pk=antigo.pk).update(status=Job.Status.QUEUED, worker="", heartbeat_at=None)
+        novo = job_queue.claim("w2")
+
+        job_queue.heartbeat([antigo.pk], "w1")
+        _run_steps(antigo, [("Passo", lambda: {"ok": True})])
+
+        atual = Job.objects.get(pk=novo.pk)
+        self.assertEqual((atual.status, atual.worker, atual.heartbeat_at), (Job.Status.RUNNING, "w2", novo.heartbeat_at))
+        self.assertTrue(JobLog.objects.filter(job=atual, level="WARN", message__contains="não é mais do worker w1").exists())
+
+    def test_dono_grava_o_status(self):
+        self._job("sankhya_demo")
+        job = job_queue.claim("w1")
+        _run_steps(job, [("Passo", lambda: {"linhas": 3})])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.result["linhas"]), (Job.Status.SUCCESS, 100, 3))
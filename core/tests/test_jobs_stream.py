@@ -0,0 +1,190 @@
+import asyncio
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, RequestFactory, TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import Job
+from core.services.acompanhamento_jobs import central
+from core.views_jobs import JobContext, JobStreamView, _set_status
+
+CONFIG = dict(JOBS_SSE_INTERVALO_MS=100, JOBS_SSE_PING_SEGUNDOS=1, JOBS_LOG_FLUSH_MS=0, JOBS_PROGRESS_MS=0)
+N_LOGS = 60
+N_OBSERVADORES = 5
+
+
+def _eventos(texto: str) -> list[dict]:
+    """Blocos SSE -> [{"event", "id", "data"}] (comentários e retry ficam de fora)."""
+    res = []
+    for bloco in texto.split("\n\n"):
+        ev = {}
+        for linha in bloco.split("\n"):
+            campo, _, valor = linha.partition(": ")
+            if campo in ("id", "event", "data"):
+                ev[campo] = valor
+        if "event" in ev:
+            ev["data"] = json.loads(ev["data"])
+            res.append(ev)
+    return res
+
+
+async def _ler(resp, timeout=15.0) -> list[dict]:
+    texto = ""
+
+    async def consumir():
+        nonlocal texto
+        async for parte in resp.streaming_content:
+            texto += parte.decode() if isinstance(parte, bytes) else parte
+    try:
+        await asyncio.wait_for(consumir(), timeout)
+    except asyncio.TimeoutError:
+        raise AssertionError(f"stream não terminou em {timeout}s; recebido: {texto[-300:]}")
+    return _eventos(texto)
+
+
+async def _acumular(resp, recebidos: list):
+    texto = ""
+    async for parte in resp.streaming_content:
+        texto += parte.decode() if isinstance(parte, bytes) else parte
+        *blocos, texto = texto.split("\n\n")
+        recebidos.extend(_eventos("\n\n".join(blocos)))
+
+
+def _leitura_sem_trava(sender=None, connection=None, **kwargs):
+    # o banco de teste em memória do SQLite (cache compartilhado) trava a tabela
+    # inteira: sem isso a thread do job falha com "database table is locked"
+    # quando grava enquanto a central lê
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA read_uncommitted = 1")
+
+
+@override_settings(**CONFIG)
+class JobsStreamTests(TransactionTestCase):
+    """Streams SSE de /api/jobs/stream/ e /api/jobs/<id>/stream/ (o job roda numa thread, como no worker)."""
+
+    def setUp(self):
+        connection_created.connect(_leitura_sem_trava)
+        self.addCleanup(connection_created.disconnect, _leitura_sem_trava)
+        for conn in connections.all(initialized_only=True):
+            _leitura_sem_trava(connection=conn)
+        self.staff = User.objects.create(username="staff", is_staff=True)
+        self.comum = User.objects.create(username="comum")
+        self.token = str(AccessToken.for_user(self.staff))
+        self.job = Job.objects.create(name="job sse", type="sankhya_demo", payload={})
+        self.url = f"/api/jobs/{self.job.pk}/stream/"
+
+    def _rodar_job(self, inicio: threading.Event):
+        def alvo():
+            try:
+                inicio.wait(10)
+                with JobContext(self.job) as ctx:
+                    ctx.set_status(Job.Status.RUNNING, 0)
+                    for i in range(1, N_LOGS + 1):
+                        ctx.log(f"linha {i}")
+                        ctx.progress(int(i * 100 / N_LOGS))
+                        time.sleep(0.01)
+                    ctx.set_status(Job.Status.SUCCESS, 100, extra={"ok": True})
+                    ctx.log("última linha, depois do status")
+            finally:
+                connection.close()
+        t = threading.Thread(target=alvo)
+        t.start()
+        return t
+
+    def _bearer(self, user):
+        return {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+
+    async def test_autenticacao(self):
+        cliente = AsyncClient()
+        self.assertEqual((await cliente.get(self.url)).status_code, 401)
+        # token na query string não vale: iria para os logs de acesso
+        self.assertEqual((await cliente.get(self.url, {"token": self.token})).status_code, 401)
+        self.assertEqual((await cliente.get(self.url, headers=self._bearer(self.comum))).status_code, 403)
+        r = await cliente.get("/api/jobs/00000000-0000-0000-0000-000000000000/stream/", headers=self._bearer(self.staff))
+        self.assertEqual(r.status_code, 404)
+
+    async def test_sessao_do_navegador(self):
+        await sync_to_async(_set_status)(self.job, Job.Status.SUCCESS, 100)
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.staff)
+        evs = await _ler(await cliente.get(self.url))
+        self.assertEqual(evs[-1]["event"], "fim")
+
+    async def test_observadores_ao_vivo_e_retomada(self):
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.staff)
+        inicio = threading.Event()
+        t = self._rodar_job(inicio)
+        respostas = [await cliente.get(self.url) for _ in range(N_OBSERVADORES)]
+        self.assertTrue(all(r["Content-Type"] == "text/event-stream" for r in respostas))
+        lista = await cliente.get("/api/jobs/stream/")
+        tarefas = [asyncio.ensure_future(_ler(r)) for r in respostas]
+        leitura_lista = asyncio.ensure_future(_ler(lista, timeout=120))
+        await asyncio.sleep(0.3)
+        ticks0, t0 = central.ticks, time.monotonic()
+        inicio.set()
+        resultados = await asyncio.gather(*tarefas)
+        ticks, dt = central.ticks - ticks0, time.monotonic() - t0
+        await sync_to_async(t.join)()
+        leitura_lista.cancel()
+        await asyncio.gather(leitura_lista, return_exceptions=True)
+
+        esperado = [f"linha {i}" for i in range(1, N_LOGS + 1)] + ["última linha, depois do status"]
+        for evs in resultados:
+            logs = [e for e in evs if e["event"] == "log"]
+            ids = [int(e["id"]) for e in logs]
+            self.assertEqual([e["data"]["message"] for e in logs][-len(esperado):], esperado)
+            self.assertEqual(ids, sorted(set(ids)))  # em ordem e sem repetição
+            estados = [e["data"] for e in evs if e["event"] == "job"]
+            self.assertGreater(len({s["progress"] for s in estados}), 2)
+            self.assertEqual((estados[-1]["status"], evs[-1]["event"]), (Job.Status.SUCCESS, "fim"))
+        # observadores + lista: uma consulta da central por intervalo
+        self.assertLessEqual(ticks, dt / (CONFIG["JOBS_SSE_INTERVALO_MS"] / 1000) + 2)
+
+        # reconexão com o Last-Event-ID recebe só o que faltava
+        meio = [e for e in resultados[0] if e["event"] == "log"][N_LOGS // 2]
+        evs = await _ler(await cliente.get(self.url, headers={"Last-Event-ID": meio["id"]}))
+        logs = [e for e in evs if e["event"] == "log"]
+        self.assertGreater(int(logs[0]["id"]), int(meio["id"]))
+        self.assertEqual(len(logs), len(esperado) - N_LOGS // 2 - 1)
+        self.assertEqual(evs[-1]["event"], "fim")
+
+    async def test_lista_recebe_job_novo_e_mudanca_de_status(self):
+        lista = await AsyncClient().get("/api/jobs/stream/", headers=self._bearer(self.staff))
+        recebidos: list[dict] = []
+        leitura = asyncio.ensure_future(_acumular(lista, recebidos))
+        await asyncio.sleep(0.3)
+        novo = await Job.objects.acreate(name="job novo", type="sankhya_demo", payload={})
+        await asyncio.sleep(0.3)
+        await sync_to_async(_set_status)(novo, Job.Status.RUNNING, 40)
+        limite = time.monotonic() + 5
+        estados = []
+        while time.monotonic() < limite:
+            estados = [e["data"]["status"] for e in recebidos if e["data"]["id"] == str(novo.pk)]
+            if Job.Status.RUNNING in estados:
+                break
+            await asyncio.sleep(0.05)
+        leitura.cancel()
+        await asyncio.gather(leitura, return_exceptions=True)
+        self.assertEqual(estados[:1], [Job.Status.QUEUED])
+        self.assertIn(Job.Status.RUNNING, estados)
+        self.assertFalse(central.filas)  # desconectados saem da central
+
+    def test_wsgi_responde_o_estado_e_termina(self):
+        _set_status(self.job, Job.Status.SUCCESS, 100)
+        request = RequestFactory().get(self.url, headers=self._bearer(self.staff))
+        request.user = AnonymousUser()
+        request.auser = sync_to_async(lambda: AnonymousUser())
+        t0 = time.monotonic()
+        resp = asyncio.run(JobStreamView.as_view()(request, job_id=self.job.pk))
+        corpo = b"".join(resp)  # consumido como o servidor WSGI faria
+        self.assertLess(time.monotonic() - t0, 5)
+        self.assertTrue(corpo.startswith(b"retry:"))
+        self.assertEqual(_eventos(corpo.decode())[-1]["event"], "fim")
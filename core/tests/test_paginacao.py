@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Cliente, Pedido, Representante, TabelaDePreco
+from core.views import PedidoViewSet, TabelaDePrecoViewSet
+
+
+class PaginacaoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username="staff", is_staff=True)
+        rep = Representante.objects.create(user=User.objects.create(username="rep"), codigo="R1")
+        cliente = Cliente.objects.create(codigo="C1", nome="Cliente", uf="SP")
+        for i in range(3):
+            Pedido.objects.create(numero=f"P{i}", representante=rep, cliente=cliente, total=Decimal("1"))
+        TabelaDePreco.objects.create(nome="Padrão")
+
+    def _listar(self, viewset, params=None):
+        request = APIRequestFactory().get("/", params or {})
+        force_authenticate(request, user=self.staff)
+        return viewset.as_view({"get": "list"})(request).data
+
+    def test_pedidos_por_cursor(self):
+        pagina = self._listar(PedidoViewSet, {"page_size": 2})
+        self.assertEqual([p["numero"] for p in pagina["results"]], ["P2", "P1"])
+        self.assertIsNotNone(pagina["next"])
+        self.assertNotIn("count", pagina)
+
+    def test_listagem_sem_pagination_class_continua_lista(self):
+        # sem paginação padrão em REST_FRAMEWORK: o formato das demais não muda
+        self.assertEqual([t["nome"] for t in self._listar(TabelaDePrecoViewSet)], ["Padrão"])
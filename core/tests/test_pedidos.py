@@ -0,0 +1,91 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.viewsets import PedidoViewSet
+from core.models import Cliente, ItemPedido, Pedido, Preco, Produto, Representante, TabelaDePreco
+from core.services import contadores
+from core.services.pedidos import (
+    CONTADOR_NUMERO, PedidoInvalido, criar_pedido, numero_invalido, proximos_numeros,
+)
+from core.services.precos import limpar_cache_local
+
+
+class CriarPedidoTests(TestCase):
+    """criar_pedido / PedidoSerializer.create: itens em um bulk_create e numeração pelo Contador."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rep = Representante.objects.create(user=User.objects.create(username="rep"), codigo="R1")
+        cls.cliente = Cliente.objects.create(codigo="C1", nome="Cliente", uf="SP")
+        cls.tabela = TabelaDePreco.objects.create(nome="Padrão")
+        cls.produtos = Produto.objects.bulk_create(
+            [Produto(sku=f"SKU-{i:03d}", descricao=f"Produto {i}") for i in range(30)]
+        )
+        Preco.objects.bulk_create([Preco(produto=p, tabela=cls.tabela, preco=Decimal("10.00")) for p in cls.produtos])
+
+    def setUp(self):
+        limpar_cache_local()
+        self.addCleanup(limpar_cache_local)
+
+    def _criar(self, n_itens=1, **campos):
+        itens = [{"produto": p.pk, "qtd": Decimal("2")} for p in self.produtos[:n_itens]]
+        return criar_pedido({"cliente": self.cliente, "representante": self.rep, **campos}, itens, "Padrão")
+
+    def _post(self, dados):
+        request = APIRequestFactory().post("/api/pedidos/", dados, format="json")
+        force_authenticate(request, user=self.rep.user)
+        return PedidoViewSet.as_view({"post": "create"})(request)
+
+    def test_itens_em_lote_com_subtotal_e_total(self):
+        pedido = self._criar(3, numero="", status="RASCUNHO")
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.total, Decimal("60.00"))
+        self.assertEqual(list(pedido.itens.values_list("subtotal", flat=True)), [Decimal("20.00")] * 3)
+        self.assertRegex(pedido.numero, r"^PV-\d{8}$")
+
+    def test_consultas_fixas_para_qualquer_numero_de_itens(self):
+        self._criar()  # cria os contadores e a linha do rollup
+        consultas = []
+        for n in (1, 30):
+            limpar_cache_local()
+            with CaptureQueriesContext(connection) as ctx:
+                self._criar(n)
+            consultas.append(len(ctx.captured_queries))
+        self.assertEqual(consultas[0], consultas[1])
+        self.assertEqual(ItemPedido.objects.count(), 32)
+
+    def test_item_sem_preco_nao_grava_nada(self):
+        Produto.objects.create(sku="SEM-PRECO", descricao="Sem preço")
+        with self.assertRaises(PedidoInvalido) as ctx:
+            criar_pedido({"cliente": self.cliente, "representante": self.rep},
+                         [{"produto_sku": "SEM-PRECO"}, {"produto_sku": "NAO-EXISTE"}], "Padrão")
+        self.assertEqual(len(ctx.exception.erros), 2)
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_numero_no_formato_automatico_e_recusado(self):
+        self.assertIsNotNone(numero_invalido("PV-00000003"))
+        self.assertIsNone(numero_invalido("PV-3"))
+        with self.assertRaises(PedidoInvalido):
+            self._criar(numero="PV-00000003")
+        resp = self._post({"cliente": self.cliente.pk, "representante": self.rep.pk, "numero": "PV-00000003",
+                           "items": [{"produto": self.produtos[0].pk, "qtd": 1}]})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("numero", resp.data)
+
+        resp = self._post({"cliente": self.cliente.pk, "representante": self.rep.pk, "numero": "MANUAL-1",
+                           "items": [{"produto": self.produtos[0].pk, "qtd": 1}]})
+        self.assertEqual((resp.status_code, resp.data.get("numero")), (201, "MANUAL-1"), resp.data)
+
+    def test_numeracao_pula_numeros_ja_gravados(self):
+        # gravados por outro caminho (admin, dados antigos) no caminho do contador
+        for numero in ("PV-00000002", "PV-00000003"):
+            Pedido.objects.create(numero=numero, cliente=self.cliente, representante=self.rep)
+        self.assertEqual(self._criar().numero, "PV-00000001")
+        self.assertEqual(self._criar().numero, "PV-00000004")
+        self.assertEqual(proximos_numeros(2), ["PV-00000005", "PV-00000006"])
+        self.assertEqual(contadores.valor(CONTADOR_NUMERO), 6)
@@ -0,0 +1,99 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Cliente, ItemPedido, Pedido, Preco, Produto, Representante, TabelaDePreco
+from core.services import pedidos as pedidos_service, vendas_diarias
+from core.services.precos import limpar_cache_local
+
+URL = "/api/pedidos/lote/"
+
+
+class PedidosLoteTests(TestCase):
+    """POST /api/pedidos/lote/: envio de vários pedidos com chave de idempotência."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rep = Representante.objects.create(user=User.objects.create(username="rep"), codigo="R1")
+        cls.cliente = Cliente.objects.create(codigo="C1", nome="Cliente", uf="SP")
+        tabela = TabelaDePreco.objects.create(nome="Padrão")
+        cls.produto = Produto.objects.create(sku="SKU-1", descricao="Produto")
+        Preco.objects.create(produto=cls.produto, tabela=tabela, preco=Decimal("10.00"))
+
+    def setUp(self):
+        limpar_cache_local()
+        self.addCleanup(limpar_cache_local)
+        self.api = APIClient()
+        self.api.force_authenticate(self.rep.user)
+
+    def _pedido(self, chave, **extra):
+        return {"chave": chave, "cliente": self.cliente.pk, "itens": [{"produto_sku": "SKU-1", "qtd": 2}], **extra}
+
+    def _enviar(self, pedidos, enviar=True):
+        resp = self.api.post(URL, {"enviar": enviar, "pedidos": pedidos}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.data)
+        return resp.data
+
+    def test_reenvio_com_as_mesmas_chaves_nao_duplica(self):
+        lote = [self._pedido("app-1"), self._pedido("app-2")]
+        r1 = self._enviar(lote)
+        self.assertEqual(r1["resumo"], {"criado": 2, "existente": 0, "erro": 0})
+        self.assertEqual([r["situacao"] for r in r1["resultados"]], ["ENVIADO", "ENVIADO"])
+
+        r2 = self._enviar(lote + [self._pedido("app-3")])
+        self.assertEqual(r2["resumo"], {"criado": 1, "existente": 2, "erro": 0})
+        self.assertEqual(
+            [(r["id"], r["numero"]) for r in r2["resultados"][:2]],
+            [(r["id"], r["numero"]) for r in r1["resultados"]],
+        )
+        self.assertEqual(Pedido.objects.count(), 3)
+        self.assertEqual(ItemPedido.objects.count(), 3)
+        self.assertEqual(vendas_diarias.diff(), [])
+
+    def test_validos_gravados_e_invalidos_com_erro_por_pedido(self):
+        Pedido.objects.create(numero="MANUAL-1", cliente=self.cliente, representante=self.rep)
+        r = self._enviar([
+            self._pedido("ok"),
+            self._pedido("cliente", cliente=999999),
+            self._pedido("sku", itens=[{"produto_sku": "NAO-EXISTE"}]),
+            self._pedido("reservado", numero="PV-00000003"),
+            self._pedido("numero-usado", numero="MANUAL-1"),
+            self._pedido("ok"),  # chave repetida no lote
+            self._pedido("vazio", itens=[]),
+        ])
+        self.assertEqual([x["status"] for x in r["resultados"]], ["criado"] + ["erro"] * 6)
+        erros = [" ".join(x.get("erros", [])) for x in r["resultados"]]
+        self.assertIn("cliente 999999", erros[1])
+        self.assertIn("NAO-EXISTE", erros[2])
+        self.assertIn("reservado", erros[3])
+        self.assertIn("já existe", erros[4])
+        self.assertIn("chave repetida", erros[5])
+        self.assertIn("sem itens", erros[6])
+        self.assertEqual(Pedido.objects.filter(chave_idempotencia__isnull=False).count(), 1)
+
+    def test_numeracao_automatica_e_numero_informado(self):
+        Pedido.objects.create(numero="PV-00000002", cliente=self.cliente, representante=self.rep)
+        r = self._enviar([self._pedido("a"), self._pedido("b", numero="TAB-77"), self._pedido("c")])
+        self.assertEqual([x["numero"] for x in r["resultados"]], ["PV-00000001", "TAB-77", "PV-00000003"])
+        self.assertEqual(Pedido.objects.get(numero="TAB-77").total, Decimal("20.00"))
+
+    def test_colisao_na_gravacao_vira_erro_do_pedido(self):
+        # número que colide mesmo depois das conferências (ex.: gravado por outro envio no meio)
+        Pedido.objects.create(numero="PV-00000009", cliente=self.cliente, representante=self.rep)
+        with mock.patch.object(pedidos_service, "proximos_numeros", side_effect=lambda n=1: ["PV-00000009"] * n):
+            r = self._enviar([self._pedido("a"), self._pedido("b", numero="TAB-1")])
+        self.assertEqual([x["status"] for x in r["resultados"]], ["erro", "criado"])
+        self.assertEqual(r["resumo"], {"criado": 1, "existente": 0, "erro": 1})
+        self.assertFalse(Pedido.objects.filter(chave_idempotencia="a").exists())
+        self.assertEqual(vendas_diarias.diff(), [])
+
+    def test_representante_so_lanca_para_si(self):
+        outro = Representante.objects.create(user=User.objects.create(username="outro"), codigo="R2")
+        r = self._enviar([self._pedido("x", representante=outro.pk)])
+        self.assertEqual(Pedido.objects.get(pk=r["resultados"][0]["id"]).representante, self.rep)
+
+        self.api.force_authenticate(User.objects.create(username="sem-rep"))
+        self.assertEqual(self.api.post(URL, {"pedidos": [self._pedido("y")]}, format="json").status_code, 403)
@@ -0,0 +1,127 @@
+import os
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Cliente, ItemPedido, Pedido, Produto, Representante, VendaDiaria
+from core.services import vendas_diarias
+
+# pedidos sintéticos; PLANOS_PEDIDOS=1000000 aproxima o volume de produção
+N_PEDIDOS = int(os.environ.get("PLANOS_PEDIDOS", "20000"))
+
+# tabelas grandes: um scan completo nelas é regressão de plano
+TABELAS_VIGIADAS = ("core_pedido", "core_itempedido", "core_vendadiaria")
+
+_SEQ_SQLITE = re.compile(r"\bSCAN (\w+)\s*$")
+_SEQ_POSTGRES = re.compile(r"Seq Scan on (\w+)")
+
+
+def _scans_completos(plano: str) -> list[str]:
+    tabelas = []
+    for linha in plano.splitlines():
+        m = _SEQ_POSTGRES.search(linha) or _SEQ_SQLITE.search(linha.strip())
+        if m and m.group(1) in TABELAS_VIGIADAS:
+            tabelas.append(m.group(1))
+    return tabelas
+
+
+def consultas_relatorios(rep, cliente, start, end):
+    """
+    Mesmos formatos de consulta de api/views_reports.py, core/views_reposts.py
+    e das listagens de pedidos (representante + ordenação por data).
+    """
+    zero = Value(Decimal("0"))
+    pedidos = Pedido.objects.filter(criado_em__gte=start, criado_em__lte=end)
+    rollup = VendaDiaria.objects.filter(dia__gte=start.date(), dia__lte=end.date())
+    return [
+        ("resumo", pedidos.values("cliente_id", "cliente__nome")
+            .annotate(total=Coalesce(Sum("total"), zero), pedidos=Count("id"))),
+        ("resumo/rep", pedidos.filter(representante=rep).values("cliente_id")
+            .annotate(total=Sum("total"), pedidos=Count("id"))),
+        ("resumo/status", pedidos.filter(status="ENVIADO").values("cliente_id")
+            .annotate(total=Sum("total"))),
+        ("resumo/cliente", pedidos.filter(cliente=cliente).values("cliente_id")
+            .annotate(total=Sum("total"))),
+        ("itens", ItemPedido.objects.filter(pedido__in=pedidos)
+            .values("produto_id", "produto__sku")
+            .annotate(qtd_total=Coalesce(Sum("qtd"), zero),
+                      valor_total=Coalesce(Sum(F("qtd") * F("preco_unit")), zero))),
+        ("itens/rep", ItemPedido.objects.filter(pedido__in=pedidos.filter(representante=rep))
+            .values("produto_id").annotate(qtd_total=Sum("qtd"))),
+        ("heatmap", pedidos.values("cliente__uf").annotate(total=Sum("total"))),
+        ("mtd-ytd/serie", Pedido.objects.filter(criado_em__year=end.year, representante=rep)
+            .annotate(mes=TruncMonth("criado_em")).values("mes").annotate(total=Sum("total"))),
+        ("pedidos/lista-rep", Pedido.objects.filter(representante=rep).order_by("-criado_em")[:50]),
+        ("rollup/resumo", rollup.values("cliente_id").annotate(total=Sum("total"), n=Sum("pedidos"))),
+        ("rollup/rep", rollup.filter(representante=rep).values("cliente_id").annotate(total=Sum("total"))),
+    ]
+
+
+class PlanosRelatoriosTests(TestCase):
+    """EXPLAIN nas consultas dos relatórios: nenhuma pode fazer scan completo em pedido/item/rollup."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls._seed(N_PEDIDOS)
+
+    def test_sem_scan_completo(self):
+        rep = Representante.objects.order_by("pk").first()
+        cliente = Cliente.objects.order_by("pk").first()
+        end = timezone.now()
+        start = end - timedelta(days=30)
+        for nome, qs in consultas_relatorios(rep, cliente, start, end):
+            plano = qs.explain()
+            with self.subTest(consulta=nome):
+                self.assertEqual(_scans_completos(plano), [], plano)
+
+    @classmethod
+    def _seed(cls, n, chunk=10_000):
+        reps = []
+        for i in range(20):
+            u = User.objects.create(username=f"explain-rep-{i}")
+            reps.append(Representante.objects.create(user=u, codigo=f"EXPL{i:03d}"))
+        ufs = ["SP", "RJ", "MG", "PR", "SC", "RS", "BA", "GO"]
+        clientes = Cliente.objects.bulk_create(
+            [Cliente(codigo=f"EXPL{i:05d}", nome=f"Cliente {i}", uf=ufs[i % len(ufs)]) for i in range(2000)]
+        )
+        produtos = Produto.objects.bulk_create(
+            [Produto(sku=f"EXPL-{i:05d}", descricao=f"Produto {i}") for i in range(500)]
+        )
+
+        # criado_em é auto_now_add; desliga durante o bulk_create para espalhar as datas
+        campo = Pedido._meta.get_field("criado_em")
+        campo.auto_now_add = False
+        status = [s for s, _ in Pedido.STATUS]
+        agora = timezone.now()
+        try:
+            for ini in range(0, n, chunk):
+                lote = [
+                    Pedido(
+                        numero=f"EXPL-{i}",
+                        representante=reps[i % len(reps)],
+                        cliente=clientes[(i * 7) % len(clientes)],
+                        status=status[i % len(status)],
+                        total=Decimal(i % 1000),
+                        criado_em=agora - timedelta(minutes=(i * 2017) % (5 * 365 * 24 * 60)),
+                    )
+                    for i in range(ini, min(ini + chunk, n))
+                ]
+                Pedido.objects.bulk_create(lote)
+                ItemPedido.objects.bulk_create([
+                    ItemPedido(pedido=p, produto=produtos[p.pk % len(produtos)], qtd=1,
+                               preco_unit=p.total, subtotal=p.total)
+                    for p in lote
+                ])
+        finally:
+            campo.auto_now_add = True
+
+        vendas_diarias.rebuild()
+        with connection.cursor() as cur:
+            cur.execute("ANALYZE")
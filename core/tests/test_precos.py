@@ -0,0 +1,119 @@
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Preco, Produto, TabelaDePreco
+from core.services import contadores
+from core.services.precos import (
+    VERSAO_PRECOS, ImportacaoPrecosErro, PrecoSku, importar_precos, limpar_cache_local,
+    resolver_precos,
+)
+
+
+class ImportarPrecosTests(TestCase):
+    """importar_precos: upsert em lote de (produto, tabela) a partir de CSV/XLSX."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tabela = TabelaDePreco.objects.create(nome="Padrão")
+        cls.outra = TabelaDePreco.objects.create(nome="Atacado")
+        cls.a = Produto.objects.create(sku="A1", descricao="Bola")
+        cls.b = Produto.objects.create(sku="B2", descricao="Boneca")
+        cls.c = Produto.objects.create(sku="C3", descricao="Carrinho")
+        Preco.objects.create(produto=cls.a, tabela=cls.tabela, preco=Decimal("1.00"))
+        Preco.objects.create(produto=cls.a, tabela=cls.outra, preco=Decimal("0.90"))
+
+    def _arquivo(self, conteudo: str) -> Path:
+        pasta = self.enterContext(tempfile.TemporaryDirectory())
+        arquivo = Path(pasta) / "precos.csv"
+        arquivo.write_text(conteudo, encoding="utf-8")
+        return arquivo
+
+    def _precos(self, tabela):
+        return dict(Preco.objects.filter(tabela=tabela).values_list("produto__sku", "preco"))
+
+    def test_insere_atualiza_e_conta_linhas_invalidas(self):
+        arquivo = self._arquivo(
+            "REF;PRECO\n"
+            "A1;12,50\n"      # já tinha preço na tabela: atualiza
+            "B2;1.234,56\n"   # par novo: insere
+            "C3;\n"           # sem preço
+            "C3;abc\n"        # preço inválido
+            "C3;-1\n"         # negativo
+            "ZZ9;5,00\n"      # SKU desconhecido
+            ";7,00\n"         # sem REF: ignorada
+        )
+        resumo = importar_precos(arquivo, "Padrão", chunk=2)
+        self.assertEqual(
+            {k: resumo[k] for k in ("linhas", "gravados", "sem_preco", "skus_desconhecidos", "amostra_desconhecidos")},
+            {"linhas": 7, "gravados": 2, "sem_preco": 3, "skus_desconhecidos": 1, "amostra_desconhecidos": ["ZZ9"]},
+        )
+        self.assertEqual(self._precos(self.tabela), {"A1": Decimal("12.50"), "B2": Decimal("1234.56")})
+        self.assertEqual(self._precos(self.outra), {"A1": Decimal("0.90")})  # outras tabelas intactas
+        self.assertEqual(Preco.objects.filter(produto=self.a, tabela=self.tabela).count(), 1)
+
+    def test_sku_repetido_vale_a_ultima_linha(self):
+        importar_precos(self._arquivo("REF;PRECO\nB2;3,00\nB2;4,00\n"), "Padrão")
+        self.assertEqual(self._precos(self.tabela)["B2"], Decimal("4.00"))
+
+    def test_tabela_inexistente(self):
+        arquivo = self._arquivo("REF;PRECO\nA1;2,00\n")
+        with self.assertRaises(ImportacaoPrecosErro):
+            importar_precos(arquivo, "Nova")
+        resumo = importar_precos(arquivo, "Nova", criar_tabela=True)
+        self.assertEqual(resumo["gravados"], 1)
+        self.assertEqual(self._precos(TabelaDePreco.objects.get(nome="Nova")), {"A1": Decimal("2.00")})
+
+
+class ResolverPrecosCacheTests(TestCase):
+    """resolver_precos: cache por processo descartado quando o contador "precos" muda."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tabela = TabelaDePreco.objects.create(nome="Padrão")
+        cls.produto = Produto.objects.create(sku="A1", descricao="Bola")
+        cls.preco = Preco.objects.create(produto=cls.produto, tabela=cls.tabela, preco=Decimal("10.00"))
+
+    def setUp(self):
+        limpar_cache_local()
+        self.addCleanup(limpar_cache_local)
+
+    def _resolver(self, sku="A1"):
+        with CaptureQueriesContext(connection) as ctx:
+            res = resolver_precos("Padrão", [sku])
+        return res[sku], len(ctx.captured_queries)
+
+    def _preco_sku(self, preco):
+        return PrecoSku(self.produto.pk, "A1", "Bola", preco, preco)
+
+    def test_segunda_chamada_so_le_a_versao(self):
+        self.assertEqual(self._resolver(), (self._preco_sku(Decimal("10.00")), 2))
+        self.assertEqual(self._resolver(), (self._preco_sku(Decimal("10.00")), 1))
+
+    def test_importacao_invalida_o_cache(self):
+        self._resolver()
+        pasta = self.enterContext(tempfile.TemporaryDirectory())
+        arquivo = Path(pasta) / "precos.csv"
+        arquivo.write_text("REF;PRECO\nA1;12,00\n", encoding="utf-8")
+        versao = contadores.valor(VERSAO_PRECOS)
+        with self.captureOnCommitCallbacks(execute=True):
+            importar_precos(arquivo, "Padrão")
+        self.assertGreater(contadores.valor(VERSAO_PRECOS), versao)
+        self.assertEqual(self._resolver(), (self._preco_sku(Decimal("12.00")), 2))
+
+    def test_save_de_preco_e_versao_de_outro_processo(self):
+        self._resolver()
+        with self.captureOnCommitCallbacks(execute=True):
+            Preco.objects.filter(pk=self.preco.pk).update(preco=Decimal("11.00"))  # sem signal
+        self.assertEqual(self._resolver()[0].preco, Decimal("10.00"))  # ainda em cache
+        contadores.incrementar(VERSAO_PRECOS)  # como faria outro worker depois de gravar
+        self.assertEqual(self._resolver()[0].preco, Decimal("11.00"))
+
+        self.preco.preco = Decimal("13.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.preco.save()
+        self.assertEqual(self._resolver()[0].preco, Decimal("13.00"))
@@ -0,0 +1,94 @@
+import io
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Cliente, ItemPedido, Pedido, Produto, Representante
+from core.services import vendas_diarias
+from core.services.pedidos import ajustar_total, reconciliar_totais
+from core.views import ItemPedidoViewSet
+
+
+class TotaisPedidosTests(TestCase):
+    """Pedido.total mantido por deltas (ajustar_total) e conferido por reconciliar_totais."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="rep")
+        cls.rep = Representante.objects.create(user=cls.user, codigo="R1")
+        cls.cliente = Cliente.objects.create(codigo="C1", nome="Cliente", uf="SP")
+        cls.produto = Produto.objects.create(sku="SKU-1", descricao="Produto")
+
+    def setUp(self):
+        self.p1 = Pedido.objects.create(numero="P1", cliente=self.cliente, representante=self.rep, status="ENVIADO")
+        self.p2 = Pedido.objects.create(numero="P2", cliente=self.cliente, representante=self.rep, status="ENVIADO")
+
+    def _api(self, metodo, acao, dados=None, pk=None):
+        request = getattr(APIRequestFactory(), metodo)("/itens/", dados, format="json")
+        force_authenticate(request, user=self.user)
+        resp = ItemPedidoViewSet.as_view({metodo: acao})(request, **({"pk": pk} if pk else {}))
+        self.assertLess(resp.status_code, 300, getattr(resp, "data", None))
+        return resp
+
+    def _totais(self):
+        return dict(Pedido.objects.values_list("numero", "total"))
+
+    def _consistente(self):
+        self.assertEqual(reconciliar_totais(corrigir=False)["divergentes"], 0)
+        self.assertEqual(vendas_diarias.diff(), [])
+
+    def test_criar_alterar_mover_e_apagar_item(self):
+        item = {"pedido": self.p1.pk, "produto": self.produto.pk, "qtd": "2", "preco_unit": "10.00", "desconto": "0"}
+        pk = self._api("post", "create", item).data["id"]
+        self._api("post", "create", {**item, "qtd": "1"})
+        self.assertEqual(self._totais(), {"P1": Decimal("30.00"), "P2": Decimal("0.00")})
+        self._consistente()
+
+        self._api("patch", "partial_update", {"qtd": "5"}, pk=pk)
+        self.assertEqual(self._totais()["P1"], Decimal("60.00"))
+        self._api("patch", "partial_update", {"pedido": self.p2.pk}, pk=pk)
+        self.assertEqual(self._totais(), {"P1": Decimal("10.00"), "P2": Decimal("50.00")})
+        self._consistente()
+
+        self._api("delete", "destroy", pk=pk)
+        self.assertEqual(self._totais(), {"P1": Decimal("10.00"), "P2": Decimal("0.00")})
+        self._consistente()
+
+    def test_ajuste_por_delta_nao_le_os_itens(self):
+        ItemPedido.objects.create(pedido=self.p1, produto=self.produto, qtd=1, preco_unit=Decimal("7"))
+        with CaptureQueriesContext(connection) as ctx:
+            ajustar_total(self.p1.pk, Decimal("7"))
+        self.assertFalse([q for q in ctx.captured_queries if "core_itempedido" in q["sql"]])
+        self.assertTrue([q for q in ctx.captured_queries if q["sql"].startswith("UPDATE") and '"total" +' in q["sql"]])
+        # a instância em memória continua com o valor antigo: o UPDATE soma no banco
+        ajustar_total(self.p1.pk, Decimal("0"))
+        self.assertEqual((self.p1.total, self._totais()["P1"]), (Decimal("0"), Decimal("7.00")))
+        self._consistente()
+
+    def test_reconciliar_reporta_e_corrige_divergencias(self):
+        for pedido in (self.p1, self.p2):
+            ItemPedido.objects.create(pedido=pedido, produto=self.produto, qtd=1, preco_unit=Decimal("10"))
+            ajustar_total(pedido.pk, Decimal("10"))
+        # divergências por escrita direta: no total do pedido e no subtotal de um item
+        Pedido.objects.filter(pk=self.p1.pk).update(total=Decimal("999"))
+        ItemPedido.objects.filter(pedido=self.p2).update(subtotal=Decimal("4"))
+
+        r = reconciliar_totais(corrigir=False)
+        self.assertEqual((r["divergentes"], r["corrigidos"]), (2, 0))
+        self.assertEqual(
+            {d["numero"]: (Decimal(d["total"]), Decimal(d["soma_itens"])) for d in r["amostra"]},
+            {"P1": (Decimal("999"), Decimal("10")), "P2": (Decimal("10"), Decimal("4"))},
+        )
+        self.assertEqual(self._totais()["P1"], Decimal("999.00"))  # só reporta
+        with self.assertRaises(CommandError):
+            call_command("check_totais_pedidos", stdout=io.StringIO())
+
+        r = reconciliar_totais()
+        self.assertEqual((r["divergentes"], r["corrigidos"]), (2, 2))
+        self.assertEqual(self._totais(), {"P1": Decimal("10.00"), "P2": Decimal("4.00")})
+        self._consistente()
@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Cliente, Pedido, Representante, VendaDiaria
+from core.services import vendas_diarias
+
+
+class RollupVendaDiariaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rep = Representante.objects.create(user=User.objects.create(username="rep"), codigo="R1")
+        cls.cliente = Cliente.objects.create(codigo="C1", nome="Cliente", uf="SP")
+
+    def _pedido(self, numero, total):
+        return Pedido.objects.create(numero=numero, representante=self.rep, cliente=self.cliente,
+                                     status="ENVIADO", total=Decimal(total))
+
+    def test_pedidos_somados_no_rollup(self):
+        self._pedido("P1", "10")
+        p = self._pedido("P2", "5")
+        p.total = Decimal("7")
+        p.save()
+        linha = VendaDiaria.objects.get()
+        self.assertEqual((linha.pedidos, linha.total, linha.uf), (2, Decimal("17"), "SP"))
+        self.assertEqual(vendas_diarias.diff(), [])
+
+    def test_mudanca_de_uf_do_cliente_move_as_linhas(self):
+        self._pedido("P1", "10")
+        self._pedido("P2", "5")
+        self.cliente.uf = "RJ"
+        self.cliente.save()
+        self.assertEqual(vendas_diarias.diff(), [])
+        self.assertEqual(list(VendaDiaria.objects.values_list("uf", "pedidos")), [("RJ", 2)])
+
+    def test_salvar_cliente_sem_mudar_uf_nao_refaz_o_rollup(self):
+        self._pedido("P1", "10")
+        self.cliente.nome = "Outro nome"
+        with CaptureQueriesContext(connection) as ctx:
+            self.cliente.save()
+        self.assertFalse([q for q in ctx.captured_queries if "core_vendadiaria" in q["sql"]])
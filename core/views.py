@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -8,6 +9,8 @@ from .serializers import (
     ClienteSerializer, ProdutoSerializer, TabelaDePrecoSerializer,
     PrecoSerializer, PedidoSerializer, ItemPedidoSerializer
 )
+from .pagination import ClienteCursor, ItemPedidoCursor, PedidoCursor, ProdutoCursor
+from .services.pedidos import ajustar_total, prefetch_itens
 
 class DefaultPerm(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -15,11 +18,13 @@ class DefaultPerm(viewsets.ModelViewSet):
 class ClienteViewSet(DefaultPerm):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
+    pagination_class = ClienteCursor
     search_fields = ["codigo", "nome", "cnpj"]
 
 class ProdutoViewSet(DefaultPerm):
     queryset = Produto.objects.all()
     serializer_class = ProdutoSerializer
+    pagination_class = ProdutoCursor
     search_fields = ["sku", "descricao", "familia"]
 
 class TabelaDePrecoViewSet(DefaultPerm):
@@ -53,8 +58,9 @@ class PrecoViewSet(DefaultPerm):
             return Response({"detail": "Preço não cadastrado para este SKU/tabela."}, status=404)
 
 class PedidoViewSet(DefaultPerm):
-    queryset = Pedido.objects.select_related("cliente", "representante").all()
+    queryset = Pedido.objects.select_related("cliente", "representante").prefetch_related(prefetch_itens())
     serializer_class = PedidoSerializer
+    pagination_class = PedidoCursor
 
     @action(detail=True, methods=["post"], url_path="enviar")
     def enviar(self, request, pk=None):
@@ -88,22 +94,25 @@ class PedidoViewSet(DefaultPerm):
 class ItemPedidoViewSet(DefaultPerm):
     queryset = ItemPedido.objects.select_related("pedido", "produto").all()
     serializer_class = ItemPedidoSerializer
+    pagination_class = ItemPedidoCursor
 
+    # total do pedido ajustado pelo delta do item (sem recarregar os demais itens)
     def perform_create(self, serializer):
-        item = serializer.save()
-        # recalcula total do pedido
-        p = item.pedido
-        p.total = sum(i.subtotal for i in p.itens.all())
-        p.save(update_fields=["total"])
+        with transaction.atomic():
+            item = serializer.save()
+            ajustar_total(item.pedido_id, item.subtotal)
 
     def perform_update(self, serializer):
-        item = serializer.save()
-        p = item.pedido
-        p.total = sum(i.subtotal for i in p.itens.all())
-        p.save(update_fields=["total"])
+        antes = (serializer.instance.pedido_id, serializer.instance.subtotal)
+        with transaction.atomic():
+            item = serializer.save()
+            if item.pedido_id == antes[0]:
+                ajustar_total(item.pedido_id, item.subtotal - antes[1])
+            else:  # item mudou de pedido
+                ajustar_total(antes[0], -antes[1])
+                ajustar_total(item.pedido_id, item.subtotal)
 
     def perform_destroy(self, instance):
-        pedido = instance.pedido
-        super().perform_destroy(instance)
-        pedido.total = sum(i.subtotal for i in pedido.itens.all())
-        pedido.save(update_fields=["total"])
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            ajustar_total(instance.pedido_id, -instance.subtotal)
@@ -1,57 +1,169 @@
 
 from __future__ import annotations
-import threading, time, random
+import logging, re, time, random
+from pathlib import Path
 from typing import Callable
-from django.db import transaction
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.http import content_disposition_header
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAdminUser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status as http_status
-from django.core.paginator import Paginator
-from .models import Job, JobLog
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from .models import Job, JobArquivo, JobLog
+from .pagination import JobCursor, JobLogCursor
+from .services import acompanhamento_jobs, arquivos_jobs, job_queue, relatorios
+from .services.enriquecimento_cnpj import enriquecer_clientes
+from .services.exportacao import RespostaEmBlocos
+from .services.pedidos import reconciliar_totais
+from .services.precos import importar_precos
 
 # -----------------------------------------------------------------------------------
 # Helpers de log e runner
 
+logger = logging.getLogger(__name__)
+
+
+class JobContext:
+    """
+    Contexto de execução de um job: guarda os logs em memória e grava em lote
+    (bulk_create) quando passam de JOBS_LOG_BUFFER linhas ou JOBS_LOG_FLUSH_MS;
+    o progresso é gravado no máximo a cada JOBS_PROGRESS_MS. Mudanças de status
+    são gravadas na hora (e descarregam os logs antes). Ao sair do `with`, mesmo
+    com exceção, tudo o que estiver pendente é gravado.
+
+    Enquanto ativo fica em `job.ctx`, então `_log(job, ...)` e os passos do job
+    passam pelo buffer.
+    """
+
+    def __init__(self, job: Job, buffer: int | None = None, flush_ms: int | None = None,
+                 progress_ms: int | None = None):
+        self.job = job
+        self.buffer = buffer or getattr(settings, "JOBS_LOG_BUFFER", 200)
+        self.flush_ms = flush_ms if flush_ms is not None else getattr(settings, "JOBS_LOG_FLUSH_MS", 1000)
+        self.progress_ms = progress_ms if progress_ms is not None else getattr(settings, "JOBS_PROGRESS_MS", 500)
+        self._logs: list[JobLog] = []
+        self._ultimo_flush = time.monotonic()
+        self._ultimo_progress = 0.0
+        self._progress_pendente: int | None = None
+
+    def __enter__(self):
+        self.job.ctx = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.flush(progresso=True)
+        except Exception:  # noqa
+            # última tentativa numa conexão nova; se falhar, os logs vão para o logging
+            close_old_connections()
+            try:
+                self.flush(progresso=True)
+            except Exception:  # noqa
+                for l in self._logs:
+                    logger.error("job %s [%s] %s: %s", self.job.pk, l.ts.isoformat(), l.level, l.message)
+                self._logs = []
+        finally:
+            self.job.ctx = None
+        return False
+
+    def log(self, msg: str, level: str = "INFO"):
+        self._logs.append(JobLog(job_id=self.job.pk, ts=timezone.now(), level=level, message=msg))
+        if len(self._logs) >= self.buffer or (time.monotonic() - self._ultimo_flush) * 1000 >= self.flush_ms:
+            self.flush()
+
+    def progress(self, progress: int):
+        self.job.progress = progress
+        self._progress_pendente = progress
+        if (time.monotonic() - self._ultimo_progress) * 1000 >= self.progress_ms:
+            self._gravar_progress()
+
+    def set_status(self, status: str, progress: int | None = None, extra: dict | None = None):
+        self.flush()
+        self._progress_pendente = None
+        _gravar_status(self.job, status, progress, extra)
+        self._ultimo_progress = time.monotonic()
+
+    def flush(self, progresso: bool = False):
+        # só limpa o buffer depois que o INSERT deu certo
+        if self._logs:
+            JobLog.objects.bulk_create(self._logs)
+            self._logs = []
+        self._ultimo_flush = time.monotonic()
+        if progresso and self._progress_pendente is not None:
+            self._gravar_progress()
+
+    def _gravar_progress(self):
+        pendente, self._progress_pendente = self._progress_pendente, None
+        job_queue.atualizar(self.job, progress=pendente)
+        self._ultimo_progress = time.monotonic()
+
+
 def _log(job: Job, msg: str, level="INFO"):
-    JobLog.objects.create(job=job, message=msg, level=level)
+    ctx = getattr(job, "ctx", None)
+    if ctx is not None:
+        ctx.log(msg, level)
+    else:
+        JobLog.objects.create(job=job, message=msg, level=level)
 
-def _set_status(job: Job, status: str, progress: int | None = None, extra: dict | None = None):
-    Job.objects.filter(pk=job.pk).update(
+def _gravar_status(job: Job, status: str, progress: int | None = None, extra: dict | None = None):
+    # um UPDATE e os mesmos valores no objeto em memória (sem refresh_from_db)
+    campos = dict(
         status=status,
         progress=progress if progress is not None else job.progress,
         result=extra if extra is not None else job.result,
         started_at=job.started_at or (timezone.now() if status == Job.Status.RUNNING else job.started_at),
         finished_at=timezone.now() if status in (Job.Status.SUCCESS, Job.Status.ERROR) else None,
     )
-    job.refresh_from_db()
+    job_queue.atualizar(job, **campos)
+    for k, v in campos.items():
+        setattr(job, k, v)
 
-def _run_steps(job: Job, steps: list[tuple[str, Callable[[], dict | None]]]):
-    try:
-        _set_status(job, Job.Status.RUNNING, 0)
-        _log(job, f"Job iniciado: {job.name} ({job.type})")
+def _set_status(job: Job, status: str, progress: int | None = None, extra: dict | None = None):
+    ctx = getattr(job, "ctx", None)
+    if ctx is not None:
+        ctx.set_status(status, progress, extra)
+    else:
+        _gravar_status(job, status, progress, extra)
 
-        n = len(steps) or 1
-        for i, (title, fn) in enumerate(steps, start=1):
-            _log(job, f"Iniciando passo {i}/{n}: {title}")
-            # simula processamento pesado
-            result = fn() or {}
-            _log(job, f"Concluído: {title} — {result}")
-            prog = int(i * 100 / n)
-            _set_status(job, Job.Status.RUNNING, prog)
+def _run_steps(job: Job, steps: list[tuple[str, Callable[[], dict | None]]]):
+    with JobContext(job) as ctx:
+        try:
+            ctx.set_status(Job.Status.RUNNING, 0)
+            ctx.log(f"Job iniciado: {job.name} ({job.type})")
 
-        _set_status(job, Job.Status.SUCCESS, 100, extra={"ok": True})
-        _log(job, "Job finalizado com sucesso", "INFO")
+            n = len(steps) or 1
+            resultado = {"ok": True}
+            for i, (title, fn) in enumerate(steps, start=1):
+                ctx.log(f"Iniciando passo {i}/{n}: {title}")
+                # simula processamento pesado
+                result = fn() or {}
+                ctx.log(f"Concluído: {title} — {result}")
+                resultado.update(result)
+                ctx.progress(int(i * 100 / n))
 
-    except Exception as e:  # noqa
-        _set_status(job, Job.Status.ERROR, extra={"error": str(e)})
-        _log(job, f"Erro: {e}", "ERROR")
+            ctx.set_status(Job.Status.SUCCESS, 100, extra=resultado)
+            ctx.log("Job finalizado com sucesso", "INFO")
 
+        except job_queue.JobPerdido as e:
+            # recover_stale devolveu o job à fila: quem o reservou de novo grava o status
+            ctx.log(str(e), "WARN")
+        except Exception as e:  # noqa
+            ctx.log(f"Erro: {e}", "ERROR")
+            try:
+                ctx.set_status(Job.Status.ERROR, extra={"error": str(e)})
+            except job_queue.JobPerdido as e:
+                ctx.log(str(e), "WARN")
 
-def _start_thread(job: Job, steps: list[tuple[str, Callable[[], dict | None]]]):
-    t = threading.Thread(target=_run_steps, args=(job, steps), daemon=True)
-    t.start()
 
 # -----------------------------------------------------------------------------------
 # "Mocks" de Sankhya — aqui é onde você troca por chamadas reais depois
@@ -75,8 +187,93 @@ def step_pedidos():
     time.sleep(1.0 + random.random())
     return {"pedidos_importados": random.randint(2, 15)}
 
-def build_steps(job_type: str):
-    if job_type == "sankhya_demo":
+# -----------------------------------------------------------------------------------
+# Exportação de relatórios em background
+
+FORMATOS_ARQUIVO = ("csv", "xlsx", "pdf")
+
+def step_relatorio_export(job: Job):
+    """
+    Gera o arquivo do relatório (payload.path + payload.params) com o escopo do
+    usuário que pediu a exportação e grava no banco (JobArquivo de saída).
+    """
+    payload = job.payload or {}
+    user = get_user_model().objects.get(pk=payload["user_id"])
+    relatorio = payload["path"].rstrip("/").rsplit("/", 1)[-1]
+    arq = relatorios.exportar(relatorio, payload.get("params") or {}, user, payload.get("format", "csv"))
+    try:
+        gravado = arquivos_jobs.gravar(job, JobArquivo.Papel.SAIDA, arq.nome, arq, arq.content_type)
+    finally:
+        arq.close()
+    return {
+        "nome": arq.nome,
+        "content_type": gravado.content_type,
+        "tamanho": gravado.tamanho,
+        "linhas": arq.linhas,
+    }
+
+def enfileirar_exportacao(user, path: str, params: dict, fmt: str) -> Job:
+    """Enfileira o Job de exportação do relatório em `path` (executado por run_jobs)."""
+    relatorio = path.rstrip("/").rsplit("/", 1)[-1]
+    with transaction.atomic():
+        job = Job.objects.create(
+            name=f"Exportação {relatorio} ({fmt})",
+            type="relatorio_export",
+            payload={"path": path, "params": params, "format": fmt, "user_id": user.pk},
+        )
+        _log(job, "Criado e enfileirado")
+    return job
+
+def step_precos_import(job: Job):
+    """Importa a lista de preços enviada (JobArquivo de entrada) na tabela payload.tabela."""
+    payload = job.payload or {}
+    arq = arquivos_jobs.buscar(job, JobArquivo.Papel.ENTRADA)
+    if arq is None:
+        raise RuntimeError("Arquivo da importação não encontrado")
+
+    def ao_lote(n, r):
+        _log(job, f"Lote {n}: {r['linhas']} linhas lidas, {r['gravados']} preços gravados")
+
+    with arquivos_jobs.em_disco(arq) as caminho:
+        resumo = importar_precos(caminho, payload["tabela"],
+                                 criar_tabela=bool(payload.get("criar_tabela")), ao_lote=ao_lote)
+    # só apaga o upload no sucesso: se o worker cair, o job volta à fila e relê o arquivo
+    arquivos_jobs.apagar(job, JobArquivo.Papel.ENTRADA)
+    return resumo
+
+def enfileirar_importacao_precos(user, upload, tabela: str, criar_tabela: bool = False) -> Job:
+    """Guarda o arquivo enviado no banco e enfileira o Job de importação de preços."""
+    nome = Path(upload.name or "precos.csv").name
+    with transaction.atomic():
+        job = Job.objects.create(
+            name=f"Importação de preços ({tabela})",
+            type="precos_import",
+            payload={"tabela": tabela, "criar_tabela": criar_tabela, "nome": nome, "user_id": user.pk},
+        )
+        arquivos_jobs.gravar(job, JobArquivo.Papel.ENTRADA, nome, upload.chunks(),
+                             getattr(upload, "content_type", "") or "")
+        _log(job, f"Arquivo {nome} recebido; enfileirado")
+    return job
+
+def step_enriquecer_cnpj(job: Job):
+    """Preenche nome/cidade/UF dos clientes pela BrasilAPI (payload.limite opcional)."""
+    payload = job.payload or {}
+    return enriquecer_clientes(
+        limite=payload.get("limite"),
+        log=lambda msg, level="INFO": _log(job, msg, level),
+        ao_progresso=lambda pct: job.ctx.progress(pct) if getattr(job, "ctx", None) else None,
+    )
+
+def build_steps(job_type: str, job: Job | None = None):
+    if job_type == "relatorio_export":
+        return [("Gerar arquivo do relatório", lambda: step_relatorio_export(job))]
+    elif job_type == "precos_import":
+        return [("Importar lista de preços", lambda: step_precos_import(job))]
+    elif job_type == "enriquecer_cnpj":
+        return [("Enriquecer clientes pelo CNPJ", lambda: step_enriquecer_cnpj(job))]
+    elif job_type == "reconciliar_totais":
+        return [("Reconciliar totais dos pedidos", reconciliar_totais)]
+    elif job_type == "sankhya_demo":
         return [
             ("Autenticação no Sankhya", step_auth),
             ("Sincronizar clientes",     step_clientes),
@@ -101,18 +298,18 @@ class JobsRunView(APIView):
 
     def post(self, request):
         """
-        body: { "type": "sankhya_demo" | "full_load_demo", "name": "opcional", "payload": {...} }
+        body: { "type": "sankhya_demo" | "full_load_demo" | "reconciliar_totais" | "enriquecer_cnpj",
+                "name": "opcional", "payload": {...} }
         """
         body = request.data or {}
         job_type = (body.get("type") or "sankhya_demo").strip()
         name = body.get("name") or (f"Job {job_type}")
         payload = body.get("payload") or {}
 
+        # executado pelo worker (manage.py run_jobs)
         with transaction.atomic():
             job = Job.objects.create(name=name, type=job_type, payload=payload)
             _log(job, "Criado e enfileirado")
-        steps = build_steps(job_type)
-        _start_thread(job, steps)
         return Response({"id": str(job.id), "status": job.status}, status=http_status.HTTP_201_CREATED)
 
 
@@ -120,10 +317,8 @@ class JobsListView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        qs = Job.objects.all()
-        page = int(request.query_params.get("page") or 1)
-        p = Paginator(qs, 20)
-        pg = p.get_page(page)
+        paginator = JobCursor()
+        jobs = paginator.paginate_queryset(Job.objects.all(), request, view=self)
         data = [
             {
                 "id": str(j.id),
@@ -135,9 +330,9 @@ class JobsListView(APIView):
                 "started_at": j.started_at.isoformat() if j.started_at else None,
                 "finished_at": j.finished_at.isoformat() if j.finished_at else None,
             }
-            for j in pg.object_list
+            for j in jobs
         ]
-        return Response({"results": data, "page": page, "pages": p.num_pages})
+        return paginator.get_paginated_response(data)
 
 
 class JobDetailView(APIView):
@@ -171,14 +366,98 @@ class JobLogsView(APIView):
         except Job.DoesNotExist:
             return Response({"detail": "not found"}, status=404)
 
-        page = int(request.query_params.get("page") or 1)
-        p = Paginator(j.logs.all(), 50)
-        pg = p.get_page(page)
+        paginator = JobLogCursor()
+        logs = paginator.paginate_queryset(j.logs.all(), request, view=self)
         data = [
             {
                 "ts": l.ts.isoformat(),
                 "level": l.level,
                 "message": l.message,
-            } for l in pg.object_list
+            } for l in logs
         ]
-        return Response({"results": data, "page": page, "pages": p.num_pages})
+        return paginator.get_paginated_response(data)
+
+
+class JobDownloadView(APIView):
+    """Arquivo gerado por um job de exportação (dono do job ou staff)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        j = Job.objects.filter(pk=job_id).first()
+        if j is None or not (request.user.is_staff or (j.payload or {}).get("user_id") == request.user.pk):
+            return Response({"detail": "not found"}, status=404)
+        arq = arquivos_jobs.buscar(j, JobArquivo.Papel.SAIDA) if j.status == Job.Status.SUCCESS else None
+        if arq is None:
+            return Response({"detail": "arquivo ainda não disponível", "status": j.status, "progress": j.progress}, status=409)
+        resp = RespostaEmBlocos(arquivos_jobs.ler(arq), content_type=arq.content_type or "application/octet-stream")
+        resp["Content-Length"] = str(arq.tamanho)
+        resp["Content-Disposition"] = content_disposition_header(True, arq.nome)
+        return resp
+
+
+# -----------------------------------------------------------------------------------
+# Acompanhamento ao vivo (Server-Sent Events)
+
+async def _usuario_sse(request):
+    """
+    Usuário da sessão (o EventSource do navegador manda o cookie na mesma
+    origem) ou do JWT no cabeçalho Authorization (clientes que não são o
+    navegador). Token na query string não é aceito: iria parar nos logs de
+    acesso e no histórico.
+    """
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    try:
+        autenticado = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    return autenticado[0] if autenticado else None
+
+
+def _sse(corpo) -> StreamingHttpResponse:
+    resp = StreamingHttpResponse(corpo, content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"  # proxies (nginx) não seguram os eventos
+    return resp
+
+
+class _StreamView(View):
+    """
+    Views assíncronas (só staff, como as de jobs acima). Sob ASGI o stream fica
+    aberto; sob WSGI cada requisição manda o estado atual e termina, e o
+    EventSource reconecta sozinho (ver core.services.acompanhamento_jobs).
+    """
+
+    async def _negado(self, request):
+        user = await _usuario_sse(request)
+        if user is None:
+            return JsonResponse({"detail": "Credenciais não informadas."}, status=401)
+        if not user.is_staff:
+            return JsonResponse({"detail": "Você não tem permissão para executar essa ação."}, status=403)
+        return None
+
+
+class JobStreamView(_StreamView):
+    """GET /api/jobs/<id>/stream/ — eventos job/log/fim; retoma do Last-Event-ID (JobLog.id) ou ?desde=."""
+
+    async def get(self, request, job_id):
+        negado = await self._negado(request)
+        if negado:
+            return negado
+        if not await Job.objects.filter(pk=job_id).aexists():
+            return JsonResponse({"detail": "not found"}, status=404)
+        ultimo = request.headers.get("Last-Event-ID") or request.GET.get("desde") or "0"
+        ultimo = int(ultimo) if ultimo.isdigit() else 0
+        ao_vivo = isinstance(request, ASGIRequest)
+        return _sse(acompanhamento_jobs.stream_job(str(job_id), ultimo, ao_vivo))
+
+
+class JobsStreamView(_StreamView):
+    """GET /api/jobs/stream/ — um evento "job" por job novo ou alterado."""
+
+    async def get(self, request):
+        negado = await self._negado(request)
+        if negado:
+            return negado
+        return _sse(acompanhamento_jobs.stream_jobs(isinstance(request, ASGIRequest)))
@@ -92,15 +92,15 @@ class VendasResumoView(APIView):
         if status_f:
             qs = qs.filter(status=status_f)
 
-        total_vendido = qs.aggregate(s=Coalesce(Sum("total"), Value(0)))["s"] or Decimal("0")
-        qtd_pedidos = qs.aggregate(c=Count("id"))["c"] or 0
-        ticket_medio = (total_vendido / qtd_pedidos) if qtd_pedidos else Decimal("0")
-
+        # uma única consulta agrupada; os totais saem da soma das linhas
         por_cliente = list(
             qs.values("cliente_id", "cliente__nome")
-              .annotate(total=Coalesce(Sum("total"), Value(0)), pedidos=Count("id"))
+              .annotate(total=Coalesce(Sum("total"), Value(Decimal("0"))), pedidos=Count("id"))
               .order_by("-total")
         )
+        total_vendido = sum((Decimal(r["total"]) for r in por_cliente), Decimal("0"))
+        qtd_pedidos = sum(r["pedidos"] for r in por_cliente)
+        ticket_medio = (total_vendido / qtd_pedidos) if qtd_pedidos else Decimal("0")
 
         # EXPORTAÇÕES ---------------------------------------------------------
         if fmt == "csv":
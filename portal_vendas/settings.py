@@ -55,15 +55,26 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "portal_vendas.wsgi.application"
+ASGI_APPLICATION = "portal_vendas.asgi.application"
 
 # Banco de dados
 if os.environ.get("DATABASE_URL"):
+    # o web roda sob ASGI (uvicorn): conexões persistentes (CONN_MAX_AGE) ficam
+    # presas às threads do sync_to_async, então as conexões vêm do pool do
+    # psycopg (Django 5.1): cada requisição pega uma conexão TLS já aberta e
+    # devolve no fim. DB_POOL=False volta às conexões persistentes de antes.
+    DB_POOL = os.environ.get("DB_POOL", "True") == "True"
     DATABASES = {
         "default": dj_database_url.config(
-            conn_max_age=600,
+            conn_max_age=0 if DB_POOL else int(os.environ.get("DB_CONN_MAX_AGE", "600")),
             ssl_require=True
         )
     }
+    if DB_POOL:
+        DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN", "2")),
+            "max_size": int(os.environ.get("DB_POOL_MAX", "10")),  # por processo (web e run_jobs)
+        }
 else:
     DATABASES = {
         "default": {
@@ -82,6 +93,10 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    # taxas dos throttles declarados nas views (nenhum é global)
+    "DEFAULT_THROTTLE_RATES": {
+        "cnpj_anon": os.environ.get("CNPJ_ANON_TAXA", "20/min"),  # /api/cnpj/lookup/ sem login
+    },
 }
 
 # Para evitar problemas de CSRF em domínios do Render (POST/PUT/DELETE)
@@ -114,3 +129,69 @@ STORAGES = {
 }
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Uploads aguardando o worker e arquivos das exportações (?async=1) ficam no
+# banco (core.services.arquivos_jobs), em partes deste tamanho
+JOBS_ARQUIVO_PARTE_BYTES = 1024 * 1024
+
+# Cache de preços por processo (core.services.precos); entradas (tabela, sku)
+PRECOS_CACHE_MAX = 50_000
+SIMULADOR_MAX_ITENS = 5000  # linhas por chamada de /api/simulador/calcular/
+PEDIDOS_LOTE_MAX = 200      # pedidos por chamada de /api/pedidos/lote/
+
+# Consulta de CNPJ (core.services.cnpj): BrasilAPI com cache em banco (CnpjCache)
+CNPJ_API_URL = os.environ.get("CNPJ_API_URL", "https://brasilapi.com.br/api/cnpj/v1/")
+CNPJ_API_TIMEOUT = 10
+CNPJ_CACHE_TTL = 30 * 24 * 3600      # segundos; resposta válida
+CNPJ_CACHE_STALE = 7 * 24 * 3600     # depois do TTL: serve o antigo e atualiza em segundo plano
+CNPJ_CACHE_TTL_ERRO = 24 * 3600      # CNPJ inexistente/inválido na API
+CNPJ_CACHE_TTL_FALHA = 60            # timeout, 429, 5xx
+# Job "enriquecer_cnpj" (core.services.enriquecimento_cnpj)
+CNPJ_LOTE_CONCORRENCIA = 5           # requisições simultâneas
+CNPJ_LOTE_TAXA = 3.0                 # requisições/s (balde de tokens)
+CNPJ_LOTE_RAJADA = 3
+CNPJ_LOTE_TENTATIVAS = 4             # por CNPJ, em falha transitória
+CNPJ_LOTE_BACKOFF = 1.0              # segundos; dobra a cada tentativa
+CNPJ_CIRCUITO_FALHAS = 5             # falhas seguidas que abrem o circuito
+CNPJ_CIRCUITO_ESPERA = 30            # segundos aberto antes de testar de novo
+CNPJ_CIRCUITO_MAX_ABERTURAS = 3      # aberturas seguidas que encerram o job
+
+# Fila de jobs (manage.py run_jobs)
+JOBS_HEARTBEAT_SEGUNDOS = 10
+JOBS_STALE_SEGUNDOS = 60      # sem heartbeat por mais que isso => job volta para a fila
+JOBS_MAX_TENTATIVAS = 3
+JOBS_LOG_BUFFER = 200         # JobLog gravados em lote a cada N linhas...
+JOBS_LOG_FLUSH_MS = 1000      # ...ou a cada N ms
+JOBS_PROGRESS_MS = 500        # Job.progress gravado no máximo a cada N ms
+JOBS_CONCURRENCY_POR_TIPO = { # máximo de jobs do tipo rodando ao mesmo tempo (todos os workers)
+    "relatorio_export": 2,
+    "precos_import": 1,
+    "enriquecer_cnpj": 1,     # a taxa da BrasilAPI é por IP
+}
+# Acompanhamento ao vivo por SSE (/api/jobs/stream/, /api/jobs/<id>/stream/)
+JOBS_SSE_INTERVALO_MS = 1000  # consulta ao banco feita pela central do processo
+JOBS_SSE_PING_SEGUNDOS = 15   # comentário enviado em conexão parada (proxies fecham ociosas)
+JOBS_SSE_MAX_SEGUNDOS = 300   # depois disso o stream fecha e o navegador reconecta
+JOBS_SSE_RETRY_MS = 2000      # espera do EventSource antes de reconectar
+
+# Relatórios: lê do rollup VendaDiaria quando o período permite (desligue para usar Pedido cru)
+RELATORIOS_USAR_ROLLUP = os.environ.get("RELATORIOS_USAR_ROLLUP", "True") == "True"
+
+# Cache do Django. "relatorios" guarda as respostas JSON de /api/relatorios/*
+# (core.services.cache_relatorios): em disco por padrão, compartilhado pelos
+# workers do gunicorn; RELATORIOS_CACHE=locmem usa a memória de cada processo.
+CACHE_ROOT = Path(os.environ.get("CACHE_ROOT", BASE_DIR / "cache"))
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "relatorios": (
+        {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "relatorios",
+         "OPTIONS": {"MAX_ENTRIES": 2000}}
+        if os.environ.get("RELATORIOS_CACHE", "file") == "locmem" else
+        {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+         "LOCATION": CACHE_ROOT / "relatorios", "OPTIONS": {"MAX_ENTRIES": 5000}}
+    ),
+}
+RELATORIOS_CACHE_TTL = 600  # segundos; limite para nomes de cliente/produto alterados aparecerem
+
+# O índice de cobertura de Pedido usa INCLUDE (PostgreSQL); no SQLite vira índice simples
+SILENCED_SYSTEM_CHECKS = ["models.W040"]